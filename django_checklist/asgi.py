@@ -0,0 +1,19 @@
+"""
+ASGI config for django_checklist project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``, for ASGI servers such as uvicorn or daphne:
+
+    uvicorn django_checklist.asgi:application
+
+Views still run synchronously, on a pool of ASGI_THREADS threads; see
+django_checklist.common.asgi.
+"""
+
+import os
+
+from django_checklist.common.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_checklist.settings")
+
+application = get_asgi_application()
@@ -2,4 +2,9 @@ from django.apps import AppConfig
 
 
 class CommonConfig(AppConfig):
-    name = 'common'
+    name = 'django_checklist.common'
+    label = 'common'
+
+    def ready(self):
+        # Connects the model signal handlers
+        from . import signals
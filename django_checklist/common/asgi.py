@@ -0,0 +1,255 @@
+# Python
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import sys
+from tempfile import SpooledTemporaryFile
+
+# Django
+import django
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+
+class ASGIHandler(object):
+    """
+    ASGI 3 application serving Django through its WSGI handler.
+
+    Django 1.9 views cannot run on an event loop, so the loop only does the
+    network I/O: the request body is received, then the view runs on a
+    bounded thread pool and its response is sent back from the loop. A slow
+    or idle client costs a coroutine rather than a worker thread, and no
+    more than ASGI_THREADS requests use the database at once, each thread
+    keeping its own persistent connection. Streaming responses are rendered
+    on their thread and handed to the loop through a small buffer, so they
+    hold the thread while the client reads.
+
+    Long polls should not hold a thread either. Views see asgi.wait in
+    request.META and may return a response with an asgi_wait attribute of
+    (subscribe, timeout) instead of blocking: subscribe(callback) registers
+    a callback that may be called from any thread and returns a function
+    cancelling it. The handler waits on the loop for the callback, the
+    timeout or a disconnect, then runs the request again with asgi.waited
+    instead, and the view must answer without waiting.
+    """
+    # Request bodies larger than this are spooled to disk
+    max_memory_body = 2621440
+    # Response chunks a streaming response may render ahead of the client
+    stream_buffer = 8
+
+    def __init__(self, application=None, max_workers=None):
+        self.application = application or WSGIHandler()
+        self.executor = ThreadPoolExecutor(max_workers or
+            getattr(settings, 'ASGI_THREADS', 16))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._run_lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported scope type {0}'.format(
+                scope['type']))
+
+        body = await self._receive_body(receive)
+        if body is None:
+            return
+
+        try:
+            environ = self.get_environ(scope, body)
+            environ['asgi.wait'] = True
+            wait = await self._run(environ, send)
+            if wait is None:
+                return
+
+            subscribe, timeout = wait
+            if not await self._wait(subscribe, timeout, receive):
+                return
+
+            body.seek(0)
+            environ = self.get_environ(scope, body)
+            environ['asgi.waited'] = True
+            await self._run(environ, send)
+        finally:
+            body.close()
+
+    def get_environ(self, scope, body):
+        """
+        Returns the WSGI environ of an ASGI HTTP scope
+        """
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            # WSGI carries paths as latin-1 decoded bytes
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': 'HTTP/{0}'.format(
+                scope.get('http_version', '1.1')),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        if scope.get('client'):
+            environ['REMOTE_ADDR'] = scope['client'][0]
+
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1')
+            # Like WSGI servers, so X_Forwarded_For cannot pass itself off
+            # as X-Forwarded-For
+            if '_' in name:
+                continue
+
+            name = name.upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = 'HTTP_' + name
+            if name in environ:
+                # HTTP/2 clients send cookies as separate headers
+                separator = '; ' if name == 'HTTP_COOKIE' else ','
+                value = environ[name] + separator + value
+            environ[name] = value
+
+        return environ
+
+    async def _receive_body(self, receive):
+        """
+        Returns the request body as a file, or None if the client left
+        """
+        body = SpooledTemporaryFile(max_size=self.max_memory_body)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    async def _run(self, environ, send):
+        """
+        Runs the request on the pool and sends its response, or returns the
+        (subscribe, timeout) of a response asking to wait
+        """
+        loop = asyncio.get_event_loop()
+        queue = asyncio.Queue(maxsize=self.stream_buffer)
+        state = {'cancelled': False}
+        job = loop.run_in_executor(self.executor, self._respond, environ,
+            loop, queue, state)
+        wait = None
+
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    return wait
+                if message['type'] == 'asgi.wait':
+                    wait = message['wait']
+                else:
+                    await send(message)
+        except BaseException:
+            # Unblocks the thread so it stops rendering and closes the
+            # response
+            state['cancelled'] = True
+            while not queue.empty():
+                queue.get_nowait()
+            raise
+        finally:
+            await job
+
+    async def _wait(self, subscribe, timeout, receive):
+        """
+        Waits on the loop until subscribe's callback is called or timeout
+        passes. Returns False if the client left meanwhile.
+        """
+        loop = asyncio.get_event_loop()
+        ready = loop.create_future()
+
+        def set_ready():
+            if not ready.done():
+                ready.set_result(True)
+
+        def notify():
+            # Called by publishers, possibly after the request ended
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(set_ready)
+
+        unsubscribe = subscribe(notify)
+        disconnect = asyncio.ensure_future(receive())
+        try:
+            await asyncio.wait([ready, disconnect], timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            unsubscribe()
+            ready.cancel()
+
+        if disconnect.done():
+            return disconnect.result()['type'] != 'http.disconnect'
+        disconnect.cancel()
+        return True
+
+    def _respond(self, environ, loop, queue, state):
+        """
+        Runs the request on a pool thread, putting ASGI messages on queue
+        """
+        def put(message):
+            asyncio.run_coroutine_threadsafe(queue.put(message), loop) \
+                .result()
+
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'),
+                value.encode('latin-1')) for name, value in headers]
+
+        try:
+            response = self.application(environ, start_response)
+            try:
+                wait = getattr(response, 'asgi_wait', None)
+                if wait is not None:
+                    put({'type': 'asgi.wait', 'wait': wait})
+                    return
+
+                put({'type': 'http.response.start',
+                    'status': started['status'],
+                    'headers': started['headers']})
+                if getattr(response, 'streaming', False):
+                    for chunk in response:
+                        if state['cancelled']:
+                            return
+                        if chunk:
+                            put({'type': 'http.response.body', 'body': chunk,
+                                'more_body': True})
+                    put({'type': 'http.response.body'})
+                else:
+                    put({'type': 'http.response.body',
+                        'body': b''.join(response)})
+            finally:
+                # Sends request_finished on this thread, which releases its
+                # database connection if it is obsolete
+                response.close()
+        finally:
+            if not state['cancelled']:
+                put(None)
+
+    async def _run_lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+def get_asgi_application():
+    """
+    Sets Django up and returns an ASGIHandler, like get_wsgi_application()
+    """
+    django.setup()
+    return ASGIHandler()
@@ -0,0 +1,140 @@
+# Python
+from bisect import bisect_left, insort
+import heapq
+import threading
+import time
+
+# Django
+from django.conf import settings
+from django.db.models import Count
+
+# Local
+from .models import Tag
+
+def get_tag_relations():
+    """
+    Returns (model, through model, model field name, tag field name) for
+    each many-to-many to Tag
+    """
+    return [(relation.related_model, relation.through,
+        relation.field.m2m_field_name(),
+        relation.field.m2m_reverse_field_name())
+        for relation in Tag._meta.related_objects if relation.many_to_many]
+
+class TagPrefixIndex(object):
+    """
+    In-process index of Tag names for autocomplete.
+
+    Lowercased names are kept in a sorted list, so the tags starting with a
+    prefix are one contiguous run found by bisection. Matches are ranked by
+    how many objects are tagged with them, then by name, and the ranked
+    results are memoized until the next change. The index is loaded on first
+    use and kept up to date by the signals in common.signals; it is reloaded
+    after max_age seconds to pick up writes made by other processes or
+    rolled back.
+    """
+    max_results = 1024
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._keys = []
+        self._tags = {}
+        self._results = {}
+
+    def lookup(self, prefix, limit):
+        """
+        Returns up to limit (pk, name, count) tags starting with prefix,
+        most used first
+        """
+        prefix = prefix.lower()
+        with self._lock:
+            if self._loaded_at is None or (self.max_age is not None and
+                time.monotonic() - self._loaded_at > self.max_age):
+                self.rebuild()
+
+            results = self._results.get((prefix, limit))
+            if results is None:
+                start = bisect_left(self._keys, (prefix,))
+                end = bisect_left(self._keys, (prefix + '\U0010ffff',))
+                pks = (self._keys[i][1] for i in range(start, end))
+                results = [(pk,) + tuple(self._tags[pk]) for pk in
+                    heapq.nsmallest(limit, pks, key=lambda pk: (
+                    -self._tags[pk][1], self._tags[pk][0]))]
+
+                if len(self._results) >= self.max_results:
+                    self._results.clear()
+                self._results[(prefix, limit)] = results
+
+        return results
+
+    def add(self, pk, name):
+        """
+        Adds a Tag or renames it, keeping its count
+        """
+        with self._lock:
+            if self._loaded_at is None:
+                return
+
+            count = 0
+            if pk in self._tags:
+                count = self._tags[pk][1]
+                self._remove(pk)
+            self._tags[pk] = [name, count]
+            insort(self._keys, (name.lower(), pk))
+            self._results.clear()
+
+    def remove(self, pk):
+        with self._lock:
+            if self._loaded_at is None or pk not in self._tags:
+                return
+
+            self._remove(pk)
+            self._results.clear()
+
+    def count(self, pks, delta):
+        """
+        Adds delta to the count of the Tag of each pk in pks. pks may be a
+        lazy queryset; it is only read while the index is loaded.
+        """
+        if self._loaded_at is None:
+            return
+
+        pks = list(pks)
+        with self._lock:
+            for pk in pks:
+                if pk in self._tags:
+                    self._tags[pk][1] += delta
+            self._results.clear()
+
+    def invalidate(self):
+        """
+        Reloads the index on next use, e.g. after writes without signals
+        """
+        with self._lock:
+            self._loaded_at = None
+
+    def rebuild(self):
+        with self._lock:
+            self._tags = {pk: [name, 0] for pk, name in
+                Tag.objects.values_list('pk', 'name').iterator()}
+            for model, through, source, field_name in get_tag_relations():
+                counts = through.objects.order_by().values(field_name) \
+                    .annotate(count=Count('pk'))
+                for row in counts.iterator():
+                    if row[field_name] in self._tags:
+                        self._tags[row[field_name]][1] += row['count']
+
+            self._keys = sorted((name.lower(), pk)
+                for pk, (name, count) in self._tags.items())
+            self._results.clear()
+            self._loaded_at = time.monotonic()
+
+    def _remove(self, pk):
+        name, count = self._tags.pop(pk)
+        key = (name.lower(), pk)
+        del self._keys[bisect_left(self._keys, key)]
+
+tag_index = TagPrefixIndex(getattr(settings, 'TAG_AUTOCOMPLETE_MAX_AGE',
+    None))
@@ -0,0 +1,37 @@
+# Django
+from django.db import connections, router
+from django.db.models import Max
+from django.db.transaction import TransactionManagementError
+from django.db.utils import NotSupportedError
+
+def bulk_create(model, objects):
+    """
+    Inserts objects with bulk_create and sets their primary keys.
+
+    Backends with can_return_ids_from_bulk_insert set them themselves. On
+    SQLite they are derived from the largest id afterwards, which relies on
+    the transaction holding the write lock from the insert until it ends
+    and rowids being handed out consecutively, so it has to be called
+    inside transaction.atomic(). Other backends are refused rather than
+    given guessed ids.
+    """
+    connection = connections[router.db_for_write(model)]
+    returns_ids = getattr(connection.features,
+        'can_return_ids_from_bulk_insert', False)
+    if not returns_ids:
+        if connection.vendor != 'sqlite':
+            raise NotSupportedError('bulk_create() cannot tell the ids of '
+                'objects inserted on {0}'.format(connection.vendor))
+        if not connection.in_atomic_block:
+            raise TransactionManagementError(
+                'bulk_create() has to run inside transaction.atomic()')
+
+    model._default_manager.bulk_create(objects)
+
+    if objects and not returns_ids:
+        last_id = model._default_manager.aggregate(
+            last_id=Max('pk'))['last_id']
+        for pk, obj in enumerate(objects, start=last_id - len(objects) + 1):
+            obj.pk = pk
+
+    return objects
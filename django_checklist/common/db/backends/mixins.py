@@ -0,0 +1,177 @@
+# Python
+import threading
+import weakref
+
+# Django
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.utils import DatabaseError
+
+_shared = {}
+_shared_lock = threading.Lock()
+_threads = threading.local()
+
+def get_shared(key, factory):
+    """
+    Returns the process-wide object stored under key, made by factory on
+    first use
+    """
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = factory()
+        return _shared[key]
+
+class ConnectionPool(object):
+    """
+    Counts the open connections to a database against its POOL_SIZE
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.used = 0
+        self.waiting = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, timeout):
+        with self._condition:
+            self.waiting += 1
+            try:
+                if not self._condition.wait_for(
+                    lambda: self.used < self.size, timeout):
+                    return False
+            finally:
+                self.waiting -= 1
+            self.used += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.used -= 1
+            self._condition.notify()
+
+    @property
+    def contended(self):
+        """
+        True when no slot is free or a thread is waiting for one
+        """
+        return self.waiting > 0 or self.used >= self.size
+
+class _ThreadToken(object):
+    pass
+
+class _PoolSlot(object):
+    """
+    A slot taken from a ConnectionPool, given back once by whichever comes
+    first: the connection closing, its wrapper being collected or the
+    thread that opened it exiting
+    """
+
+    def __init__(self, pool, wrapper):
+        self.pool = pool
+        self._lock = threading.Lock()
+        if not hasattr(_threads, 'token'):
+            _threads.token = _ThreadToken()
+        self._finalizers = [weakref.finalize(wrapper, self.release),
+            weakref.finalize(_threads.token, self.release)]
+
+    def release(self):
+        with self._lock:
+            if self.pool is None:
+                return
+            pool, self.pool = self.pool, None
+            for finalizer in self._finalizers:
+                finalizer.detach()
+
+        pool.release()
+
+class ManagedConnectionMixin(object):
+    """
+    Bounds and health checks a backend's persistent connections.
+
+    Django keeps one connection per thread and, with CONN_MAX_AGE, reuses it
+    across that thread's requests. POOL_SIZE caps how many such connections
+    a process holds open per database: a thread past the cap waits up to
+    POOL_TIMEOUT seconds for a slot. Threads give their connection back at
+    the end of a request while the pool is contended, so connections kept
+    by idle threads do not starve busy ones, and when they exit. With
+    HEALTH_CHECKS a reused connection is checked at the start of each
+    request and replaced if it stopped working, instead of failing the
+    request.
+    """
+    _pool_slot = None
+
+    def get_pool(self):
+        size = self.settings_dict.get('POOL_SIZE')
+        if not size:
+            return None
+
+        return get_shared(('pool', self.alias, self.settings_dict['NAME']),
+            lambda: ConnectionPool(size))
+
+    def get_new_connection(self, conn_params):
+        pool = self.get_pool()
+        if pool is not None:
+            if not pool.acquire(self.settings_dict.get('POOL_TIMEOUT', 10)):
+                raise self.Database.OperationalError(
+                    'Timed out waiting for a database connection')
+            self._pool_slot = _PoolSlot(pool, self)
+
+        try:
+            return super().get_new_connection(conn_params)
+        except Exception:
+            self._release_pool_slot()
+            raise
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            if self.connection is None:
+                self._release_pool_slot()
+
+    def check_health(self):
+        """
+        Closes a reused connection that stopped working, so the next query
+        opens a new one
+        """
+        if self.connection is None or self.in_atomic_block or \
+            not self.settings_dict.get('HEALTH_CHECKS'):
+            return
+
+        if not self.is_usable():
+            try:
+                self.close()
+            except DatabaseError:
+                pass
+
+    def close_if_contended(self):
+        """
+        Closes the connection if other threads need its pool slot
+        """
+        pool = self.get_pool()
+        if self.connection is None or self.in_atomic_block or \
+            pool is None or not pool.contended:
+            return
+
+        try:
+            self.close()
+        except DatabaseError:
+            pass
+
+    def _release_pool_slot(self):
+        if self._pool_slot is not None:
+            self._pool_slot.release()
+            self._pool_slot = None
+
+def check_connections(**kwargs):
+    for connection in connections.all():
+        if isinstance(connection, ManagedConnectionMixin):
+            connection.check_health()
+
+def release_contended_connections(**kwargs):
+    for connection in connections.all():
+        if isinstance(connection, ManagedConnectionMixin):
+            connection.close_if_contended()
+
+request_started.connect(check_connections)
+request_finished.connect(release_contended_connections)
@@ -0,0 +1,91 @@
+# Python
+from itertools import count
+import random
+import threading
+import time
+
+# Django
+from django.db.backends.sqlite3 import base
+from django.db.utils import OperationalError
+
+# Local
+from ..mixins import get_shared, ManagedConnectionMixin
+
+class DatabaseWrapper(ManagedConnectionMixin, base.DatabaseWrapper):
+    """
+    SQLite backend with managed connections that applies the PRAGMAS
+    setting, a list of (name, value), to every new connection.
+
+    With TRANSACTION_MODE = 'IMMEDIATE' transactions take SQLite's write
+    lock when they begin, so one that has read can no longer fail with
+    "database is locked" when it goes on to write. Threads of a process
+    queue for the lock on a per-database lock instead of competing inside
+    SQLite; across processes the busy timeout (OPTIONS['timeout']) waits
+    for it. If it is still held, BEGIN is retried WRITE_RETRIES times,
+    backing off exponentially from WRITE_BACKOFF seconds.
+    """
+    _write_lock = None
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict.get('PRAGMAS', ()):
+            conn.execute('PRAGMA {0} = {1}'.format(name, value))
+
+        return conn
+
+    def is_usable(self):
+        try:
+            self.connection.execute('SELECT 1')
+        except self.Database.Error:
+            return False
+
+        return True
+
+    def _start_transaction_under_autocommit(self):
+        if self.settings_dict.get('TRANSACTION_MODE') != 'IMMEDIATE':
+            return super()._start_transaction_under_autocommit()
+
+        timeout = self.settings_dict.get('OPTIONS', {}).get('timeout', 5)
+        lock = get_shared(('writes', self.alias, self.settings_dict['NAME']),
+            threading.Lock)
+        if not lock.acquire(timeout=timeout):
+            raise OperationalError('database is locked')
+        self._write_lock = lock
+
+        try:
+            retries = self.settings_dict.get('WRITE_RETRIES', 0)
+            backoff = self.settings_dict.get('WRITE_BACKOFF', 0.05)
+            for attempt in count():
+                try:
+                    self.cursor().execute('BEGIN IMMEDIATE')
+                    return
+                except OperationalError as e:
+                    if 'locked' not in str(e) or attempt >= retries:
+                        raise
+                time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+        except Exception:
+            self._release_write_lock()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self._release_write_lock()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self._release_write_lock()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self._release_write_lock()
+
+    def _release_write_lock(self):
+        if self._write_lock is not None:
+            self._write_lock.release()
+            self._write_lock = None
@@ -0,0 +1,61 @@
+# Django
+from django.utils.dateparse import parse_datetime
+
+# External
+from rest_framework import exceptions
+from rest_framework.filters import BaseFilterBackend
+
+# Local
+from .relations import resolve_pk
+
+def parse_boolean(value):
+    value = value.strip().lower()
+    if value in ('true', '1'):
+        return True
+    if value in ('false', '0'):
+        return False
+    raise ValueError('Expected true or false.')
+
+def parse_timestamp(value):
+    timestamp = parse_datetime(value)
+    if timestamp is None:
+        raise ValueError('Expected an ISO 8601 timestamp.')
+    return timestamp
+
+def parse_string(value):
+    return value
+
+def hyperlink_parser(view_name):
+    """
+    Returns a parser accepting a hyperlink to view_name or a primary key
+    """
+    def parse(value):
+        if value.isdigit():
+            return int(value)
+        return resolve_pk(value, view_name)
+
+    return parse
+
+class QueryParameterFilter(BaseFilterBackend):
+    """
+    Filters on the query parameters named in the view's filter_fields.
+
+    filter_fields maps each parameter to a parser for its value; the
+    parameter is used as the queryset lookup, e.g. 'updated_at__gte'.
+    Unparseable values are rejected with 400. Only list lookups that an
+    index serves, since any parameter may be combined with pagination.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        filters = {}
+        for param, parse in getattr(view, 'filter_fields', {}).items():
+            value = request.query_params.get(param)
+            if value is None:
+                continue
+
+            try:
+                filters[param] = parse(value)
+            except ValueError as e:
+                raise exceptions.ValidationError({param: str(e)})
+
+        return queryset.filter(**filters) if filters else queryset
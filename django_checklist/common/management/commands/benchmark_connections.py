@@ -0,0 +1,113 @@
+# Python
+import os
+import tempfile
+import threading
+import time
+
+# Django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+from django.db.utils import ConnectionHandler, OperationalError
+
+class Command(BaseCommand):
+    help = ('Simulates requests against a throwaway SQLite file and compares '
+        'opening a connection per request with reusing a persistent, '
+        'health checked one, then concurrent writers in deferred and '
+        'immediate transaction mode.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--transactions', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            name = os.path.join(directory, 'db.sqlite3')
+            for label, max_age in (('per request', 0), ('persistent', 60)):
+                latency, opened = self._measure(dict(
+                    settings.DATABASES['default'], NAME=name,
+                    CONN_MAX_AGE=max_age), options['requests'])
+                self.stdout.write('{0:<12} {1:.3f} ms/request, {2} '
+                    'connections opened'.format(label, latency * 1000, opened))
+
+            for mode in (None, 'IMMEDIATE'):
+                elapsed, failed = self._measure_writers(dict(
+                    settings.DATABASES['default'], NAME=name,
+                    TRANSACTION_MODE=mode), options['writers'],
+                    options['transactions'])
+                total = options['writers'] * options['transactions']
+                self.stdout.write('{0:<12} {1} of {2} write transactions '
+                    'failed, {3:.0f} committed/s'.format(
+                    (mode or 'DEFERRED').lower(), failed, total,
+                    (total - failed) / elapsed))
+
+    def _measure(self, settings_dict, requests):
+        """
+        Returns the mean time per request and the connections opened
+        """
+        connection = ConnectionHandler({'default': settings_dict})['default']
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection)
+        connection_created.connect(count, weak=False)
+
+        try:
+            start = time.perf_counter()
+            for i in range(requests):
+                # What the request_started and request_finished handlers do
+                connection.check_health()
+                connection.close_if_unusable_or_obsolete()
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                connection.close_if_unusable_or_obsolete()
+                connection.close_if_contended()
+            latency = (time.perf_counter() - start) / requests
+        finally:
+            connection_created.disconnect(count)
+            connection.close()
+
+        return latency, len([conn for conn in opened if conn is connection])
+
+    def _measure_writers(self, settings_dict, writers, transactions):
+        """
+        Runs writers threads that each read then write in transactions
+        transactions and returns the elapsed time and failures
+        """
+        setup = ConnectionHandler({'default': settings_dict})['default']
+        with setup.cursor() as cursor:
+            cursor.execute('CREATE TABLE IF NOT EXISTS counter (n integer)')
+        setup.close()
+        failures = []
+
+        def write():
+            connection = ConnectionHandler({'default': settings_dict})[
+                'default']
+            for i in range(transactions):
+                try:
+                    # What transaction.atomic() does outside the handler
+                    connection.set_autocommit(False,
+                        force_begin_transaction_with_broken_autocommit=True)
+                    try:
+                        with connection.cursor() as cursor:
+                            cursor.execute('SELECT COUNT(*) FROM counter')
+                            cursor.execute('INSERT INTO counter VALUES (1)')
+                        connection.commit()
+                    except OperationalError:
+                        connection.rollback()
+                        raise
+                    finally:
+                        connection.set_autocommit(True)
+                except OperationalError:
+                    failures.append(1)
+            connection.close()
+
+        threads = [threading.Thread(target=write) for i in range(writers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return time.perf_counter() - start, len(failures)
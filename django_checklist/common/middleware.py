@@ -0,0 +1,35 @@
+# Django
+from django.conf import settings
+
+# Local
+from .profiling import (get_server_timing, install_cursor_wrappers,
+    route_metrics, start_profile, stop_profile)
+
+class ProfileMiddleware(object):
+    """
+    Records query count, DB time, serializer time and permission check time
+    per request.
+
+    The totals are added to the response as a Server-Timing header and to
+    the per route metrics served by the metrics endpoint. Place it first in
+    MIDDLEWARE_CLASSES so the total covers the other middleware.
+    """
+
+    def process_request(self, request):
+        install_cursor_wrappers()
+        start_profile()
+
+    def process_response(self, request, response):
+        profile = stop_profile()
+        if profile is None:
+            return response
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        route = '{0} {1}'.format(request.method, resolver_match.view_name
+            if resolver_match is not None else '<unresolved>')
+        route_metrics.record(route, profile)
+
+        if getattr(settings, 'SERVER_TIMING_HEADER', True):
+            response['Server-Timing'] = get_server_timing(profile)
+
+        return response
@@ -0,0 +1,358 @@
+# Python
+import calendar
+import hashlib
+import uuid
+
+# Django
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch
+from django.utils.http import (http_date, parse_etags, parse_http_date_safe,
+    quote_etag)
+
+# External
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+# Local
+from .profiling import timed
+from .values import get_values_reader
+
+def _get_model_field(model, name):
+    """
+    Returns the model field called name, or None for non-field attributes.
+    Reverse relations are also found by accessor name, e.g. item_set.
+    """
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        for relation in model._meta.related_objects:
+            if relation.get_accessor_name() == name:
+                return relation
+        return None
+
+def _plan_serializer(serializer, model, prefix=''):
+    """
+    Walks serializer fields and returns (select_related, prefetch_related)
+    lookups needed to render them without per-row queries
+    """
+    select_related = []
+    prefetch_related = []
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+
+        source = field.source_attrs[0] if field.source_attrs else None
+        model_field = _get_model_field(model, source) if source else None
+        if model_field is None or not model_field.is_relation:
+            continue
+
+        lookup = prefix + source
+        many = model_field.many_to_many or model_field.one_to_many
+
+        if isinstance(field, ListSerializer):
+            field = field.child
+
+        if isinstance(field, BaseSerializer):
+            # Nested serializers are planned recursively
+            nested_select, nested_prefetch = _plan_serializer(field,
+                model_field.related_model, lookup + '__')
+            if many:
+                prefetch_related.append(lookup)
+                prefetch_related.extend(nested_select + nested_prefetch)
+            else:
+                select_related.append(lookup)
+                select_related.extend(nested_select)
+                prefetch_related.extend(nested_prefetch)
+            continue
+
+        if isinstance(field, ManyRelatedField):
+            prefetch_related.append(lookup)
+        elif isinstance(field, RelatedField):
+            # Hyperlinks and primary keys on a forward relation only need the
+            # local foreign key column
+            if not field.use_pk_only_optimization():
+                select_related.append(lookup)
+
+    return select_related, prefetch_related
+
+class QueryPlanMixin(object):
+    """
+    Applies select_related/prefetch_related to the viewset queryset.
+
+    Lookups are inferred from the serializer fields unless the viewset
+    declares select_related_fields or prefetch_related_fields. Writes are
+    not prefetched, since DRF would render an update from the related rows
+    prefetched before it.
+    """
+    select_related_fields = None
+    prefetch_related_fields = None
+    # Querysets to prefetch lookups with, e.g. to order them
+    prefetch_querysets = {}
+
+    _query_plans = {}
+
+    def get_query_plan(self):
+        serializer_class = self.get_serializer_class()
+        key = (type(self), serializer_class)
+        if key not in QueryPlanMixin._query_plans:
+            select_related, prefetch_related = _plan_serializer(
+                serializer_class(context=self.get_serializer_context()),
+                serializer_class.Meta.model)
+
+            if self.select_related_fields is not None:
+                select_related = list(self.select_related_fields)
+            if self.prefetch_related_fields is not None:
+                prefetch_related = list(self.prefetch_related_fields)
+
+            QueryPlanMixin._query_plans[key] = (tuple(select_related),
+                tuple(prefetch_related))
+
+        return QueryPlanMixin._query_plans[key]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        select_related, prefetch_related = self.get_query_plan()
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related and self.request.method in SAFE_METHODS:
+            queryset = queryset.prefetch_related(*[
+                Prefetch(lookup, queryset=self.prefetch_querysets[lookup])
+                if lookup in self.prefetch_querysets else lookup
+                for lookup in prefetch_related])
+
+        return queryset
+
+class ConditionalGetMixin(object):
+    """
+    Adds ETag and Last-Modified headers to list and retrieve responses.
+
+    Validators come from MAX(updated_at) and the row count of the filtered
+    queryset (or the instance's own updated_at), so a matching
+    If-None-Match or If-Modified-Since is answered with 304 without running
+    the serializer. Last-Modified cannot see deletions, so clients should
+    prefer If-None-Match.
+    """
+    last_modified_field = 'updated_at'
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        state = queryset.order_by().aggregate(
+            last_modified=Max(self.last_modified_field), count=Count('pk'))
+
+        return self.get_conditional_response(request, state['last_modified'],
+            state['count'], lambda: super(ConditionalGetMixin, self).list(
+                request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        last_modified, version = self.get_instance_validators(instance)
+
+        return self.get_conditional_response(request, last_modified, version,
+            lambda: Response(self.get_serializer(instance).data))
+
+    def get_instance_validators(self, instance):
+        """
+        Returns (last modified, version) of a retrieve response
+        """
+        return getattr(instance, self.last_modified_field), instance.pk
+
+    def get_conditional_response(self, request, last_modified, version, 
+        get_response):
+        """
+        Returns 304 if the request validators match, else get_response()
+        """
+        renderer = getattr(request, 'accepted_renderer', None)
+        tokens = [request.get_full_path(), str(request.user.pk), str(version), 
+            last_modified.isoformat() if last_modified else '', 
+            getattr(renderer, 'format', '')]
+        digest = hashlib.md5(':'.join(tokens).encode('utf-8')).hexdigest()
+        timestamp = calendar.timegm(last_modified.utctimetuple()) \
+            if last_modified else None
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+
+        if if_none_match:
+            etags = parse_etags(if_none_match)
+            not_modified = digest in etags or '*' in etags
+        elif if_modified_since and timestamp is not None:
+            not_modified = timestamp <= if_modified_since
+        else:
+            not_modified = False
+
+        if not_modified:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = get_response()
+
+        response['ETag'] = quote_etag(digest)
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+
+        return response
+
+def _incr(cache, key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+        return 1
+
+def get_response_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')]
+
+def invalidate_response_cache(prefix):
+    """
+    Retires every cached response stored under prefix once the current
+    transaction commits, so a request cannot cache rows read before the
+    commit under the new version
+    """
+    transaction.on_commit(lambda: get_response_cache().set(
+        '{0}:version'.format(prefix), uuid.uuid4().hex, None))
+
+def _get_version(cache, prefix):
+    """
+    Returns the version responses under prefix are stored with. Versions
+    are never reused, so a missing one starts a new namespace rather than
+    reviving entries stored under an evicted one.
+    """
+    key = '{0}:version'.format(prefix)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, None):
+            # Another process started one first
+            version = cache.get(key) or version
+
+    return version
+
+def get_response_cache_stats(prefix):
+    cache = get_response_cache()
+    stats = cache.get_many(['{0}:hits'.format(prefix), 
+        '{0}:misses'.format(prefix)])
+
+    return {
+        'hits': stats.get('{0}:hits'.format(prefix), 0), 
+        'misses': stats.get('{0}:misses'.format(prefix), 0)
+    }
+
+class ResponseCacheMixin(object):
+    """
+    Caches list and retrieve response data in the Django cache.
+
+    Only for read-mostly endpoints whose responses do not depend on the
+    user. Entries are keyed by absolute URL and renderer format under a
+    version that invalidate_response_cache() replaces, and keep their ETag so
+    a hit can still answer If-None-Match with 304. Hits and misses are
+    counted and sent in an X-Cache header.
+    """
+    response_cache_prefix = None
+    response_cache_headers = ('ETag', 'Last-Modified')
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(request, 
+            lambda: super(ResponseCacheMixin, self).list(
+                request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(request, 
+            lambda: super(ResponseCacheMixin, self).retrieve(
+                request, *args, **kwargs))
+
+    def get_cached_response(self, request, get_response, prefix=None, 
+        user=None):
+        """
+        Returns the cached response for request, else get_response()'s.
+        Responses that depend on the user must pass it to be keyed by it.
+        """
+        prefix = prefix or self.response_cache_prefix
+        cache = get_response_cache()
+        version = _get_version(cache, prefix)
+        renderer = getattr(request, 'accepted_renderer', None)
+        url = '{0}:{1}:{2}'.format(request.build_absolute_uri(), 
+            getattr(renderer, 'format', ''), user.pk if user else '')
+        key = '{0}:{1}:{2}'.format(prefix, version, 
+            hashlib.md5(url.encode('utf-8')).hexdigest())
+
+        cached = cache.get(key)
+        if cached is not None:
+            _incr(cache, '{0}:hits'.format(prefix))
+            data, headers = cached
+            etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+            if 'ETag' in headers and headers['ETag'].strip('"') in etags:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = Response(data)
+            for header, value in headers.items():
+                response[header] = value
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _incr(cache, '{0}:misses'.format(prefix))
+        response = get_response()
+        if response.status_code == status.HTTP_200_OK:
+            headers = {header: response[header] 
+                for header in self.response_cache_headers if header in response}
+            cache.set(key, (response.data, headers), 
+                getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+        response['X-Cache'] = 'MISS'
+        return response
+
+class ProfileMixin(object):
+    """
+    Adds permission checks and serializer validation and rendering to the
+    request profile kept by ProfileMiddleware.
+
+    Serializer time includes any queries the serializer runs, so it overlaps
+    with DB time.
+    """
+
+    def check_permissions(self, request):
+        with timed('permissions'):
+            super().check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with timed('permissions'):
+            super().check_object_permissions(request, obj)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        for name in ('run_validation', 'to_representation'):
+            setattr(serializer, name, timed('serialize')(
+                getattr(serializer, name)))
+
+        return serializer
+
+class ValuesListMixin(object):
+    """
+    Serves list responses from .values() rows through a ValuesReader.
+
+    The output is identical to the serializer's, without instantiating a
+    model and reversing its hyperlinks per row. Views whose serializer has
+    fields a ValuesReader cannot render fall back to the regular list.
+    """
+
+    def list(self, request, *args, **kwargs):
+        reader = get_values_reader(self.get_serializer())
+        if reader is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.prefetch_related(None).values()
+
+        page = self.paginate_queryset(rows)
+        with timed('serialize'):
+            data = reader.read(rows if page is None else page)
+
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
@@ -0,0 +1,164 @@
+# Python
+from functools import reduce
+import json
+import operator
+from types import SimpleNamespace
+
+# Django
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# External
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+    _positive_int, _reverse_ordering)
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Cursor pagination over a composite, unique ordering.
+
+    The cursor position stores every ordering value (the primary key is
+    always appended as a tie-breaker, in the leading term's direction) so
+    pages are fetched with a keyset comparison instead of an offset. Rows
+    inserted while a client is paging never shift or duplicate the rows on
+    later pages.
+
+    Views may set `ordering`; the page size defaults to the PAGE_SIZE setting
+    and may be changed per request with `page_size`, up to `max_page_size`.
+    Querysets of model instances and of .values() rows are both supported.
+    """
+    ordering = ('created_at', 'id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(request.query_params[self.page_size_query_param],
+                strict=True, cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, request, queryset, view):
+        if getattr(view, 'ordering', None) and not any(
+            hasattr(backend, 'get_ordering')
+            for backend in getattr(view, 'filter_backends', [])):
+            ordering = view.ordering
+            ordering = (ordering,) if isinstance(ordering, str) else ordering
+        else:
+            ordering = super().get_ordering(request, queryset, view)
+
+        names = [name.lstrip('-') for name in ordering]
+        if 'id' not in names and 'pk' not in names:
+            # Following the leading direction lets SQLite walk an index on
+            # the ordering, which ends in the rowid, without a sort step
+            tie_breaker = '-id' if ordering[0].startswith('-') else 'id'
+            ordering = tuple(ordering) + (tie_breaker,)
+
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, current_position = False, None
+        else:
+            reverse, current_position = self.cursor.reverse, self.cursor.position
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            queryset = queryset.filter(self._get_keyset_filter(queryset.model,
+                current_position, reverse))
+
+        # Fetch one extra row to determine if there is a following page
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+
+        has_following = len(results) > len(self.page)
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = current_position is not None
+
+        # Neighbouring pages start strictly after the rows on this page
+        if self.page:
+            self.next_position = self._get_position(queryset.model,
+                self.page[-1], self.ordering)
+            self.previous_position = self._get_position(queryset.model,
+                self.page[0], self.ordering)
+        else:
+            self.next_position = self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        cursor = Cursor(offset=0, reverse=False, position=self.next_position)
+        return self.encode_cursor(cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        cursor = Cursor(offset=0, reverse=True, position=self.previous_position)
+        return self.encode_cursor(cursor)
+
+    def _get_position(self, model, instance, ordering):
+        if isinstance(instance, dict):
+            # .values() rows are keyed by attname like model attributes
+            instance = SimpleNamespace(**instance)
+
+        values = []
+        for name in ordering:
+            name = name.lstrip('-')
+            field = model._meta.pk if name == 'pk' else \
+                model._meta.get_field(name)
+            values.append(field.value_to_string(instance))
+
+        return json.dumps(values)
+
+    def _get_keyset_filter(self, model, position, reverse):
+        """
+        Returns a Q object selecting rows strictly after position
+        """
+        try:
+            values = json.loads(position)
+            if len(values) != len(self.ordering):
+                raise ValueError
+            keys = []
+            for name, value in zip(self.ordering, values):
+                attr = name.lstrip('-')
+                field = model._meta.pk if attr == 'pk' else \
+                    model._meta.get_field(attr)
+                keys.append((attr, name.startswith('-'), field.to_python(value)))
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # (a > x) OR (a = x AND b > y) OR ...
+        clauses = []
+        equal = {}
+        for attr, is_reversed, value in keys:
+            lookup = '__lt' if reverse != is_reversed else '__gt'
+            clause = dict(equal)
+            clause[attr + lookup] = value
+            clauses.append(Q(**clause))
+            equal[attr] = value
+
+        return reduce(operator.or_, clauses)
@@ -0,0 +1,175 @@
+# Python
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+import time
+
+# Django
+from django.db import connections
+from django.db.backends.utils import CursorDebugWrapper, CursorWrapper
+
+# Upper bounds in milliseconds of the request duration histogram buckets
+BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+PHASES = ('db', 'serialize', 'permissions')
+
+_local = threading.local()
+
+class RequestProfile(object):
+    """
+    Query count and time spent per phase of the current request
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.timings = OrderedDict((name, 0.0) for name in PHASES)
+        self.total = None
+
+def start_profile():
+    _local.profile = RequestProfile()
+    return _local.profile
+
+def stop_profile():
+    profile = getattr(_local, 'profile', None)
+    _local.profile = None
+    if profile is not None:
+        profile.total = time.perf_counter() - profile.start
+    return profile
+
+@contextmanager
+def timed(name):
+    """
+    Adds the time spent in the block to the current profile, if any
+    """
+    profile = getattr(_local, 'profile', None)
+    if profile is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.timings[name] += time.perf_counter() - start
+
+class _ProfiledCursorMixin(object):
+    def execute(self, sql, params=None):
+        profile = getattr(_local, 'profile', None)
+        if profile is None:
+            return super().execute(sql, params)
+
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            profile.queries += 1
+            profile.timings['db'] += time.perf_counter() - start
+
+    def executemany(self, sql, param_list):
+        profile = getattr(_local, 'profile', None)
+        if profile is None:
+            return super().executemany(sql, param_list)
+
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, param_list)
+        finally:
+            profile.queries += 1
+            profile.timings['db'] += time.perf_counter() - start
+
+class ProfiledCursorWrapper(_ProfiledCursorMixin, CursorWrapper):
+    pass
+
+class ProfiledCursorDebugWrapper(_ProfiledCursorMixin, CursorDebugWrapper):
+    pass
+
+def install_cursor_wrappers():
+    """
+    Makes this thread's connections hand out profiled cursors.
+
+    Connection handlers are per thread, so this is called on every request;
+    connections that are already wrapped are skipped.
+    """
+    for connection in connections.all():
+        if getattr(connection, '_profiled', False):
+            continue
+
+        connection.make_cursor = lambda cursor, connection=connection: \
+            ProfiledCursorWrapper(cursor, connection)
+        connection.make_debug_cursor = lambda cursor, connection=connection: \
+            ProfiledCursorDebugWrapper(cursor, connection)
+        connection._profiled = True
+
+def get_server_timing(profile):
+    """
+    Returns a Server-Timing header value for profile
+    """
+    metrics = ['db;desc="{0} queries";dur={1:.3f}'.format(profile.queries,
+        profile.timings['db'] * 1000)]
+    for name in PHASES[1:]:
+        metrics.append('{0};dur={1:.3f}'.format(name,
+            profile.timings[name] * 1000))
+    metrics.append('total;dur={0:.3f}'.format(profile.total * 1000))
+
+    return ', '.join(metrics)
+
+class RouteMetrics(object):
+    """
+    Thread-safe per route totals and request duration histograms
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route, profile):
+        with self._lock:
+            metrics = self._routes.get(route)
+            if metrics is None:
+                metrics = self._routes[route] = dict({'count': 0,
+                    'queries': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'histogram': [0] * (len(BUCKETS) + 1)},
+                    **{name + '_ms': 0.0 for name in PHASES})
+
+            total_ms = profile.total * 1000
+            metrics['count'] += 1
+            metrics['queries'] += profile.queries
+            for name, value in profile.timings.items():
+                metrics[name + '_ms'] += value * 1000
+            metrics['total_ms'] += total_ms
+            metrics['max_ms'] = max(metrics['max_ms'], total_ms)
+            metrics['histogram'][bisect_left(BUCKETS, total_ms)] += 1
+
+    def snapshot(self):
+        """
+        Returns per route averages and non-cumulative histogram counts
+        """
+        with self._lock:
+            routes = {route: dict(metrics, histogram=list(metrics['histogram']))
+                for route, metrics in self._routes.items()}
+
+        result = OrderedDict()
+        for route in sorted(routes):
+            metrics = routes[route]
+            count = metrics['count']
+            summary = OrderedDict([('count', count),
+                ('avg_queries', metrics['queries'] / count)])
+            for name in PHASES + ('total',):
+                summary['avg_{0}_ms'.format(name)] = \
+                    metrics[name + '_ms'] / count
+            summary['max_ms'] = metrics['max_ms']
+
+            bounds = [str(bound) for bound in BUCKETS] + ['+Inf']
+            summary['histogram'] = OrderedDict(zip(bounds,
+                metrics['histogram']))
+            result[route] = summary
+
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+route_metrics = RouteMetrics()
@@ -0,0 +1,54 @@
+# Python
+from urllib.parse import urlparse
+
+# Django
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.urlresolvers import get_script_prefix, resolve, Resolver404
+
+# External
+from rest_framework.relations import HyperlinkedRelatedField
+
+def resolve_pk(url, view_name):
+    """
+    Returns the primary key a hyperlink to view_name points at.
+
+    Raises ValueError if url is not a string or does not match view_name.
+    """
+    if not isinstance(url, str):
+        raise ValueError('Expected URL string')
+
+    path = urlparse(url).path
+
+    prefix = get_script_prefix()
+    if path.startswith(prefix):
+        path = '/' + path[len(prefix):]
+
+    try:
+        match = resolve(path)
+    except Resolver404:
+        raise ValueError('No URL match')
+
+    if match.view_name != view_name or 'pk' not in match.kwargs:
+        raise ValueError('Incorrect URL match')
+
+    return int(match.kwargs['pk'])
+
+class CachedHyperlinkedRelatedField(HyperlinkedRelatedField):
+    """
+    Hyperlinked relation that resolves objects from a per-request cache.
+
+    The serializer context may carry 'related_objects', a dictionary of
+    model -> {pk: instance} loaded up front by the view. Hyperlinks found in
+    the cache cost no query; anything else falls back to the queryset.
+    """
+
+    def get_object(self, view_name, view_args, view_kwargs):
+        related_objects = self.context.get('related_objects', {})
+        cache = related_objects.get(self.get_queryset().model)
+        if cache is None:
+            return super().get_object(view_name, view_args, view_kwargs)
+
+        try:
+            return cache[int(view_kwargs[self.lookup_url_kwarg])]
+        except KeyError:
+            raise ObjectDoesNotExist
@@ -1,5 +1,6 @@
 # External
-from rest_framework.serializers import HyperlinkedModelSerializer
+from rest_framework.serializers import (HyperlinkedModelSerializer, 
+    IntegerField)
 
 # Local
 from .models import Tag
@@ -7,3 +8,13 @@ from .models import Tag
 class TagSerializer(HyperlinkedModelSerializer):
     class Meta:
         model = Tag
+
+class TagUsageSerializer(TagSerializer):
+    """
+    Adds the number of Checklists tagged, read from a checklist_count
+    annotation so a list costs one aggregate query
+    """
+    checklist_count = IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        pass
@@ -0,0 +1,58 @@
+# Django
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+    pre_delete)
+from django.dispatch import receiver
+
+# Local
+from .autocomplete import get_tag_relations, tag_index
+from .mixins import invalidate_response_cache
+from .models import Tag
+
+TAG_CACHE_PREFIX = 'common:tags'
+TAG_STATS_CACHE_PREFIX = 'common:tag-stats'
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def _invalidate_tag_cache(sender, **kwargs):
+    invalidate_response_cache(TAG_CACHE_PREFIX)
+    invalidate_response_cache(TAG_STATS_CACHE_PREFIX)
+
+@receiver(post_save, sender=Tag)
+def _index_tag(sender, instance, **kwargs):
+    tag_index.add(instance.pk, instance.name)
+
+@receiver(post_delete, sender=Tag)
+def _unindex_tag(sender, instance, **kwargs):
+    tag_index.remove(instance.pk)
+
+def _get_links(relation, instance, reverse, pk_set=None):
+    """
+    Returns the tag ids of instance's links through relation, optionally
+    only those to pk_set
+    """
+    model, through, source, target = relation
+    filters = {target if reverse else source: instance.pk}
+    if pk_set is not None:
+        filters['{0}__in'.format(source if reverse else target)] = pk_set
+    return through.objects.filter(**filters).values_list(target, flat=True)
+
+def _count_tagging(sender, instance, action, reverse, pk_set, **kwargs):
+    relation = _tag_relations[sender]
+    if action == 'post_add' and pk_set:
+        # From the Tag side pk_set holds the tagged objects
+        tag_index.count([instance.pk] * len(pk_set) if reverse else pk_set, 1)
+    elif action == 'pre_remove' and pk_set:
+        tag_index.count(_get_links(relation, instance, reverse, pk_set), -1)
+    elif action == 'pre_clear':
+        tag_index.count(_get_links(relation, instance, reverse), -1)
+
+def _count_untagged(sender, instance, **kwargs):
+    # Through rows of auto-created models are deleted without signals
+    tag_index.count(_get_links(_tag_relations[sender], instance, False), -1)
+
+_tag_relations = {}
+for relation in get_tag_relations():
+    model, through = relation[:2]
+    _tag_relations[through] = _tag_relations[model] = relation
+    m2m_changed.connect(_count_tagging, sender=through)
+    pre_delete.connect(_count_untagged, sender=model)
@@ -1,16 +1,42 @@
 # -*- coding: utf-8 -*-
+# Python
+import asyncio
+from contextlib import contextmanager
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import mock
+
 # Django
-from django.db.utils import IntegrityError
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.transaction import TransactionManagementError
+from django.db.utils import (ConnectionHandler, IntegrityError,
+    NotSupportedError, OperationalError)
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 
 # External
 from rest_framework import status
 from rest_framework.reverse import reverse
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 
 # Local
+from .asgi import ASGIHandler
+from .autocomplete import tag_index
+from .bulk import bulk_create
+from .mixins import get_response_cache, invalidate_response_cache
 from .models import Tag
+from .profiling import route_metrics
+from .signals import TAG_CACHE_PREFIX
 from django_checklist.django_auth.mixins import PermissionsTestCaseMixin
+from django_checklist.django_auth.models import APIToken, hash_key
+from django_checklist.todo.models import Checklist
 
 class TagCreationTestCase(TestCase):
     def setUp(self):
@@ -35,6 +61,29 @@ class TagCreationTestCase(TestCase):
         tag = Tag.objects.create(name=self.name4)
         self.assertEqual(tag.name, self.name4)
 
+class BulkCreateTestCase(TransactionTestCase):
+    def setUp(self):
+        Tag.objects.create(name='sports')
+
+    def test_pks(self):
+        with transaction.atomic():
+            tags = bulk_create(Tag, [Tag(name='work'), Tag(name='home')])
+
+        self.assertEqual([Tag.objects.get(pk=tag.pk).name for tag in tags],
+            ['work', 'home'])
+
+    def test_outside_atomic(self):
+        with self.assertRaises(TransactionManagementError):
+            bulk_create(Tag, [Tag(name='work')])
+        self.assertFalse(Tag.objects.filter(name='work').exists())
+
+    def test_unsupported_backend(self):
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            with self.assertRaises(NotSupportedError):
+                with transaction.atomic():
+                    bulk_create(Tag, [Tag(name='work')])
+        self.assertFalse(Tag.objects.filter(name='work').exists())
+
 class TagAPIListTestCase(APITestCase, PermissionsTestCaseMixin):
     def setUp(self):
         self.initialize()
@@ -110,3 +159,574 @@ class TagAPIDetailTestCase(APITestCase, PermissionsTestCaseMixin):
         self.client.force_authenticate(user=self.basic_user1)
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class TagAPICacheTestCase(APITransactionTestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        get_response_cache().clear()
+        self.initialize()
+        self.tag, created = Tag.objects.get_or_create(name='usa')
+        self.url = reverse('tag-list')
+        self.detail_url = reverse('tag-detail', args=(self.tag.id,))
+        self.stats_url = reverse('tag-cache-stats')
+
+    def test_list_hit(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+    def test_hit_not_modified(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_invalidated_on_save(self):
+        self.client.get(self.detail_url)
+        self.tag.name = 'china'
+        self.tag.save()
+
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['name'], 'china')
+
+    def test_invalidated_on_commit(self):
+        key = '{0}:version'.format(TAG_CACHE_PREFIX)
+        self.client.get(self.detail_url)
+        version = get_response_cache().get(key)
+
+        with transaction.atomic():
+            self.tag.name = 'china'
+            self.tag.save()
+            self.assertEqual(get_response_cache().get(key), version)
+        self.assertNotEqual(get_response_cache().get(key), version)
+
+        version = get_response_cache().get(key)
+        try:
+            with transaction.atomic():
+                self.tag.delete()
+                raise IntegrityError
+        except IntegrityError:
+            pass
+        self.assertEqual(get_response_cache().get(key), version)
+
+    def test_version_evicted(self):
+        get_response_cache().clear()
+        invalidate_response_cache(TAG_CACHE_PREFIX)
+        self.client.get(self.detail_url)
+        self.tag.name = 'china'
+        self.tag.save()
+
+        # Versions are not reused, so the response cached above stays retired
+        get_response_cache().delete('{0}:version'.format(TAG_CACHE_PREFIX))
+        invalidate_response_cache(TAG_CACHE_PREFIX)
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['name'], 'china')
+
+    def test_invalidated_on_delete(self):
+        self.client.get(self.url)
+        self.tag.delete()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'], [])
+
+    def test_invalidated_on_tagging(self):
+        checklist = Checklist.objects.create(user=self.basic_user1, 
+            title='Shopping')
+        self.client.get(self.url)
+        checklist.tags.add(self.tag)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_stats(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.client.get(self.url)
+
+        response = self.client.get(self.stats_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'hits': 2, 'misses': 1})
+
+class TagAutocompleteTestCase(APITestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        self.url = reverse('tag-autocomplete')
+        self.tags = {name: Tag.objects.create(name=name) for name in 
+            ('garden', 'Groceries', 'gym', 'work')}
+        tag_index.invalidate()
+
+        self.checklists = [Checklist.objects.create(user=self.basic_user1, 
+            title='Checklist {0}'.format(i)) for i in range(3)]
+        for checklist in self.checklists:
+            checklist.tags.add(self.tags['gym'])
+        self.checklists[0].tags.add(self.tags['Groceries'])
+
+    def _get_names(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [result['name'] for result in response.data['results']]
+
+    def test_ranked_by_count(self):
+        response = self.client.get(self.url, {'q': 'g'})
+        self.assertEqual([(result['name'], result['count']) 
+            for result in response.data['results']], 
+            [('gym', 3), ('Groceries', 1), ('garden', 0)])
+        self.assertEqual(response.data['results'][0]['url'], 
+            'http://testserver' + reverse('tag-detail', 
+            args=[self.tags['gym'].pk]))
+
+    def test_prefix(self):
+        self.assertEqual(self._get_names({'q': 'GR'}), ['Groceries'])
+        self.assertEqual(self._get_names({'q': 'gx'}), [])
+        self.assertEqual(self._get_names({'q': 'g', 'limit': 1}), ['gym'])
+
+    def test_no_queries(self):
+        self.client.get(self.url, {'q': 'g'})
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url, {'q': 'wo'})
+        self.assertFalse([query for query in context.captured_queries 
+            if 'common_tag' in query['sql']])
+
+    def test_tag_signals(self):
+        self._get_names({'q': 'g'})
+        tag = self.tags['garden']
+        tag.name = 'allotment'
+        tag.save()
+        Tag.objects.create(name='golf')
+        self.tags['work'].delete()
+
+        self.assertEqual(self._get_names({'q': 'g'}), 
+            ['gym', 'Groceries', 'golf'])
+        self.assertEqual(self._get_names({'q': 'a'}), ['allotment'])
+        self.assertEqual(self._get_names({'q': 'w'}), [])
+
+    def test_tagging_signals(self):
+        self._get_names({'q': 'g'})
+        garden = self.tags['garden']
+        for checklist in self.checklists:
+            checklist.tags.add(garden)
+        garden.checklist.add(Checklist.objects.create(user=self.basic_user1, 
+            title='Another'))
+        self.assertEqual(self._get_names({'q': 'g'}), 
+            ['garden', 'gym', 'Groceries'])
+
+        self.checklists[0].tags.clear()
+        self.checklists[1].delete()
+        self.checklists[2].tags.remove(garden)
+        # Tags that were never linked are not counted down
+        self.checklists[2].tags.remove(self.tags['work'])
+        response = self.client.get(self.url, {'q': 'g'})
+        self.assertEqual([(result['name'], result['count']) 
+            for result in response.data['results']], 
+            [('garden', 1), ('gym', 1), ('Groceries', 0)])
+
+class TagStatsTestCase(APITransactionTestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        get_response_cache().clear()
+        self.initialize()
+        self.url = reverse('tag-stats')
+        self.tags = [Tag.objects.create(name=name) 
+            for name in ('home', 'work', 'travel')]
+
+        self.checklist1 = Checklist.objects.create(user=self.basic_user1, 
+            title='Checklist 1')
+        self.checklist1.tags.add(*self.tags[:2])
+        self.checklist2 = Checklist.objects.create(user=self.basic_user2, 
+            title='Checklist 2')
+        self.checklist2.tags.add(self.tags[1])
+
+    def _get_counts(self, params=None):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(result['name'], result['checklist_count']) 
+            for result in response.data['results']]
+
+    def test_counts(self):
+        self.assertEqual(self._get_counts(), 
+            [('work', 2), ('home', 1), ('travel', 0)])
+
+    def test_mine(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        self.assertEqual(self._get_counts({'mine': 'true'}), 
+            [('home', 1), ('work', 1)])
+
+        self.client.force_authenticate(user=self.basic_user2)
+        self.assertEqual(self._get_counts({'mine': 'true'}), [('work', 1)])
+
+    def test_mine_unauthenticated(self):
+        response = self.client.get(self.url, {'mine': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_one_query(self):
+        for i in range(10):
+            Tag.objects.create(name='tag{0}'.format(i))
+
+        with CaptureQueriesContext(connection) as context:
+            self._get_counts()
+        self.assertEqual(len([query for query in context.captured_queries 
+            if 'common_tag' in query['sql']]), 1)
+
+    def test_cached_and_invalidated(self):
+        self._get_counts()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+        self.checklist1.tags.add(self.tags[2])
+        self.assertEqual(self._get_counts(), 
+            [('work', 2), ('home', 1), ('travel', 1)])
+
+        self.checklist2.delete()
+        self.assertEqual(self._get_counts(), 
+            [('home', 1), ('travel', 1), ('work', 1)])
+
+    def test_mine_invalidated_on_commit(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        with transaction.atomic():
+            self.checklist1.tags.add(self.tags[2])
+            # Read before the commit, so it must not outlive it
+            response = self.client.get(self.url, {'mine': 'true'})
+            self.assertEqual(response['X-Cache'], 'MISS')
+
+        response = self.client.get(self.url, {'mine': 'true'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(self._get_counts({'mine': 'true'}), 
+            [('home', 1), ('travel', 1), ('work', 1)])
+
+class ProfileMiddlewareTestCase(APITestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        route_metrics.reset()
+        self.initialize()
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        Checklist.objects.create(user=self.basic_user1, title='Shopping')
+        self.url = reverse('checklist-list')
+        self.metrics_url = reverse('metrics-list')
+        self.reset_url = reverse('metrics-reset')
+
+    def test_server_timing(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+
+        timing = response['Server-Timing']
+        queries = re.search(r'db;desc="(\d+) queries";dur=[\d.]+', timing)
+        self.assertEqual(int(queries.group(1)), len(context.captured_queries))
+        for name in ('serialize', 'permissions', 'total'):
+            self.assertRegex(timing, r'{0};dur=[\d.]+'.format(name))
+
+    def test_metrics(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        self.client.get(self.url)
+        self.client.get(self.url)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(self.metrics_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        metrics = response.data['GET checklist-list']
+        self.assertEqual(metrics['count'], 2)
+        self.assertEqual(sum(metrics['histogram'].values()), 2)
+        self.assertGreater(metrics['avg_queries'], 0)
+        self.assertGreater(metrics['avg_total_ms'], 0)
+
+    def test_metrics_reset(self):
+        self.client.force_authenticate(user=self.admin)
+        self.client.get(self.metrics_url)
+
+        response = self.client.delete(self.reset_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(route_metrics.snapshot()), 
+            ['DELETE metrics-reset'])
+
+    def test_metrics_admin_only(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        response = self.client.get(self.metrics_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class ManagedConnectionTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.name = os.path.join(self.directory.name, 'db.sqlite3')
+        self.wrappers = []
+
+    def tearDown(self):
+        for wrapper in self.wrappers:
+            wrapper.close()
+
+    def _get_connection(self, **options):
+        settings_dict = dict(settings.DATABASES['default'], NAME=self.name, 
+            **options)
+        wrapper = ConnectionHandler({'default': settings_dict})['default']
+        self.wrappers.append(wrapper)
+        return wrapper
+
+    def _execute(self, wrapper, sql):
+        with wrapper.cursor() as cursor:
+            cursor.execute(sql)
+
+    def _query(self, wrapper, sql):
+        with wrapper.cursor() as cursor:
+            cursor.execute(sql)
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        wrapper = self._get_connection()
+        self.assertEqual(self._query(wrapper, 'PRAGMA journal_mode'), 'wal')
+        self.assertEqual(self._query(wrapper, 'PRAGMA synchronous'), 1)
+
+    def test_persistent(self):
+        wrapper = self._get_connection(CONN_MAX_AGE=60)
+        self._query(wrapper, 'SELECT 1')
+        raw = wrapper.connection
+
+        wrapper.close_if_unusable_or_obsolete()
+        wrapper.check_health()
+        self._query(wrapper, 'SELECT 1')
+        self.assertIs(wrapper.connection, raw)
+
+    def test_health_check(self):
+        wrapper = self._get_connection(CONN_MAX_AGE=60)
+        self._query(wrapper, 'SELECT 1')
+        raw = wrapper.connection
+        raw.close()
+
+        wrapper.check_health()
+        self.assertEqual(self._query(wrapper, 'SELECT 1'), 1)
+        self.assertIsNot(wrapper.connection, raw)
+
+    def test_pool_size(self):
+        first = self._get_connection(POOL_SIZE=1, POOL_TIMEOUT=0.01)
+        second = self._get_connection(POOL_SIZE=1, POOL_TIMEOUT=0.01)
+        self._query(first, 'SELECT 1')
+
+        with self.assertRaises(OperationalError):
+            self._query(second, 'SELECT 1')
+
+        first.close()
+        self.assertEqual(self._query(second, 'SELECT 1'), 1)
+
+    def test_released_when_contended(self):
+        wrapper = self._get_connection(POOL_SIZE=2)
+        self._query(wrapper, 'SELECT 1')
+        wrapper.close_if_contended()
+        self.assertIsNotNone(wrapper.connection)
+
+        other = self._get_connection(POOL_SIZE=2)
+        self._query(other, 'SELECT 1')
+        wrapper.close_if_contended()
+        self.assertIsNone(wrapper.connection)
+        self.assertEqual(wrapper.get_pool().used, 1)
+
+    def test_released_on_thread_exit(self):
+        opened = []
+
+        def query():
+            wrapper = ConnectionHandler({'default': dict(
+                settings.DATABASES['default'], NAME=self.name, 
+                POOL_SIZE=1)})['default']
+            self._query(wrapper, 'SELECT 1')
+            opened.append(wrapper)
+
+        thread = threading.Thread(target=query)
+        thread.start()
+        thread.join()
+
+        # The wrapper is still referenced but its thread is gone
+        wrapper = opened[0]
+        self.assertEqual(wrapper.get_pool().used, 0)
+        wrapper.allow_thread_sharing = True
+        wrapper.close()
+
+    @contextmanager
+    def _transaction(self, wrapper):
+        # What transaction.atomic() does on a connection outside the handler
+        wrapper.set_autocommit(False, 
+            force_begin_transaction_with_broken_autocommit=True)
+        try:
+            yield
+            wrapper.commit()
+        except Exception:
+            wrapper.rollback()
+            raise
+        finally:
+            wrapper.set_autocommit(True)
+
+    def _run_writers(self, count, **options):
+        """
+        Runs count threads that each read then write in one transaction and
+        returns their errors
+        """
+        setup = self._get_connection()
+        self._execute(setup, 'CREATE TABLE counter (n integer)')
+        errors = []
+
+        def write():
+            wrapper = ConnectionHandler({'default': dict(
+                settings.DATABASES['default'], NAME=self.name, 
+                **options)})['default']
+            try:
+                with self._transaction(wrapper):
+                    self._query(wrapper, 'SELECT COUNT(*) FROM counter')
+                    time.sleep(0.02)
+                    self._execute(wrapper, 'INSERT INTO counter VALUES (1)')
+            except OperationalError as e:
+                errors.append(e)
+            finally:
+                wrapper.close()
+
+        threads = [threading.Thread(target=write) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return errors
+
+    def test_deferred_writers_fail(self):
+        errors = self._run_writers(4, TRANSACTION_MODE=None, 
+            OPTIONS={'timeout': 0.01})
+        self.assertTrue(errors)
+        self.assertIn('locked', str(errors[0]))
+
+    def test_immediate_writers_queue(self):
+        errors = self._run_writers(4, TRANSACTION_MODE='IMMEDIATE', 
+            OPTIONS={'timeout': 1})
+        self.assertEqual(errors, [])
+        self.assertEqual(self._query(self._get_connection(), 
+            'SELECT COUNT(*) FROM counter'), 4)
+
+    def _hold_write_lock(self, seconds):
+        """
+        Holds the write lock from another connection, as another process
+        would, for seconds
+        """
+        other = sqlite3.connect(self.name, check_same_thread=False)
+        other.isolation_level = None
+        other.execute('BEGIN IMMEDIATE')
+        timer = threading.Timer(seconds, other.rollback)
+        timer.start()
+        # Cleanups run last in, first out
+        self.addCleanup(other.close)
+        self.addCleanup(timer.join)
+
+    def test_write_retries(self):
+        wrapper = self._get_connection(TRANSACTION_MODE='IMMEDIATE', 
+            OPTIONS={'timeout': 0.01}, WRITE_RETRIES=6, WRITE_BACKOFF=0.02)
+        self._query(wrapper, 'SELECT 1')
+        self._hold_write_lock(0.1)
+
+        with self._transaction(wrapper):
+            self._execute(wrapper, 'PRAGMA user_version = 1')
+        self.assertEqual(self._query(wrapper, 'PRAGMA user_version'), 1)
+
+    def test_write_retries_exhausted(self):
+        wrapper = self._get_connection(TRANSACTION_MODE='IMMEDIATE', 
+            OPTIONS={'timeout': 0.01}, WRITE_RETRIES=0)
+        self._query(wrapper, 'SELECT 1')
+        self._hold_write_lock(0.1)
+
+        with self.assertRaises(OperationalError):
+            with self._transaction(wrapper):
+                pass
+
+class ASGIHandlerTestCase(TransactionTestCase, PermissionsTestCaseMixin):
+    """
+    Views run on the handler's pool threads, each with its own connection,
+    so the data they read has to be committed
+    """
+    def setUp(self):
+        self.initialize()
+        Checklist.objects.create(user=self.basic_user1, title='Shopping')
+        Checklist.objects.create(user=self.basic_user1, title='Chores')
+        self.key = APIToken.generate_key()
+        APIToken.objects.create(user=self.basic_user1,
+            key_hash=hash_key(self.key))
+        self.handler = ASGIHandler(max_workers=2)
+        self.addCleanup(self.handler.executor.shutdown)
+
+    def _call(self, scope, messages):
+        sent = []
+        received = iter(messages)
+
+        async def receive():
+            return next(received)
+
+        async def send(message):
+            sent.append(message)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.handler(scope, receive, send))
+        finally:
+            loop.close()
+        return sent
+
+    def _request(self, method, path, chunks=(b'',), headers=()):
+        headers = [(b'authorization', 'Token {0}'.format(self.key).encode()),
+            (b'host', b'testserver')] + list(headers)
+        scope = {'type': 'http', 'method': method, 'path': path,
+            'query_string': b'', 'headers': headers}
+        messages = [{'type': 'http.request', 'body': chunk,
+            'more_body': i < len(chunks) - 1}
+            for i, chunk in enumerate(chunks)]
+        return self._call(scope, messages)
+
+    def _get_body(self, sent):
+        return b''.join(message.get('body', b'') for message in sent[1:])
+
+    def test_get(self):
+        sent = self._request('GET', reverse('checklist-list'))
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertEqual(sent[0]['status'], status.HTTP_200_OK)
+        data = json.loads(self._get_body(sent).decode('utf-8'))
+        self.assertEqual({checklist['title'] for checklist in
+            data['results']}, {'Shopping', 'Chores'})
+
+    def test_post_chunked_body(self):
+        body = json.dumps({'name': 'groceries'}).encode('utf-8')
+        sent = self._request('POST', reverse('tag-list'),
+            [body[:5], body[5:], b''], [(b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode())])
+        self.assertEqual(sent[0]['status'], status.HTTP_201_CREATED)
+        self.assertTrue(Tag.objects.filter(name='groceries').exists())
+
+    def test_streaming(self):
+        sent = self._request('GET', reverse('checklist-export'))
+        self.assertEqual(sent[0]['status'], status.HTTP_200_OK)
+        self.assertGreater(len(sent), 3)
+        self.assertTrue(all(message['more_body'] for message in sent[1:-1]))
+        self.assertNotIn('more_body', sent[-1])
+        lines = self._get_body(sent).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 2)
+
+    def test_headers(self):
+        environ = self.handler.get_environ({'type': 'http', 'method': 'GET',
+            'path': '/', 'headers': [(b'cookie', b'sessionid=a'),
+            (b'cookie', b'csrftoken=b'), (b'x-forwarded-for', b'10.0.0.1'),
+            (b'x_forwarded_for', b'127.0.0.1'), (b'accept', b'text/html'),
+            (b'accept', b'application/json')]}, None)
+        self.assertEqual(environ['HTTP_COOKIE'], 'sessionid=a; csrftoken=b')
+        self.assertEqual(environ['HTTP_X_FORWARDED_FOR'], '10.0.0.1')
+        self.assertEqual(environ['HTTP_ACCEPT'], 'text/html,application/json')
+
+    def test_disconnect(self):
+        sent = self._call({'type': 'http', 'method': 'POST',
+            'path': reverse('tag-list'), 'headers': []},
+            [{'type': 'http.request', 'body': b'{', 'more_body': True},
+            {'type': 'http.disconnect'}])
+        self.assertEqual(sent, [])
+
+    def test_lifespan(self):
+        sent = self._call({'type': 'lifespan'}, [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        self.assertEqual([message['type'] for message in sent],
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
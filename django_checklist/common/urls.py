@@ -2,7 +2,8 @@
 from rest_framework import routers
 
 # Local
-from .views import TagViewSet
+from .views import MetricsViewSet, TagViewSet
 
 router = routers.SimpleRouter()
+router.register(r'metrics', MetricsViewSet, base_name='metrics')
 router.register(r'tags', TagViewSet)
@@ -0,0 +1,168 @@
+# Python
+from collections import OrderedDict, defaultdict
+
+# Django
+from django.core.exceptions import FieldDoesNotExist
+from django.core.urlresolvers import NoReverseMatch
+
+# External
+from rest_framework.relations import (HyperlinkedIdentityField,
+    HyperlinkedRelatedField, ManyRelatedField, RelatedField)
+from rest_framework.serializers import BaseSerializer
+
+# Stands in for the primary key when a URL template is reversed
+SENTINEL = 'pk-sentinel'
+
+def _get_url_template(field):
+    """
+    Returns (prefix, suffix) such that prefix + str(pk) + suffix is the URL
+    field would reverse for pk, or None if it cannot be templated
+    """
+    request = field.context.get('request')
+    format = field.context.get('format')
+    if format and field.format and field.format != format:
+        format = field.format
+
+    try:
+        url = field.reverse(field.view_name,
+            kwargs={field.lookup_url_kwarg: SENTINEL}, request=request,
+            format=format)
+    except NoReverseMatch:
+        return None
+
+    parts = url.split(SENTINEL)
+    if len(parts) != 2:
+        return None
+
+    return tuple(parts)
+
+def _is_pk_hyperlink(field):
+    return isinstance(field, HyperlinkedRelatedField) and \
+        field.lookup_field == 'pk' and 'request' in field.context
+
+class ValuesReader(object):
+    """
+    Renders .values() rows exactly as a HyperlinkedModelSerializer renders
+    the matching instances.
+
+    Hyperlinks are built from a URL template reversed once per request and
+    plain fields reuse the serializer's own field instances, so the output
+    only differs from serializer.data in skipping model instantiation and a
+    reverse() per row. Many-to-many hyperlinks cost one extra query per page.
+    Use get_values_reader(), which returns None for serializers with fields
+    this cannot render (nested serializers, method fields, dotted sources).
+    """
+
+    def __init__(self, model, readers, many_related):
+        self.model = model
+        self.readers = readers
+        self.many_related = many_related
+
+    def read(self, rows):
+        rows = list(rows)
+        related = self.get_related(rows)
+        return [self.read_row(row, related) for row in rows]
+
+    def read_row(self, row, related):
+        ret = OrderedDict()
+        for name, read in self.readers:
+            ret[name] = read(row, related)
+
+        return ret
+
+    def get_related(self, rows):
+        """
+        Loads the many-to-many primary keys read_row needs for rows
+        """
+        pk = self.model._meta.pk.attname
+        return {name: self._get_related_pks(model_field,
+            [row[pk] for row in rows])
+            for name, model_field in self.many_related.items()}
+
+    def _get_related_pks(self, model_field, pks):
+        """
+        Returns {pk: [related pk, ...]} in the order a prefetch returns them
+        """
+        related_model = model_field.related_model
+        query_name = model_field.related_query_name()
+        lookup = '{0}__in'.format(query_name)
+
+        output = defaultdict(list)
+        for pk, related_pk in related_model._default_manager.filter(
+            **{lookup: pks}).values_list(query_name, 'pk'):
+            output[pk].append(related_pk)
+
+        return output
+
+def _get_reader(field, model, many_related):
+    """
+    Returns a function of (row, related) rendering field, or None
+    """
+    if isinstance(field, HyperlinkedIdentityField):
+        template = _get_url_template(field) if _is_pk_hyperlink(field) \
+            else None
+        if template is None:
+            return None
+
+        prefix, suffix = template
+        column = model._meta.pk.attname
+        return lambda row, related: prefix + str(row[column]) + suffix
+
+    if isinstance(field, BaseSerializer) or len(field.source_attrs) != 1:
+        return None
+
+    try:
+        model_field = model._meta.get_field(field.source_attrs[0])
+    except FieldDoesNotExist:
+        return None
+
+    if isinstance(field, ManyRelatedField):
+        child = field.child_relation
+        template = _get_url_template(child) if _is_pk_hyperlink(child) \
+            else None
+        if template is None or not model_field.many_to_many or \
+            model_field.auto_created:
+            return None
+
+        prefix, suffix = template
+        name = field.field_name
+        column = model._meta.pk.attname
+        many_related[name] = model_field
+        return lambda row, related: [prefix + str(pk) + suffix
+            for pk in related[name][row[column]]]
+
+    if isinstance(field, RelatedField):
+        template = _get_url_template(field) if _is_pk_hyperlink(field) \
+            else None
+        if template is None or not model_field.many_to_one:
+            return None
+
+        prefix, suffix = template
+        column = model_field.attname
+        return lambda row, related: None if row[column] is None else \
+            prefix + str(row[column]) + suffix
+
+    if model_field.is_relation or not model_field.concrete:
+        return None
+
+    column = model_field.attname
+    return lambda row, related: None if row[column] is None else \
+        field.to_representation(row[column])
+
+def get_values_reader(serializer):
+    """
+    Returns a ValuesReader for a model serializer instance, or None
+    """
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None:
+        return None
+
+    readers = []
+    many_related = {}
+    for field in serializer._readable_fields:
+        read = _get_reader(field, model, many_related)
+        if read is None:
+            return None
+        readers.append((field.field_name, read))
+
+    return ValuesReader(model, readers, many_related)
@@ -1,14 +1,108 @@
+# Django
+from django.db.models import Count
+
 # External
-from rest_framework import viewsets
+from rest_framework import exceptions, permissions, status, viewsets
+from rest_framework.decorators import list_route
+from rest_framework.pagination import _positive_int
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
 # Local
+from .autocomplete import tag_index
+from .filters import parse_boolean
+from .mixins import (ConditionalGetMixin, get_response_cache_stats, 
+    ProfileMixin, QueryPlanMixin, ResponseCacheMixin, ValuesListMixin)
 from .models import Tag
-from .serializers import TagSerializer
+from .profiling import route_metrics
+from .serializers import TagSerializer, TagUsageSerializer
+from .signals import TAG_CACHE_PREFIX, TAG_STATS_CACHE_PREFIX
 
 ###########
 # ViewSets
 ###########
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(ProfileMixin, ResponseCacheMixin, ConditionalGetMixin, 
+    ValuesListMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    response_cache_prefix = TAG_CACHE_PREFIX
+
+    autocomplete_limit = 10
+    max_autocomplete_limit = 50
+
+    @list_route()
+    def autocomplete(self, request):
+        """
+        Tags whose names start with ?q, most used first, answered from the
+        in-process prefix index. ?limit caps the number of results.
+        """
+        try:
+            limit = _positive_int(request.query_params['limit'], strict=True, 
+                cutoff=self.max_autocomplete_limit)
+        except (KeyError, ValueError):
+            limit = self.autocomplete_limit
+
+        results = [{
+            'url': reverse('tag-detail', args=[pk], request=request),
+            'name': name,
+            'count': count
+        } for pk, name, count in tag_index.lookup(
+            request.query_params.get('q', ''), limit)]
+        return Response({'results': results})
+
+    def get_serializer_class(self):
+        if self.action == 'stats':
+            return TagUsageSerializer
+
+        return super().get_serializer_class()
+
+    @list_route()
+    def stats(self, request):
+        """
+        Every Tag with the number of Checklists tagged, most used first,
+        counted in one aggregate query and cached until a change to tags or
+        taggings commits. ?mine=true only counts the user's Checklists and
+        leaves out Tags they do not use.
+        """
+        try:
+            mine = parse_boolean(request.query_params.get('mine', 'false'))
+        except ValueError as e:
+            raise exceptions.ValidationError({'mine': str(e)})
+
+        if mine and request.user.is_anonymous():
+            raise exceptions.NotAuthenticated()
+
+        def get_response():
+            queryset = Tag.objects.all()
+            if mine:
+                # Filtering first makes the count use the same join
+                queryset = queryset.filter(checklist__user=request.user)
+            queryset = queryset.annotate(checklist_count=Count('checklist')) \
+                .order_by('-checklist_count', 'name')
+
+            serializer = self.get_serializer(queryset, many=True)
+            return Response({'results': serializer.data})
+
+        return self.get_cached_response(request, get_response, 
+            TAG_STATS_CACHE_PREFIX, request.user if mine else None)
+
+    @list_route(url_path='cache-stats')
+    def cache_stats(self, request):
+        return Response(get_response_cache_stats(self.response_cache_prefix))
+
+class MetricsViewSet(ProfileMixin, viewsets.ViewSet):
+    """
+    Per route request counts, average query count and phase timings and
+    request duration histograms recorded by ProfileMiddleware in this
+    process. DELETE reset/ clears them.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def list(self, request):
+        return Response(route_metrics.snapshot())
+
+    @list_route(methods=['delete'], url_path='reset')
+    def reset(self, request):
+        route_metrics.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1 @@
+default_app_config = 'django_checklist.django_auth.apps.DjangoAuthConfig'
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+class DjangoAuthConfig(AppConfig):
+    name = 'django_checklist.django_auth'
+    label = 'django_auth'
+
+    def ready(self):
+        # Connects the permission cache signals
+        from . import backends
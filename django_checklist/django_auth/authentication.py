@@ -0,0 +1,110 @@
+# Python
+from collections import OrderedDict
+import copy
+import threading
+import time
+
+# Django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import ugettext as _
+
+# External
+from rest_framework import authentication, exceptions
+
+# Local
+from .models import APIToken, hash_key
+
+class TokenCache(object):
+    """
+    Thread-safe LRU cache of validated token digests -> (user, token).
+
+    Entries expire after ttl seconds so changes made by other processes
+    (revocation, deactivation) are picked up without a shared cache.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key_hash):
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key_hash]
+                return None
+
+            self._entries.move_to_end(key_hash)
+            return value
+
+    def set(self, key_hash, value):
+        with self._lock:
+            self._entries[key_hash] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key_hash)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key_hash):
+        with self._lock:
+            self._entries.pop(key_hash, None)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for key_hash, (expires_at, (user, token)) in list(
+                self._entries.items()):
+                if user.pk == user_id:
+                    del self._entries[key_hash]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+token_cache = TokenCache(maxsize=getattr(settings, 'API_TOKEN_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'API_TOKEN_CACHE_TTL', 60))
+
+class APITokenAuthentication(authentication.TokenAuthentication):
+    """
+    Authenticates "Authorization: Token <key>" headers against APIToken.
+
+    Keys are compared by SHA-256 digest, and validated digests are kept in
+    token_cache, so a warm request costs one hash and no queries.
+    """
+    model = APIToken
+
+    def authenticate_credentials(self, key):
+        key_hash = hash_key(key)
+        cached = token_cache.get(key_hash)
+        if cached is None:
+            try:
+                token = self.model.objects.select_related('user').get(
+                    key_hash=key_hash)
+            except self.model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed(
+                    _('User inactive or deleted.'))
+
+            cached = (token.user, token)
+            token_cache.set(key_hash, cached)
+
+        # Requests get their own copy so per-request state such as the
+        # permission cache never leaks between them
+        user, token = cached
+        return (copy.copy(user), token)
+
+@receiver(post_delete, sender=APIToken)
+def _revoke_token(sender, instance, **kwargs):
+    token_cache.discard(instance.key_hash)
+
+@receiver(post_save, sender=User)
+def _refresh_user_tokens(sender, instance, **kwargs):
+    token_cache.discard_user(instance.pk)
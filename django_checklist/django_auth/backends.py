@@ -0,0 +1,105 @@
+# Python
+import uuid
+
+# Django
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import caches
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+VERSION_KEY = 'django_auth:perms:version'
+USER_VERSION_KEY = 'django_auth:perms:user:{0}:version'
+USER_KEY = 'django_auth:perms:user:{0}'
+
+def _get_cache():
+    return caches[getattr(settings, 'PERMISSION_CACHE_ALIAS', 'default')]
+
+def invalidate_user_permissions(user_ids):
+    """
+    Retires the cached permissions of the given users by moving them to new
+    versions
+    """
+    _get_cache().set_many({USER_VERSION_KEY.format(user_id): 
+        uuid.uuid4().hex for user_id in user_ids}, None)
+
+def invalidate_all_permissions():
+    """
+    Drops every cached permission set by moving to a new version
+    """
+    _get_cache().set(VERSION_KEY, uuid.uuid4().hex, None)
+
+def _start_version(cache, key):
+    """
+    Returns the version under key after it went missing. Versions are never
+    reused, so entries stored under an evicted one stay retired.
+    """
+    cache.add(key, uuid.uuid4().hex, None)
+    # Another process may have started one first
+    return cache.get(key)
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend whose permission sets are kept in the Django cache.
+
+    Each user's permissions are stored with the current global version and
+    their own, so a warm check costs one cache round trip and no queries.
+    Signals below move a user to a new version when their own permissions
+    or groups change, and move everyone when a group's permissions change.
+    The versions are read before the permissions, so an entry read while
+    they change is stored under the old versions and never served.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous() or obj is not None:
+            return set()
+
+        if not hasattr(user_obj, '_perm_cache'):
+            cache = _get_cache()
+            user_version_key = USER_VERSION_KEY.format(user_obj.pk)
+            user_key = USER_KEY.format(user_obj.pk)
+            cached = cache.get_many([VERSION_KEY, user_version_key, user_key])
+            versions = tuple(cached.get(key) or _start_version(cache, key)
+                for key in (VERSION_KEY, user_version_key))
+            entry = cached.get(user_key)
+
+            if entry is not None and entry[0] == versions:
+                user_obj._perm_cache = entry[1]
+            else:
+                perms = super().get_all_permissions(user_obj, obj)
+                cache.set(user_key, (versions, perms), getattr(settings, 
+                    'PERMISSION_CACHE_TIMEOUT', 300))
+
+        return user_obj._perm_cache
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+def _user_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+
+    if not reverse:
+        invalidate_user_permissions([instance.pk])
+    elif pk_set:
+        invalidate_user_permissions(pk_set)
+    else:
+        # Clearing a Group or Permission's users
+        invalidate_all_permissions()
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def _group_permissions_changed(sender, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_all_permissions()
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def _user_changed(sender, instance, **kwargs):
+    # is_active and is_superuser change the permission set
+    invalidate_user_permissions([instance.pk])
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_delete, sender=Group)
+def _permissions_changed(sender, **kwargs):
+    invalidate_all_permissions()
@@ -0,0 +1,56 @@
+# Python
+from base64 import b64encode
+import time
+
+# Django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+# External
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+# Local
+from django_checklist.django_auth.authentication import (
+    APITokenAuthentication, token_cache)
+from django_checklist.django_auth.models import APIToken, hash_key
+
+class Command(BaseCommand):
+    help = ('Compares the per-request cost of Basic authentication with '
+        'API token authentication on a throwaway database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=verbosity,
+            autoclobber=True, serialize=False)
+
+        try:
+            user = User.objects.create_user('bench', password='bench-password')
+            key = APIToken.generate_key()
+            APIToken.objects.create(user=user, key_hash=hash_key(key))
+            token_cache.clear()
+
+            basic = 'Basic ' + b64encode(b'bench:bench-password').decode()
+            authenticators = (
+                ('basic', BasicAuthentication(), basic),
+                ('token', APITokenAuthentication(), 'Token ' + key),
+            )
+
+            factory = APIRequestFactory()
+            for name, authenticator, header in authenticators:
+                request = Request(factory.get('/', HTTP_AUTHORIZATION=header))
+                start = time.perf_counter()
+                for i in range(options['requests']):
+                    authenticator.authenticate(request)
+                elapsed = (time.perf_counter() - start) / options['requests']
+
+                self.stdout.write('{0}: {1:.1f} us per request'.format(name,
+                    elapsed * 1000000))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=verbosity)
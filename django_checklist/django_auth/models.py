@@ -0,0 +1,34 @@
+# Python
+import hashlib
+
+# Django
+from django.contrib.auth.models import User
+from django.db import models
+from django.utils.crypto import get_random_string
+
+def hash_key(key):
+    """
+    Returns the digest stored for a raw token key
+    """
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+class APIToken(models.Model):
+    """
+    API key for a user. Only a SHA-256 digest of the key is stored; the raw
+    key is available on the instance that issued it and nowhere else.
+    """
+    user = models.ForeignKey(User, related_name='api_tokens')
+    name = models.CharField(max_length=50, blank=True)
+    key_hash = models.CharField(max_length=64, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Raw key, only set on newly issued tokens
+    key = None
+
+    @staticmethod
+    def generate_key():
+        return get_random_string(40)
+
+    def __str__(self):
+        return '{0} - {1}'.format(self.user, self.name)
@@ -2,7 +2,10 @@
 from django.contrib.auth.models import User, Group
 
 # External
-from rest_framework.serializers import HyperlinkedModelSerializer
+from rest_framework.serializers import CharField, HyperlinkedModelSerializer
+
+# Local
+from .models import APIToken
 
 class UserSerializer(HyperlinkedModelSerializer):
     class Meta:
@@ -15,3 +18,11 @@ class GroupSerializer(HyperlinkedModelSerializer):
     class Meta:
         model = Group
         fields = ('url', 'name')
+
+class APITokenSerializer(HyperlinkedModelSerializer):
+    # Only present in the response that issues the token
+    key = CharField(read_only=True)
+
+    class Meta:
+        model = APIToken
+        fields = ('url', 'name', 'key', 'created_at')
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# Python
+from unittest import mock
+
+# Django
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+# External
+from rest_framework import status
+from rest_framework.reverse import reverse
+from rest_framework.test import APITestCase
+
+# Local
+from .authentication import token_cache
+from .backends import _get_cache, invalidate_all_permissions, VERSION_KEY
+from .models import APIToken, hash_key
+from django_checklist.django_auth.mixins import (_get_permissions, 
+    PermissionsTestCaseMixin)
+from django_checklist.todo.models import Checklist
+
+class APITokenTestCase(APITestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        token_cache.clear()
+        self.url = reverse('apitoken-list')
+        self.checklists_url = reverse('checklist-list')
+
+    def _issue(self, user):
+        self.client.force_authenticate(user=user)
+        response = self.client.post(self.url, {'name': 'phone'})
+        self.client.force_authenticate(user=None)
+        return response
+
+    def test_unauthenticated(self):
+        response = self.client.post(self.url, {'name': 'phone'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_issue(self):
+        response = self._issue(self.basic_user1)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        key = response.data['key']
+        token = APIToken.objects.get(user=self.basic_user1)
+        self.assertEqual(token.key_hash, hash_key(key))
+        self.assertNotIn(key, token.key_hash)
+
+    def test_list_hides_key(self):
+        self._issue(self.basic_user1)
+        self._issue(self.basic_user2)
+        self.client.force_authenticate(user=self.basic_user1)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['results'][0]['key'])
+
+    def test_authenticate(self):
+        key = self._issue(self.basic_user1).data['key']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + key)
+        response = self.client.get(self.checklists_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Validated tokens are served from the cache, leaving only the
+        # validator aggregate and the page query
+        with self.assertNumQueries(2):
+            response = self.client.get(self.checklists_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalid_key(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Token bogus')
+        response = self.client.get(self.checklists_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke(self):
+        response = self._issue(self.basic_user1)
+        key = response.data['key']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + key)
+        response = self.client.get(self.checklists_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        token = APIToken.objects.get(user=self.basic_user1)
+        response = self.client.delete(reverse('apitoken-detail', 
+            args=(token.id,)))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.client.get(self.checklists_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke_nonowner_user(self):
+        self._issue(self.basic_user1)
+        token = APIToken.objects.get(user=self.basic_user1)
+        self.client.force_authenticate(user=self.basic_user2)
+        response = self.client.delete(reverse('apitoken-detail', 
+            args=(token.id,)))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_inactive_user(self):
+        key = self._issue(self.basic_user1).data['key']
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + key)
+        self.client.get(self.checklists_url)
+
+        self.basic_user1.is_active = False
+        self.basic_user1.save()
+        response = self.client.get(self.checklists_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class PermissionCacheTestCase(TestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        _get_cache().clear()
+        self.initialize()
+        self.perms = _get_permissions()[Checklist.__name__]
+        self.perm = 'todo.add_checklist'
+
+    def _get_user(self):
+        # A fresh instance has no per-object permission cache
+        return User.objects.get(pk=self.basic_user1.pk)
+
+    def test_cached(self):
+        self.assertTrue(self._get_user().has_perm(self.perm))
+
+        user = self._get_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm(self.perm))
+            self.assertFalse(user.has_perm('todo.bogus'))
+
+    def test_group_permission_removed(self):
+        self.assertTrue(self._get_user().has_perm(self.perm))
+        self.basic_group.permissions.remove(self.perms['add'])
+        self.assertFalse(self._get_user().has_perm(self.perm))
+
+    def test_group_removed(self):
+        self.assertTrue(self._get_user().has_perm(self.perm))
+        self.basic_user1.groups.remove(self.basic_group)
+        self.assertFalse(self._get_user().has_perm(self.perm))
+        self.assertTrue(User.objects.get(pk=self.basic_user2.pk).has_perm(
+            self.perm))
+
+    def test_group_users_cleared(self):
+        self.assertTrue(self._get_user().has_perm(self.perm))
+        self.basic_group.user_set.clear()
+        self.assertFalse(self._get_user().has_perm(self.perm))
+
+    def test_user_permission_added(self):
+        self.basic_user1.groups.remove(self.basic_group)
+        self.assertFalse(self._get_user().has_perm(self.perm))
+        self.perms['add'].user_set.add(self.basic_user1)
+        self.assertTrue(self._get_user().has_perm(self.perm))
+
+    def test_group_deleted(self):
+        self.assertTrue(self._get_user().has_perm(self.perm))
+        self.basic_group.delete()
+        self.assertFalse(self._get_user().has_perm(self.perm))
+
+    def test_version_evicted(self):
+        _get_cache().clear()
+        invalidate_all_permissions()
+        self.assertTrue(self._get_user().has_perm(self.perm))
+        self.basic_group.permissions.remove(self.perms['add'])
+
+        # Versions are not reused, so the entry cached above stays retired
+        _get_cache().delete(VERSION_KEY)
+        invalidate_all_permissions()
+        self.assertFalse(self._get_user().has_perm(self.perm))
+
+    def test_revoked_while_reading(self):
+        get_all_permissions = ModelBackend.get_all_permissions
+
+        def revoke(backend, user_obj, obj=None):
+            # Another request revokes the permission after this one read it
+            perms = get_all_permissions(backend, user_obj, obj)
+            self.basic_user1.groups.remove(self.basic_group)
+            return perms
+
+        with mock.patch.object(ModelBackend, 'get_all_permissions', revoke):
+            self.assertTrue(self._get_user().has_perm(self.perm))
+        self.assertFalse(self._get_user().has_perm(self.perm))
@@ -2,8 +2,9 @@
 from rest_framework import routers
 
 # Local
-from .views import UserViewSet, GroupViewSet
+from .views import APITokenViewSet, UserViewSet, GroupViewSet
 
 router = routers.DefaultRouter()
 router.register(r'users', UserViewSet)
 router.register(r'groups', GroupViewSet)
+router.register(r'tokens', APITokenViewSet)
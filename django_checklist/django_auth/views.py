@@ -2,22 +2,45 @@
 from django.contrib.auth.models import User, Group
 
 # External
-from rest_framework import viewsets
+from rest_framework import mixins, permissions, viewsets
 
 # Local
+from django_checklist.common.mixins import ProfileMixin, QueryPlanMixin
+from .models import APIToken, hash_key
 from .permissions import UserPermissions, GroupPermissions
-from .serializers import UserSerializer, GroupSerializer
+from .serializers import APITokenSerializer, UserSerializer, GroupSerializer
 
 ###########
 # ViewSets
 ###########
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ProfileMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = (UserPermissions,)
+    ordering = ('date_joined', 'id')
 
-class GroupViewSet(viewsets.ModelViewSet):
+class GroupViewSet(ProfileMixin, QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
     permission_classes = (GroupPermissions,)
+    ordering = ('id',)
+
+class APITokenViewSet(ProfileMixin, QueryPlanMixin, 
+    mixins.CreateModelMixin, mixins.ListModelMixin, 
+    mixins.RetrieveModelMixin, mixins.DestroyModelMixin, 
+    viewsets.GenericViewSet):
+    """
+    Issues (POST), lists and revokes (DELETE) the user's API tokens
+    """
+    queryset = APIToken.objects.all()
+    serializer_class = APITokenSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        return super().get_queryset().filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        key = APIToken.generate_key()
+        token = serializer.save(user=self.request.user, key_hash=hash_key(key))
+        token.key = key
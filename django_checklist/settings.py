@@ -19,10 +19,12 @@ INSTALLED_APPS = [
     # Local
     'django_checklist', 
     'django_checklist.common', 
+    'django_checklist.django_auth', 
     'django_checklist.todo'
 ]
 
 MIDDLEWARE_CLASSES = [
+    'django_checklist.common.middleware.ProfileMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,14 +57,56 @@ WSGI_APPLICATION = 'django_checklist.wsgi.application'
 
 
 # Database
+# Connections persist for CONN_MAX_AGE seconds, are checked before reuse
+# (HEALTH_CHECKS) and capped at POOL_SIZE per process, waiting up to
+# POOL_TIMEOUT seconds for a free one. A thread gives its connection back
+# after a request while others are waiting; see common.db.backends.mixins
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'django_checklist.common.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'HEALTH_CHECKS': True,
+        'POOL_SIZE': 16,
+        'POOL_TIMEOUT': 10,
+        # Writers take the lock at BEGIN and queue for it, within a process
+        # on a lock and across processes for up to the busy timeout, then
+        # retry with backoff; see common.db.backends.sqlite3
+        'TRANSACTION_MODE': 'IMMEDIATE',
+        'WRITE_RETRIES': 5,
+        'WRITE_BACKOFF': 0.05,
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        # Applied to every new SQLite connection
+        'PRAGMAS': [
+            ('journal_mode', 'WAL'),
+            ('synchronous', 'NORMAL'),
+            ('temp_store', 'MEMORY'),
+            ('cache_size', -16000),
+            ('mmap_size', 134217728),
+        ],
+    }
+}
+
+
+# Cache
+# LocMemCache is per process; point this at a file based cache, memcached or
+# Redis so cached permissions, responses and their invalidation are shared
+# between workers
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
 
+# Authentication
+AUTHENTICATION_BACKENDS = [
+    'django_checklist.django_auth.backends.CachedModelBackend',
+]
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -93,6 +137,7 @@ STATIC_URL = '/static/'
 # External
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
+        'django_checklist.django_auth.authentication.APITokenAuthentication', 
         'rest_framework.authentication.BasicAuthentication', 
         'rest_framework.authentication.SessionAuthentication'
     ), 
@@ -101,5 +146,36 @@ REST_FRAMEWORK = {
     ), 
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.DjangoModelPermissionsOrAnonReadOnly', 
-    )
+    ), 
+    'DEFAULT_PAGINATION_CLASS': (
+        'django_checklist.common.pagination.KeysetCursorPagination'
+    ), 
+    'PAGE_SIZE': 50
+}
+
+# Local
+# Threads running views under asgi.py, one database connection each; keep it
+# at or below DATABASES['default']['POOL_SIZE']
+ASGI_THREADS = 16
+API_TOKEN_CACHE_SIZE = 1024
+API_TOKEN_CACHE_TTL = 60
+PERMISSION_CACHE_ALIAS = 'default'
+PERMISSION_CACHE_TIMEOUT = 300
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 300
+# Change feed hub; the in-process one only serves a single process, use
+# django_checklist.todo.changes.CacheChangeHub with a shared cache otherwise
+CHANGE_HUB = {
+    'BACKEND': 'django_checklist.todo.changes.MemoryChangeHub',
+    'OPTIONS': {'max_changes': 1000},
 }
+SERVER_TIMING_HEADER = True
+# Seconds /sync/ watermarks trail the clock by; keep it above the longest
+# write transaction
+SYNC_WATERMARK_MARGIN = 60
+# Days deletions are kept for /sync/, prune with manage.py prune_tombstones
+TOMBSTONE_RETENTION_DAYS = 30
+TAG_AUTOCOMPLETE_MAX_AGE = 60
+# Seconds the in-process search index used without FTS5 is kept before
+# reloading, so searches see writes made by other processes
+SEARCH_INDEX_MAX_AGE = 60
@@ -1,4 +1,9 @@
 from django.apps import AppConfig
 
 class TodoConfig(AppConfig):
-    name = 'todo'
+    name = 'django_checklist.todo'
+    label = 'todo'
+
+    def ready(self):
+        # Connects the model signal handlers
+        from . import signals
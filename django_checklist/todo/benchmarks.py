@@ -0,0 +1,79 @@
+# Python
+from contextlib import contextmanager
+
+# Django
+from django.contrib.auth.models import Group, Permission, User
+from django.db import connection
+
+# Local
+from django_checklist.common.models import Tag
+from .counters import recount_checklists
+from .models import Checklist, Item
+
+BATCH_SIZE = 10000
+
+# Same grants as django_auth.mixins.PermissionsTestCaseMixin
+BASIC_PERMISSIONS = ('add_tag', 'add_checklist', 'change_checklist',
+    'delete_checklist', 'add_item', 'change_item', 'delete_item')
+
+@contextmanager
+def benchmark_database(verbosity=1):
+    """
+    Runs the block against a throwaway test database
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True,
+        serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+def seed(users=100, checklists=10000, items=1000000, tags=0, log=None):
+    """
+    Bulk creates users in a Basic group, checklists spread over the users,
+    items spread over the checklists and tags attached round-robin
+    """
+    group = Group.objects.create(name='Basic')
+    group.permissions.add(*Permission.objects.filter(
+        codename__in=BASIC_PERMISSIONS))
+
+    User.objects.bulk_create(User(username='bench{0}'.format(i))
+        for i in range(users))
+    user_ids = list(User.objects.values_list('id', flat=True))
+    group.user_set.add(*user_ids)
+
+    Checklist.objects.bulk_create(Checklist(
+        user_id=user_ids[i % len(user_ids)], title='Checklist {0}'.format(i))
+        for i in range(checklists))
+    checklist_ids = list(Checklist.objects.values_list('id', flat=True))
+
+    for start in range(0, items, BATCH_SIZE):
+        stop = min(start + BATCH_SIZE, items)
+        Item.objects.bulk_create([Item(
+            checklist_id=checklist_ids[i % len(checklist_ids)],
+            description='Item {0}'.format(i), is_complete=i % 3 == 0)
+            for i in range(start, stop)])
+
+        if log is not None:
+            log('Seeded {0} items'.format(stop))
+
+    Tag.objects.bulk_create(Tag(name='tag{0}'.format(i)) for i in range(tags))
+    tag_ids = list(Tag.objects.values_list('id', flat=True))
+    if tag_ids:
+        Through = Checklist.tags.through
+        Through.objects.bulk_create(Through(checklist_id=checklist_id,
+            tag_id=tag_ids[i % len(tag_ids)])
+            for i, checklist_id in enumerate(checklist_ids))
+
+    recount_checklists()
+
+def percentile(values, percent):
+    """
+    Returns the nearest-rank percentile of sorted values
+    """
+    if not values:
+        return None
+
+    index = max(int(round(percent / 100.0 * len(values))) - 1, 0)
+    return values[min(index, len(values) - 1)]
@@ -0,0 +1,261 @@
+# Python
+from collections import deque
+import threading
+import time
+import uuid
+
+# Django
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+class BaseChangeHub(object):
+    """
+    Tells a user's change feed which of their Checklists and Items changed.
+
+    Changes are (model name, pk, deleted) triples published per user.
+    read() returns the changes past an opaque cursor and the cursor to read
+    from next, or reset=True when the cursor is unknown or changes past it
+    were dropped, in which case the client has to sync. subscribe() calls a
+    callback, possibly from another thread, once there are changes to read.
+    """
+
+    def publish(self, user_id, changes):
+        raise NotImplementedError
+
+    def read(self, user_id, cursor):
+        """
+        Returns (cursor, changes, reset)
+        """
+        raise NotImplementedError
+
+    def subscribe(self, user_id, cursor, callback):
+        """
+        Calls callback once there are changes past cursor and returns a
+        function cancelling the subscription
+        """
+        raise NotImplementedError
+
+    def wait(self, user_id, cursor, timeout):
+        """
+        Blocks for up to timeout seconds until there are changes past cursor,
+        then reads them
+        """
+        ready = threading.Event()
+        unsubscribe = self.subscribe(user_id, cursor, ready.set)
+        try:
+            ready.wait(timeout)
+        finally:
+            unsubscribe()
+
+        return self.read(user_id, cursor)
+
+class MemoryChangeHub(BaseChangeHub):
+    """
+    Hub for a single process; publishers and subscribers have to share it.
+
+    The last max_changes changes of each user are kept in order, numbered by
+    one sequence for the whole hub. Cursors carry a token of the hub, so a
+    cursor from before a restart resets.
+    """
+
+    def __init__(self, max_changes=1000):
+        self.max_changes = max_changes
+        self._token = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._changes = {}
+        self._dropped = {}
+        self._listeners = {}
+
+    def publish(self, user_id, changes):
+        with self._lock:
+            log = self._changes.setdefault(user_id, deque())
+            for change in changes:
+                self._sequence += 1
+                if len(log) >= self.max_changes:
+                    self._dropped[user_id] = log.popleft()[0]
+                log.append((self._sequence, tuple(change)))
+            listeners = self._listeners.pop(user_id, ())
+
+        for callback in listeners:
+            callback()
+
+    def read(self, user_id, cursor):
+        sequence = self._parse(cursor)
+        with self._lock:
+            cursor = '{0}:{1}'.format(self._token, self._sequence)
+            if sequence is None or \
+                self._dropped.get(user_id, 0) > sequence:
+                return cursor, [], True
+
+            changes = [change for number, change in
+                self._changes.get(user_id, ()) if number > sequence]
+
+        return cursor, changes, False
+
+    def subscribe(self, user_id, cursor, callback):
+        sequence = self._parse(cursor)
+        with self._lock:
+            log = self._changes.get(user_id)
+            ready = sequence is None or bool(log) and log[-1][0] > sequence
+            if not ready:
+                self._listeners.setdefault(user_id, set()).add(callback)
+
+        if ready:
+            callback()
+
+        def unsubscribe():
+            with self._lock:
+                listeners = self._listeners.get(user_id)
+                if listeners is not None:
+                    listeners.discard(callback)
+                    if not listeners:
+                        del self._listeners[user_id]
+
+        return unsubscribe
+
+    def _parse(self, cursor):
+        """
+        Returns the sequence number of one of this hub's cursors, or None
+        """
+        token, sep, sequence = (cursor or '').partition(':')
+        if token != self._token or not sequence.isdigit() or \
+            int(sequence) > self._sequence:
+            return None
+
+        return int(sequence)
+
+class CacheChangeHub(BaseChangeHub):
+    """
+    Hub kept in a cache, so processes sharing the cache share it.
+
+    Each user has a counter and a key per change numbered by it; changes
+    expire after timeout seconds. Subscriptions are checked by one thread
+    per process that reads the counters of the waiting users every
+    poll_interval seconds. The cache has to be shared between processes,
+    e.g. memcached or Redis, and must not evict the counters.
+    """
+
+    def __init__(self, alias='default', max_changes=1000, timeout=3600,
+        poll_interval=0.5, key_prefix='todo:changes'):
+        self.alias = alias
+        self.max_changes = max_changes
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.key_prefix = key_prefix
+        self._lock = threading.Lock()
+        self._listeners = {}
+        self._poller = None
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def publish(self, user_id, changes):
+        changes = [tuple(change) for change in changes]
+        if not changes:
+            return
+
+        key = self._key(user_id)
+        self.cache.add(key, 0, None)
+        last = self.cache.incr(key, len(changes))
+        first = last - len(changes) + 1
+        self.cache.set_many({'{0}:{1}'.format(key, number): change
+            for number, change in enumerate(changes, start=first)},
+            self.timeout)
+
+    def read(self, user_id, cursor):
+        key = self._key(user_id)
+        last = self.cache.get(key, 0)
+        sequence = int(cursor) if (cursor or '').isdigit() else None
+        if sequence is None or sequence > last or \
+            last - sequence > self.max_changes:
+            return str(last), [], True
+
+        keys = ['{0}:{1}'.format(key, number)
+            for number in range(sequence + 1, last + 1)]
+        found = self.cache.get_many(keys)
+        changes = []
+        for number, change_key in enumerate(keys, start=sequence + 1):
+            if change_key not in found:
+                # The newest changes may still be being written by their
+                # publisher; anything older has expired
+                if keys[-1] in found:
+                    return str(last), [], True
+                return str(number - 1), changes, False
+            changes.append(found[change_key])
+
+        return str(last), changes, False
+
+    def subscribe(self, user_id, cursor, callback):
+        sequence = int(cursor) if (cursor or '').isdigit() else None
+        if sequence is None or self.cache.get(self._key(user_id), 0) != \
+            sequence:
+            callback()
+            return lambda: None
+
+        with self._lock:
+            self._listeners.setdefault(user_id, {})[callback] = sequence
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll,
+                    daemon=True)
+                self._poller.start()
+
+        def unsubscribe():
+            with self._lock:
+                listeners = self._listeners.get(user_id)
+                if listeners is not None:
+                    listeners.pop(callback, None)
+                    if not listeners:
+                        del self._listeners[user_id]
+
+        return unsubscribe
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                waiting = {user_id: dict(listeners)
+                    for user_id, listeners in self._listeners.items()}
+            if not waiting:
+                continue
+
+            counters = self.cache.get_many([self._key(user_id)
+                for user_id in waiting])
+            ready = []
+            with self._lock:
+                for user_id, listeners in waiting.items():
+                    last = counters.get(self._key(user_id), 0)
+                    for callback, sequence in listeners.items():
+                        # A lower counter means the cache was cleared
+                        if last != sequence and callback in \
+                            self._listeners.get(user_id, {}):
+                            ready.append(callback)
+                            del self._listeners[user_id][callback]
+                    if not self._listeners.get(user_id, True):
+                        del self._listeners[user_id]
+
+            for callback in ready:
+                callback()
+
+    def _key(self, user_id):
+        return '{0}:{1}'.format(self.key_prefix, user_id)
+
+_hub = None
+_hub_lock = threading.Lock()
+
+def get_change_hub():
+    """
+    Returns the hub configured by the CHANGE_HUB setting
+    """
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                config = getattr(settings, 'CHANGE_HUB', {})
+                backend = import_string(config.get('BACKEND',
+                    'django_checklist.todo.changes.MemoryChangeHub'))
+                _hub = backend(**config.get('OPTIONS', {}))
+
+    return _hub
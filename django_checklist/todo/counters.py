@@ -0,0 +1,62 @@
+# Python
+from collections import defaultdict
+
+# Django
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+# Local
+from .models import Checklist, Item
+
+class CountDeltas(object):
+    """
+    Accumulates changes to Checklist.item_count and completed_count.
+
+    apply() writes them with one F() expression UPDATE per checklist, which
+    is safe against concurrent writers, and bumps updated_at so cached
+    validators and sync clients see the new counts.
+    """
+
+    def __init__(self):
+        self._deltas = defaultdict(lambda: [0, 0])
+
+    def add(self, checklist_id, is_complete, sign=1):
+        delta = self._deltas[checklist_id]
+        delta[0] += sign
+        if is_complete:
+            delta[1] += sign
+
+    def remove(self, checklist_id, is_complete):
+        self.add(checklist_id, is_complete, sign=-1)
+
+    def apply(self):
+        now = timezone.now()
+        for checklist_id, (items, completed) in self._deltas.items():
+            if checklist_id is None or (not items and not completed):
+                continue
+
+            Checklist.objects.filter(pk=checklist_id).update(
+                item_count=F('item_count') + items, 
+                completed_count=F('completed_count') + completed, 
+                updated_at=now)
+
+        self._deltas.clear()
+
+def recount_checklists():
+    """
+    Recomputes every checklist's counters in a single UPDATE and returns
+    the number of checklists updated
+    """
+    qn = connection.ops.quote_name
+    checklist_table = qn(Checklist._meta.db_table)
+    item_table = qn(Item._meta.db_table)
+    items = 'SELECT COUNT(*) FROM {0} WHERE {0}.{1} = {2}.{3}'.format(
+        item_table, qn('checklist_id'), checklist_table, qn('id'))
+    completed = '{0} AND {1}.{2}'.format(items, item_table, qn('is_complete'))
+
+    with connection.cursor() as cursor:
+        cursor.execute('UPDATE {0} SET {1} = ({2}), {3} = ({4})'.format(
+            checklist_table, qn('item_count'), items, qn('completed_count'), 
+            completed))
+        return cursor.rowcount
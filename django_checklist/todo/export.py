@@ -0,0 +1,65 @@
+# Python
+from itertools import groupby
+from operator import itemgetter
+
+# Django
+from django.core.exceptions import ImproperlyConfigured
+
+# External
+from rest_framework.utils.encoders import JSONEncoder
+
+# Local
+from django_checklist.common.values import get_values_reader
+from .models import Checklist, Item
+from .serializers import ChecklistSerializer, ItemSerializer
+
+def _get_reader(serializer_class, context):
+    reader = get_values_reader(serializer_class(context=context))
+    if reader is None:
+        raise ImproperlyConfigured('{0} cannot be read from .values() rows'
+            .format(serializer_class.__name__))
+
+    return reader
+
+def iter_export(user, context, chunk_size=500):
+    """
+    Yields the user's Checklists as JSON Lines, each with its Items nested.
+
+    Checklists are read chunk_size at a time by primary key and their Items
+    are streamed with .iterator(), so memory use depends on the chunk size
+    and not on how much data the user has. Objects are rendered as the API
+    renders them.
+    """
+    checklist_reader = _get_reader(ChecklistSerializer, context)
+    item_reader = _get_reader(ItemSerializer, context)
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    last_id = 0
+    while True:
+        checklists = list(Checklist.objects.filter(user=user, pk__gt=last_id)
+            .order_by('pk').values()[:chunk_size])
+        if not checklists:
+            return
+
+        related = checklist_reader.get_related(checklists)
+        items = Item.objects.filter(checklist__in=[checklist['id']
+            for checklist in checklists]).order_by('checklist', 'created_at',
+            'id').values().iterator()
+        groups = groupby(items, itemgetter('checklist_id'))
+        group = next(groups, None)
+
+        for checklist in checklists:
+            data = encoder.encode(checklist_reader.read_row(checklist,
+                related))
+            # Items are written one at a time inside the checklist object
+            yield data[:-1] + ',"items":['
+
+            if group is not None and group[0] == checklist['id']:
+                for i, row in enumerate(group[1]):
+                    yield (',' if i else '') + encoder.encode(
+                        item_reader.read_row(row, {}))
+                group = next(groups, None)
+
+            yield ']}\n'
+
+        last_id = checklists[-1]['id']
@@ -0,0 +1,248 @@
+# Python
+import csv
+from itertools import groupby
+import json
+import time
+
+# Django
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+# Local
+from django_checklist.common.autocomplete import tag_index
+from django_checklist.common.bulk import bulk_create
+from django_checklist.common.mixins import invalidate_response_cache
+from django_checklist.common.models import Tag
+from django_checklist.common.signals import (TAG_CACHE_PREFIX, 
+    TAG_STATS_CACHE_PREFIX)
+from .changes import get_change_hub
+from .models import Checklist, Item
+from .search import get_search_index
+
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 't')
+
+def read_jsonl(lines):
+    """
+    Yields (line number, record) from JSON Lines, one Checklist per line:
+
+        {"title": "...", "tags": ["slug", ...],
+         "items": [{"description": "...", "is_complete": false}, ...]}
+    """
+    for lineno, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValidationError('Line {0}: {1}'.format(lineno, e))
+
+        yield lineno, record
+
+def read_csv(lines):
+    """
+    Yields (line number, record) from CSV with a header row of title, tags,
+    description and is_complete.
+
+    Consecutive rows with the same title and tags make up one Checklist with
+    an Item per row; rows without a description add no Item. Tags are
+    separated by whitespace.
+    """
+    reader = csv.DictReader(lines)
+    rows = _read_rows(reader)
+
+    for key, group in groupby(rows, lambda entry: (entry[1].get('title'),
+        entry[1].get('tags') or '')):
+        group = list(group)
+        title, tags = key
+        items = [{'description': row['description'],
+            'is_complete': (row.get('is_complete') or '').strip().lower()
+                in TRUE_VALUES}
+            for lineno, row in group if row.get('description')]
+
+        yield group[0][0], {'title': title, 'tags': tags.split(),
+            'items': items}
+
+def _read_rows(reader):
+    try:
+        for row in reader:
+            yield reader.line_num, row
+    except csv.Error as e:
+        # line_num stops at the line before the record that failed
+        raise ValidationError('Line {0}: {1}'.format(reader.line_num + 1, e))
+
+class ChecklistImporter(object):
+    """
+    Creates a user's Checklists, Items and Tag links in bulk.
+
+    Records are buffered until batch_size objects are pending, then written
+    with one bulk_create per model, counters included. Tags are upserted by
+    name and their through rows inserted in bulk. No signals are sent, so
+    search documents and change feed entries are added per batch and the
+    tag response caches and autocomplete index are invalidated once the
+    import commits. Run it inside transaction.atomic(); progress, if given,
+    is called with stats() after every batch.
+    """
+
+    def __init__(self, user, batch_size=5000, progress=None):
+        self.user = user
+        self.batch_size = batch_size
+        self.progress = progress
+        self.checklists = self.items = self.tags = self.tag_links = 0
+        self._pending = []
+        self._pending_count = 0
+        self._tag_ids = {}
+        self._start = None
+
+    def run(self, records):
+        self._start = time.perf_counter()
+        for lineno, record in records:
+            self.add(lineno, record)
+            if self._pending_count >= self.batch_size:
+                self.flush()
+
+        self.flush()
+        if self.tag_links:
+            # Not before the commit, or requests could cache the old tags
+            # again, and not at all if the import rolls back
+            transaction.on_commit(self._invalidate_tags)
+
+        return self.stats()
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._start if self._start else 0
+        rows = self.checklists + self.items + self.tag_links
+        return {
+            'checklists': self.checklists,
+            'items': self.items,
+            'tags_created': self.tags,
+            'tag_links': self.tag_links,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(rows / elapsed, 1) if elapsed else None
+        }
+
+    def add(self, lineno, record):
+        """
+        Validates a record and queues it for the next batch
+        """
+        try:
+            if not isinstance(record, dict):
+                raise ValidationError('Expected an object.')
+
+            title = self._clean(Checklist, 'title', record.get('title'))
+            tags = record.get('tags') or []
+            items = record.get('items') or []
+            if not isinstance(tags, list) or not isinstance(items, list):
+                raise ValidationError('Expected lists of tags and items.')
+
+            tags = [self._clean(Tag, 'name', tag) for tag in tags]
+            items = [self._clean_item(item) for item in items]
+        except ValidationError as e:
+            raise ValidationError('Line {0}: {1}'.format(lineno,
+                '; '.join(e.messages)))
+
+        self._pending.append((title, tags, items))
+        self._pending_count += 1 + len(items)
+
+    def flush(self):
+        if not self._pending:
+            return
+
+        self._upsert_tags({tag for title, tags, items in self._pending
+            for tag in tags})
+
+        checklists = bulk_create(Checklist, [Checklist(user=self.user,
+            title=title, item_count=len(items),
+            completed_count=sum(1 for item in items if item[1]))
+            for title, tags, items in self._pending])
+
+        items = [Item(checklist_id=checklist.pk, description=description,
+            is_complete=is_complete)
+            for checklist, (title, tags, pending_items)
+                in zip(checklists, self._pending)
+            for description, is_complete in pending_items]
+        bulk_create(Item, items)
+
+        user_id = self.user.pk
+        get_search_index().add([('checklist', checklist.pk, user_id,
+            checklist.title) for checklist in checklists] + [('item', item.pk,
+            user_id, item.description) for item in items])
+        changes = [('checklist', checklist.pk, False)
+            for checklist in checklists] + [('item', item.pk, False)
+            for item in items]
+        transaction.on_commit(
+            lambda: get_change_hub().publish(user_id, changes))
+
+        Through = Checklist.tags.through
+        links = [Through(checklist_id=checklist.pk, tag_id=tag_id)
+            for checklist, (title, tags, pending_items)
+                in zip(checklists, self._pending)
+            for tag_id in {self._tag_ids[tag] for tag in tags}]
+        Through.objects.bulk_create(links)
+
+        self.checklists += len(checklists)
+        self.items += len(items)
+        self.tag_links += len(links)
+        self._pending = []
+        self._pending_count = 0
+
+        if self.progress is not None:
+            self.progress(self.stats())
+
+    def _invalidate_tags(self):
+        invalidate_response_cache(TAG_CACHE_PREFIX)
+        invalidate_response_cache(TAG_STATS_CACHE_PREFIX)
+        tag_index.invalidate()
+
+    def _upsert_tags(self, names):
+        names = [name for name in names if name not in self._tag_ids]
+        if not names:
+            return
+
+        # Chunked to stay under SQLite's limit on query parameters
+        for start in range(0, len(names), 500):
+            self._tag_ids.update(Tag.objects.filter(
+                name__in=names[start:start + 500]).values_list('name', 'id'))
+        missing = [name for name in names if name not in self._tag_ids]
+        if not missing:
+            return
+
+        try:
+            with transaction.atomic():
+                tags = bulk_create(Tag, [Tag(name=name) for name in missing])
+        except IntegrityError:
+            # A concurrent import created some of them
+            for name in missing:
+                tag, created = self._get_or_create_tag(name)
+                self._tag_ids[name] = tag.pk
+                self.tags += created
+        else:
+            self._tag_ids.update((tag.name, tag.pk) for tag in tags)
+            self.tags += len(tags)
+
+    def _get_or_create_tag(self, name, attempts=3):
+        for attempt in range(attempts):
+            try:
+                with transaction.atomic():
+                    return Tag.objects.get_or_create(name=name)
+            except IntegrityError:
+                if attempt == attempts - 1:
+                    raise
+
+    def _clean(self, model, field_name, value):
+        field = model._meta.get_field(field_name)
+        if not isinstance(value, str):
+            raise ValidationError('{0} must be a string.'.format(field_name))
+
+        return field.clean(value, None)
+
+    def _clean_item(self, item):
+        if not isinstance(item, dict):
+            raise ValidationError('Expected items to be objects.')
+
+        is_complete = item.get('is_complete', False)
+        if not isinstance(is_complete, bool):
+            raise ValidationError('is_complete must be a boolean.')
+
+        return self._clean(Item, 'description', item.get('description')), \
+            is_complete
@@ -0,0 +1,145 @@
+# Python
+from collections import OrderedDict
+from itertools import count
+import json
+import time
+
+# Django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+# External
+from rest_framework.test import APIClient
+
+# Local
+from django_checklist.common.models import Tag
+from django_checklist.django_auth.models import APIToken, hash_key
+from django_checklist.todo.benchmarks import (benchmark_database, percentile,
+    seed)
+from django_checklist.todo.models import Checklist, Item
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway database and drives the /api/v1 list, detail '
+        'and create endpoints in-process, reporting latency percentiles, '
+        'throughput and queries per request.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--checklists', type=int, default=1000)
+        parser.add_argument('--items', type=int, default=20000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--output',
+            help='Writes the results as JSON to this path, or - for stdout')
+
+    def handle(self, *args, **options):
+        config = OrderedDict((name, options[name]) for name in ('users',
+            'checklists', 'items', 'tags', 'requests', 'warmup'))
+        log = self.stdout.write if options['verbosity'] > 1 else None
+
+        with benchmark_database(options['verbosity']), \
+            override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            seed(users=options['users'], checklists=options['checklists'],
+                items=options['items'], tags=options['tags'], log=log)
+
+            client = self._get_client()
+            results = [self._measure(client, name, method, get_request,
+                options['requests'], options['warmup'])
+                for name, method, get_request in self._get_endpoints()]
+
+        report = OrderedDict([('config', config), ('results', results)])
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        for result in results:
+            self.stdout.write('{endpoint:<16} {method:<5} '
+                'p50 {p50_ms:8.3f} ms  p95 {p95_ms:8.3f} ms  '
+                'p99 {p99_ms:8.3f} ms  {rps:8.1f} rps  '
+                '{queries:3d} queries'.format(**result))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+    def _get_client(self):
+        self.user = User.objects.order_by('id').first()
+        key = APIToken.generate_key()
+        APIToken.objects.create(user=self.user, key_hash=hash_key(key))
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + key)
+        return client
+
+    def _get_endpoints(self):
+        """
+        Returns (name, method, callable returning (path, data)) triples
+        """
+        checklist = Checklist.objects.filter(user=self.user).first()
+        item = Item.objects.filter(checklist=checklist).first()
+        tag = Tag.objects.first()
+        checklist_url = 'http://testserver' + reverse('checklist-detail',
+            args=(checklist.pk,))
+        sequence = count()
+
+        def fixed(path):
+            return lambda: (path, None)
+
+        return [
+            ('checklist-list', 'GET', fixed(reverse('checklist-list'))),
+            ('checklist-detail', 'GET', fixed(reverse('checklist-detail',
+                args=(checklist.pk,)))),
+            ('checklist-create', 'POST', lambda: (reverse('checklist-list'),
+                {'title': 'Benchmark {0}'.format(next(sequence))})),
+            ('item-list', 'GET', fixed(reverse('item-list'))),
+            ('item-detail', 'GET', fixed(reverse('item-detail',
+                args=(item.pk,)))),
+            ('item-create', 'POST', lambda: (reverse('item-list'),
+                {'checklist': checklist_url,
+                'description': 'Benchmark {0}'.format(next(sequence))})),
+            ('tag-list', 'GET', fixed(reverse('tag-list'))),
+            ('tag-detail', 'GET', fixed(reverse('tag-detail',
+                args=(tag.pk,)))),
+            ('tag-create', 'POST', lambda: (reverse('tag-list'),
+                {'name': 'benchmark{0}'.format(next(sequence))})),
+        ]
+
+    def _measure(self, client, name, method, get_request, requests, warmup):
+        send = getattr(client, method.lower())
+
+        def call():
+            path, data = get_request()
+            return send(path, data, format='json')
+
+        for i in range(warmup):
+            call()
+
+        latencies = []
+        start = time.perf_counter()
+        for i in range(max(requests, 1)):
+            request_start = time.perf_counter()
+            call()
+            latencies.append((time.perf_counter() - request_start) * 1000)
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+
+        # Queries are captured on a separate request so the debug cursor does
+        # not inflate the timings
+        with CaptureQueriesContext(connection) as context:
+            response = call()
+
+        return OrderedDict([
+            ('endpoint', name),
+            ('method', method),
+            ('requests', len(latencies)),
+            ('status', response.status_code),
+            ('p50_ms', percentile(latencies, 50)),
+            ('p95_ms', percentile(latencies, 95)),
+            ('p99_ms', percentile(latencies, 99)),
+            ('rps', len(latencies) / elapsed),
+            ('queries', len(context.captured_queries)),
+        ])
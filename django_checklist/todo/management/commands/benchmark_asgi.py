@@ -0,0 +1,132 @@
+# Python
+import asyncio
+from io import BytesIO
+import time
+
+# Django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.urlresolvers import reverse
+from django.test.utils import override_settings
+
+# Local
+from django_checklist.common.asgi import ASGIHandler
+from django_checklist.django_auth.models import APIToken, hash_key
+from django_checklist.todo.benchmarks import (benchmark_database, percentile,
+    seed)
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway database and serves concurrent clients that '
+        'read slowly through the WSGI handler on a thread pool and through '
+        'the ASGI handler with the same number of threads, reporting wall '
+        'time, throughput and latency.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--checklists', type=int, default=1000)
+        parser.add_argument('--items', type=int, default=20000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--delay', type=float, default=0.2,
+            help='Seconds each client takes to read its response')
+
+    def handle(self, *args, **options):
+        log = self.stdout.write if options['verbosity'] > 1 else None
+
+        with benchmark_database(options['verbosity']), \
+            override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            seed(users=options['users'], checklists=options['checklists'],
+                items=options['items'], tags=options['tags'], log=log)
+            scopes = self._get_scopes(options['clients'])
+            handler = ASGIHandler(max_workers=options['workers'])
+
+            try:
+                results = [(label, measure(handler, scopes,
+                    options['delay']))
+                    for label, measure in (('wsgi', self._measure_wsgi),
+                    ('asgi', self._measure_asgi))]
+            finally:
+                handler.executor.shutdown()
+
+            for label, (elapsed, latencies, statuses) in results:
+                latencies.sort()
+                self.stdout.write('{0:<5} {1:7.3f} s  {2:8.1f} rps  '
+                    'p50 {3:8.1f} ms  p95 {4:8.1f} ms  statuses {5}'.format(
+                    label, elapsed, len(scopes) / elapsed,
+                    percentile(latencies, 50), percentile(latencies, 95),
+                    sorted(set(statuses))))
+
+    def _get_scopes(self, clients):
+        """
+        Returns an ASGI scope per client, cycling through the read paths
+        """
+        user = User.objects.order_by('id').first()
+        key = APIToken.generate_key()
+        APIToken.objects.create(user=user, key_hash=hash_key(key))
+        headers = [(b'authorization', 'Token {0}'.format(key).encode()),
+            (b'host', b'testserver')]
+        paths = [reverse('checklist-list'), reverse('item-list'),
+            reverse('tag-list')]
+
+        return [{'type': 'http', 'method': 'GET',
+            'path': paths[i % len(paths)], 'query_string': b'',
+            'headers': headers} for i in range(clients)]
+
+    def _measure_wsgi(self, handler, scopes, delay):
+        """
+        A worker thread is held by each client until it has read the response.
+        The handler's threads are used so both paths reuse the same
+        connections.
+        """
+        application = handler.application
+        statuses = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(int(status.split(' ', 1)[0]))
+
+        # Clients connect at once, so latency includes waiting for a thread
+        def call(scope):
+            response = application(handler.get_environ(scope, BytesIO()),
+                start_response)
+            try:
+                b''.join(response)
+                time.sleep(delay)
+            finally:
+                response.close()
+            return (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        latencies = list(handler.executor.map(call, scopes))
+        return time.perf_counter() - start, latencies, statuses
+
+    def _measure_asgi(self, handler, scopes, delay):
+        """
+        Clients wait on the event loop; threads only render responses
+        """
+        statuses = []
+
+        async def call(scope):
+            start = time.perf_counter()
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                elif not message.get('more_body', False):
+                    await asyncio.sleep(delay)
+
+            await handler(scope, receive, send)
+            return (time.perf_counter() - start) * 1000
+
+        loop = asyncio.new_event_loop()
+        try:
+            start = time.perf_counter()
+            latencies = loop.run_until_complete(asyncio.gather(
+                *[call(scope) for scope in scopes], loop=loop))
+            elapsed = time.perf_counter() - start
+        finally:
+            loop.close()
+        return elapsed, list(latencies), statuses
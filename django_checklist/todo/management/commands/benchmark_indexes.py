@@ -0,0 +1,91 @@
+# Python
+from collections import OrderedDict
+import time
+
+# Django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+# Local
+from django_checklist.todo.benchmarks import benchmark_database, seed
+from django_checklist.todo.models import Checklist, Item
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway database and compares query plans and latency '
+        'of the per-user access paths with and without composite indexes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--checklists', type=int, default=10000)
+        parser.add_argument('--items', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        log = self.stdout.write if options['verbosity'] > 1 else None
+
+        with benchmark_database(options['verbosity']):
+            seed(users=options['users'], checklists=options['checklists'], 
+                items=options['items'], log=log)
+            queries = self._get_queries()
+
+            after = self._measure(queries, options['repeat'])
+            self._set_indexes(enabled=False)
+            before = self._measure(queries, options['repeat'])
+            self._set_indexes(enabled=True)
+
+            for name in queries:
+                self.stdout.write('\n{0}'.format(name))
+                for label, results in (('before', before), ('after', after)):
+                    plan, latency = results[name]
+                    self.stdout.write('  {0}: {1:.3f} ms'.format(label,
+                        latency * 1000))
+                    for row in plan:
+                        self.stdout.write('    {0}'.format(row))
+
+    def _get_queries(self):
+        user = User.objects.order_by('id').first()
+        checklist = Checklist.objects.filter(user=user).first()
+
+        return OrderedDict([
+            ('checklists by user', Checklist.objects.filter(user=user)
+                .order_by('created_at', 'id')[:50]),
+            ('items by checklist owner', Item.objects.filter(
+                checklist__user=user).order_by('created_at', 'id')[:50]),
+            ('incomplete items by checklist', Item.objects.filter(
+                checklist=checklist, is_complete=False)
+                .order_by('created_at', 'id')[:50]),
+            ('recently updated checklists', Checklist.objects.filter(
+                user=user).order_by('-updated_at', '-id')[:50]),
+            ('recently updated items by checklist', Item.objects.filter(
+                checklist=checklist).order_by('-updated_at', '-id')[:50]),
+        ])
+
+    def _measure(self, queries, repeat):
+        results = {}
+        for name, queryset in queries.items():
+            sql, params = queryset.query.sql_with_params()
+            explain = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' \
+                else 'EXPLAIN '
+
+            with connection.cursor() as cursor:
+                cursor.execute(explain + sql, params)
+                plan = cursor.fetchall()
+
+            start = time.perf_counter()
+            for i in range(repeat):
+                list(queryset.all())
+            latency = (time.perf_counter() - start) / repeat
+
+            results[name] = (plan, latency)
+
+        return results
+
+    def _set_indexes(self, enabled):
+        with connection.schema_editor() as editor:
+            for model in (Checklist, Item):
+                index_together = model._meta.index_together
+                if enabled:
+                    editor.alter_index_together(model, (), index_together)
+                else:
+                    editor.alter_index_together(model, index_together, ())
@@ -0,0 +1,70 @@
+# Python
+import time
+
+# Django
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+# External
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+# Local
+from django_checklist.common.models import Tag
+from django_checklist.common.serializers import TagSerializer
+from django_checklist.common.values import get_values_reader
+from django_checklist.todo.benchmarks import benchmark_database, seed
+from django_checklist.todo.models import Checklist, Item
+from django_checklist.todo.serializers import (ChecklistSerializer,
+    ItemSerializer)
+
+class Command(BaseCommand):
+    help = ('Seeds a throwaway database and compares rendering large lists '
+        'through the hyperlinked serializers and through .values() readers.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+
+        with benchmark_database(options['verbosity']), \
+            override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+            seed(users=10, checklists=rows, items=rows, tags=rows)
+            context = {'request': APIRequestFactory().get('/')}
+            cases = (
+                ('checklists', ChecklistSerializer,
+                    Checklist.objects.prefetch_related('tags').order_by('id')),
+                ('items', ItemSerializer, Item.objects.order_by('id')),
+                ('tags', TagSerializer, Tag.objects.order_by('id')),
+            )
+
+            for name, serializer_class, queryset in cases:
+                serializer, expected = self._measure(options['repeat'],
+                    lambda: serializer_class(queryset.all(), many=True,
+                    context=context).data)
+                reader = get_values_reader(serializer_class(context=context))
+                values, actual = self._measure(options['repeat'],
+                    lambda: reader.read(queryset.values()))
+
+                renderer = JSONRenderer()
+                if renderer.render(actual) != renderer.render(expected):
+                    raise CommandError('{0} output differs'.format(name))
+
+                self.stdout.write('{0} ({1} rows): serializer {2:.1f} ms, '
+                    'values {3:.1f} ms, {4:.1f}x'.format(name, len(expected),
+                    serializer * 1000, values * 1000, serializer / values))
+
+    def _measure(self, repeat, render):
+        """
+        Returns the best time of repeat calls to render and its result
+        """
+        best = None
+        for i in range(repeat):
+            start = time.perf_counter()
+            result = render()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        return best, result
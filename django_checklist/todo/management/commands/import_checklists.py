@@ -0,0 +1,57 @@
+# Python
+import sys
+
+# Django
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+# Local
+from django_checklist.todo.importer import (ChecklistImporter, read_csv,
+    read_jsonl)
+
+class Command(BaseCommand):
+    help = ('Bulk imports Checklists with their Items and Tags for a user '
+        'from JSON Lines or CSV. Nothing is imported if any record is '
+        'invalid.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path', help='Input file, or - for stdin')
+        parser.add_argument('--format', choices=('jsonl', 'csv'),
+            help='Defaults to csv for .csv files and jsonl otherwise')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError('User "{0}" does not exist'.format(
+                options['username']))
+
+        path = options['path']
+        format = options['format'] or \
+            ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        read = read_csv if format == 'csv' else read_jsonl
+        progress = self._log_progress if options['verbosity'] > 0 else None
+        importer = ChecklistImporter(user, options['batch_size'], progress)
+
+        f = sys.stdin if path == '-' else open(path, encoding='utf-8',
+            newline='')
+        try:
+            with transaction.atomic():
+                stats = importer.run(read(f))
+        except ValidationError as e:
+            raise CommandError('; '.join(e.messages))
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+        self.stdout.write('Imported {checklists} checklists, {items} items '
+            'and {tag_links} tag links ({tags_created} new tags) in '
+            '{seconds} s'.format(**stats))
+
+    def _log_progress(self, stats):
+        self.stdout.write('{checklists} checklists, {items} items, '
+            '{rows_per_second} rows/s'.format(**stats))
@@ -0,0 +1,12 @@
+# Django
+from django.core.management.base import BaseCommand
+
+# Local
+from django_checklist.todo.models import Tombstone
+
+class Command(BaseCommand):
+    help = 'Deletes tombstones older than TOMBSTONE_RETENTION_DAYS.'
+
+    def handle(self, *args, **options):
+        count = Tombstone.objects.prune()
+        self.stdout.write('Pruned {0} tombstones'.format(count))
@@ -0,0 +1,17 @@
+# Django
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+# Local
+from django_checklist.todo.search import get_search_index
+
+class Command(BaseCommand):
+    help = ('Rebuilds the Checklist and Item search index from the '
+        'database.')
+
+    def handle(self, *args, **options):
+        index = get_search_index()
+        with transaction.atomic():
+            index.rebuild()
+
+        self.stdout.write('Rebuilt the {0}'.format(type(index).__name__))
@@ -0,0 +1,15 @@
+# Django
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+# Local
+from django_checklist.todo.counters import recount_checklists
+
+class Command(BaseCommand):
+    help = 'Recomputes item_count and completed_count on every checklist.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = recount_checklists()
+
+        self.stdout.write('Recounted {0} checklists'.format(count))
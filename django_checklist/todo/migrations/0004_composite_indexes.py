@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 19:34
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0003_auto_20151227_1734'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='checklist',
+            index_together=set([('user', 'created_at')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='item',
+            index_together=set([('checklist', 'is_complete', 'created_at')]),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 19:43
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0005_tombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checklist',
+            name='completed_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='checklist',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(
+            [
+                'UPDATE todo_checklist SET '
+                'item_count = (SELECT COUNT(*) FROM todo_item '
+                'WHERE todo_item.checklist_id = todo_checklist.id), '
+                'completed_count = (SELECT COUNT(*) FROM todo_item '
+                'WHERE todo_item.checklist_id = todo_checklist.id '
+                'AND todo_item.is_complete)',
+            ],
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def _has_fts5(connection):
+    if connection.vendor != 'sqlite':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+def create_search_index(apps, schema_editor):
+    # Other databases use the in-process index in todo.search
+    if not _has_fts5(schema_editor.connection):
+        return
+
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE todo_search USING fts5(owner, text)')
+    schema_editor.execute(
+        'INSERT INTO todo_search (rowid, owner, text) '
+        "SELECT id * 2, 'u' || user_id, title FROM todo_checklist")
+    schema_editor.execute(
+        'INSERT INTO todo_search (rowid, owner, text) '
+        "SELECT todo_item.id * 2 + 1, 'u' || todo_checklist.user_id, "
+        'todo_item.description FROM todo_item INNER JOIN todo_checklist '
+        'ON todo_item.checklist_id = todo_checklist.id')
+
+def drop_search_index(apps, schema_editor):
+    if _has_fts5(schema_editor.connection):
+        schema_editor.execute('DROP TABLE IF EXISTS todo_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0006_checklist_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-18 20:00
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='checklist',
+            index_together=set([('user', 'updated_at'), ('user', 'created_at')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='item',
+            index_together=set([('checklist', 'is_complete', 'created_at'), ('checklist', 'updated_at')]),
+        ),
+    ]
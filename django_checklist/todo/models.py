@@ -1,6 +1,11 @@
+# Python
+from datetime import timedelta
+
 # Django
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.translation import ugettext as _
 
 # Local
@@ -10,12 +15,37 @@ class Checklist(models.Model):
     user = models.ForeignKey(User)
     title = models.CharField(max_length=30)
     tags = models.ManyToManyField(Tag, related_name='%(class)s', blank=True)
+    # Maintained by todo.counters, repair with manage.py recount_checklists
+    item_count = models.PositiveIntegerField(default=0, editable=False)
+    completed_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        index_together = (
+            ('user', 'created_at'),
+            ('user', 'updated_at'),
+        )
+
+    # Only written by todo.counters
+    counter_fields = ('item_count', 'completed_count')
+
     def __str__(self):
         return '{0} - {1}'.format(self.title, self.created_at)
 
+    def save(self, force_insert=False, force_update=False, using=None, 
+        update_fields=None):
+        # A loaded Checklist would otherwise write back the counters it was
+        # loaded with, undoing item changes made since
+        if update_fields is None and not force_insert and \
+            not self._state.adding:
+            update_fields = [field.name for field in 
+                self._meta.concrete_fields if not field.primary_key and 
+                field.name not in self.counter_fields]
+
+        super().save(force_insert=force_insert, force_update=force_update, 
+            using=using, update_fields=update_fields)
+
 class Item(models.Model):
     checklist = models.ForeignKey(Checklist)
     description = models.CharField(max_length=100)
@@ -23,6 +53,52 @@ class Item(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        index_together = (
+            ('checklist', 'is_complete', 'created_at'),
+            ('checklist', 'updated_at'),
+        )
+
     def __str__(self):
         return '{0} - {1} - {2}'.format(self.description, self.is_complete, 
             self.created_at)
+
+    def save(self, *args, **kwargs):
+        # The row is re-read and locked before saving to count the change,
+        # see todo.signals
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+class TombstoneManager(models.Manager):
+    def get_cutoff(self):
+        """
+        Returns the time before which tombstones may have been pruned
+        """
+        return timezone.now() - timedelta(
+            days=getattr(settings, 'TOMBSTONE_RETENTION_DAYS', 30))
+
+    def prune(self):
+        """
+        Deletes the tombstones older than TOMBSTONE_RETENTION_DAYS
+        """
+        return self.filter(deleted_at__lt=self.get_cutoff()).delete()[0]
+
+class Tombstone(models.Model):
+    """
+    Records a deleted Checklist or Item so clients can sync deletions
+    """
+    user = models.ForeignKey(User)
+    model = models.CharField(max_length=30)
+    object_id = models.PositiveIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TombstoneManager()
+
+    class Meta:
+        index_together = (
+            ('user', 'deleted_at'),
+        )
+
+    def __str__(self):
+        return '{0} {1} - {2}'.format(self.model, self.object_id, 
+            self.deleted_at)
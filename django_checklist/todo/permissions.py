@@ -2,7 +2,8 @@
 from rest_framework import permissions
 
 # Local
-from .models import Checklist, Item
+from django_checklist.common.relations import resolve_pk
+from .models import Checklist
 
 class ChecklistPermissions(permissions.DjangoModelPermissions):
     def has_object_permission(self, request, view, obj):
@@ -10,21 +11,37 @@ class ChecklistPermissions(permissions.DjangoModelPermissions):
         if not validated:
             return False
 
-        return obj.user == request.user
+        return obj.user_id == request.user.pk
 
 class ItemPermissions(permissions.DjangoModelPermissions):
+    """
+    Only allows writing Items into Checklists owned by the user.
+
+    The referenced Checklist is loaded once and handed to the view in
+    related_objects, so serializer validation does not query it again.
+    Malformed or unknown hyperlinks are left for the serializer to reject.
+    """
+    write_actions = ('create', 'update', 'partial_update')
+
     def has_permission(self, request, view):
         validated = super().has_permission(request, view)
         if not validated:
             return False
 
+        if view.action in self.write_actions and hasattr(request.data, 'get'):
+            try:
+                checklist_id = resolve_pk(request.data.get('checklist'), 
+                    'checklist-detail')
+            except ValueError:
+                return True
+
+            view.related_objects = {
+                Checklist: Checklist.objects.in_bulk([checklist_id])
+            }
+
+        # Updates are checked after the Item lookup so non-owners get 404
         if view.action == 'create':
-            checklist_url = request.data['checklist']
-            tokens = checklist_url.split('/')
-            checklist_id = int(tokens[-2])
-            checklist = Checklist.objects.get(pk=checklist_id)
-            if checklist.user != request.user:
-                return False
+            return self._owns_related_checklists(request, view)
 
         return True
 
@@ -33,4 +50,15 @@ class ItemPermissions(permissions.DjangoModelPermissions):
         if not validated:
             return False
 
-        return obj.checklist.user == request.user
+        if obj.checklist.user_id != request.user.pk:
+            return False
+
+        return self._owns_related_checklists(request, view)
+
+    def _owns_related_checklists(self, request, view):
+        related_objects = getattr(view, 'related_objects', None) or {}
+        for checklist in related_objects.get(Checklist, {}).values():
+            if checklist.user_id != request.user.pk:
+                return False
+
+        return True
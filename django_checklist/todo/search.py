@@ -0,0 +1,270 @@
+# Python
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+
+# Django
+from django.conf import settings
+from django.db import connection
+
+# Local
+from .models import Checklist, Item
+
+TABLE = 'todo_search'
+
+# Rowids interleave both models: pk * 2 + code
+MODEL_CODES = {'checklist': 0, 'item': 1}
+MODEL_NAMES = {code: name for name, code in MODEL_CODES.items()}
+
+# Matches the tokens of SQLite's unicode61 tokenizer
+_TOKEN_RE = re.compile(r'[^\W_]+')
+
+def tokenize(text):
+    """
+    Returns lowercase tokens of text with diacritics removed
+    """
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _TOKEN_RE.findall(text)
+
+def get_document(instance):
+    """
+    Returns the (model, pk, user_id, text) indexed for a Checklist or Item
+    """
+    if isinstance(instance, Checklist):
+        return 'checklist', instance.pk, instance.user_id, instance.title
+
+    # The checklist is usually cached by select_related or the serializer
+    return 'item', instance.pk, instance.checklist.user_id, \
+        instance.description
+
+def get_key(instance):
+    return instance._meta.model_name, instance.pk
+
+class FTS5SearchIndex(object):
+    """
+    Index kept in an SQLite FTS5 table created by the todo migrations.
+
+    The owner is an indexed column, so a user's hits come straight out of
+    the inverted index instead of being filtered afterwards. Writes join
+    the surrounding transaction.
+    """
+
+    @classmethod
+    def is_available(cls):
+        return connection.vendor == 'sqlite' and \
+            TABLE in connection.introspection.table_names()
+
+    def add(self, documents):
+        rows = [(pk * 2 + MODEL_CODES[model], 'u{0}'.format(user_id), text)
+            for model, pk, user_id, text in documents]
+        if not rows:
+            return
+
+        with connection.cursor() as cursor:
+            cursor.executemany('INSERT OR REPLACE INTO {0} (rowid, owner, '
+                'text) VALUES (%s, %s, %s)'.format(TABLE), rows)
+
+    def remove(self, keys):
+        rowids = [pk * 2 + MODEL_CODES[model] for model, pk in keys]
+        with connection.cursor() as cursor:
+            # Chunked to stay under SQLite's limit on query parameters
+            for start in range(0, len(rowids), 500):
+                chunk = rowids[start:start + 500]
+                cursor.execute('DELETE FROM {0} WHERE rowid IN ({1})'.format(
+                    TABLE, ', '.join(['%s'] * len(chunk))), chunk)
+
+    def search(self, user_id, query, limit):
+        """
+        Returns up to limit (model, pk, score) hits, best first
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        # The last token is matched as a prefix for search-as-you-type
+        terms = ['text : "{0}"'.format(token) for token in tokens]
+        terms[-1] += ' *'
+        expression = ' AND '.join(['owner : "u{0}"'.format(user_id)] + terms)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT rowid, bm25({0}, 0.0, 1.0) AS score '
+                'FROM {0} WHERE {0} MATCH %s ORDER BY score LIMIT %s'.format(
+                TABLE), [expression, limit])
+            return [(MODEL_NAMES[rowid % 2], rowid // 2, -score)
+                for rowid, score in cursor.fetchall()]
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {0}'.format(TABLE))
+            cursor.execute('INSERT INTO {0} (rowid, owner, text) '
+                "SELECT id * 2, 'u' || user_id, title "
+                'FROM todo_checklist'.format(TABLE))
+            cursor.execute('INSERT INTO {0} (rowid, owner, text) '
+                "SELECT todo_item.id * 2 + 1, 'u' || todo_checklist.user_id, "
+                'todo_item.description FROM todo_item '
+                'INNER JOIN todo_checklist '
+                'ON todo_item.checklist_id = todo_checklist.id'.format(TABLE))
+
+class MemorySearchIndex(object):
+    """
+    Pure-Python inverted index for databases without FTS5.
+
+    Postings are keyed by (user_id, token), so a query only touches the
+    user's postings for its tokens; prefixes are found by bisecting the
+    user's sorted vocabulary. Hits are ranked with BM25. The index lives in
+    the process: it is loaded from the database on first search and kept up
+    to date by the same signals as the FTS5 table. It is reloaded after
+    max_age seconds to pick up writes made by other processes, so with
+    several processes their searches lag by up to that long. Hits are read
+    back from the database, so entries left by rolled back writes or
+    deleted elsewhere are dropped there.
+    """
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._documents = {}
+        self._postings = defaultdict(dict)
+        self._vocabulary = defaultdict(list)
+        self._total_length = 0
+
+    def add(self, documents):
+        with self._lock:
+            if self._loaded_at is None:
+                return
+
+            for model, pk, user_id, text in documents:
+                self._add(model, pk, user_id, text)
+
+    def remove(self, keys):
+        with self._lock:
+            if self._loaded_at is None:
+                return
+
+            for key in keys:
+                self._remove(key)
+
+    def search(self, user_id, query, limit):
+        """
+        Returns up to limit (model, pk, score) hits, best first
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        with self._lock:
+            if self._loaded_at is None or (self.max_age is not None and
+                time.monotonic() - self._loaded_at > self.max_age):
+                self.rebuild()
+
+            # The last token is matched as a prefix for search-as-you-type
+            postings = [self._postings.get((user_id, token), {})
+                for token in tokens[:-1]]
+            postings.append(self._get_prefix_postings(user_id, tokens[-1]))
+            postings.sort(key=len)
+
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+
+            count = len(self._documents)
+            average_length = self._total_length / count if count else 0
+            hits = []
+            for key in candidates:
+                length = self._documents[key][2]
+                score = 0.0
+                for posting in postings:
+                    frequency = posting[key]
+                    idf = math.log(1 + (count - len(posting) + 0.5) /
+                        (len(posting) + 0.5))
+                    score += idf * frequency * (self.k1 + 1) / (frequency +
+                        self.k1 * (1 - self.b + self.b * length /
+                        average_length))
+                hits.append((key[0], key[1], score))
+
+        return heapq.nlargest(limit, hits, key=lambda hit: hit[2])
+
+    def rebuild(self):
+        with self._lock:
+            self._documents.clear()
+            self._postings.clear()
+            self._vocabulary.clear()
+            self._total_length = 0
+
+            for pk, user_id, title in Checklist.objects.values_list('pk',
+                'user_id', 'title').iterator():
+                self._add('checklist', pk, user_id, title)
+            for pk, user_id, description in Item.objects.values_list('pk',
+                'checklist__user_id', 'description').iterator():
+                self._add('item', pk, user_id, description)
+            self._loaded_at = time.monotonic()
+
+    def _get_prefix_postings(self, user_id, prefix):
+        """
+        Merges the postings of the user's tokens starting with prefix
+        """
+        vocabulary = self._vocabulary.get(user_id, [])
+        merged = {}
+        for i in range(bisect_left(vocabulary, prefix), len(vocabulary)):
+            token = vocabulary[i]
+            if not token.startswith(prefix):
+                break
+            for key, frequency in self._postings[(user_id, token)].items():
+                merged[key] = merged.get(key, 0) + frequency
+
+        return merged
+
+    def _add(self, model, pk, user_id, text):
+        key = (model, pk)
+        self._remove(key)
+
+        frequencies = Counter(tokenize(text))
+        length = sum(frequencies.values())
+        self._documents[key] = (user_id, frequencies, length)
+        self._total_length += length
+        for token, frequency in frequencies.items():
+            posting = self._postings[(user_id, token)]
+            if not posting:
+                insort(self._vocabulary[user_id], token)
+            posting[key] = frequency
+
+    def _remove(self, key):
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+
+        user_id, frequencies, length = document
+        self._total_length -= length
+        for token in frequencies:
+            posting = self._postings[(user_id, token)]
+            del posting[key]
+            if not posting:
+                del self._postings[(user_id, token)]
+                vocabulary = self._vocabulary[user_id]
+                del vocabulary[bisect_left(vocabulary, token)]
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_search_index():
+    """
+    Returns the FTS5 index on SQLite and the in-process index otherwise
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = FTS5SearchIndex() if \
+                    FTS5SearchIndex.is_available() else MemorySearchIndex(
+                    getattr(settings, 'SEARCH_INDEX_MAX_AGE', None))
+
+    return _index
@@ -1,14 +1,113 @@
+# Django
+from django.db import connection
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
 # External
-from rest_framework.serializers import HyperlinkedModelSerializer
+from rest_framework.serializers import (HyperlinkedModelSerializer,
+    ListSerializer)
 
 # Local
+from django_checklist.common.bulk import bulk_create
+from django_checklist.common.relations import CachedHyperlinkedRelatedField
+from django_checklist.common.serializers import TagSerializer
+from .counters import CountDeltas
 from .models import Checklist, Item
+from .search import get_document, get_search_index
 
 class ChecklistSerializer(HyperlinkedModelSerializer):
     class Meta:
         model = Checklist
         read_only_fields = ('user',)
 
+class ItemListSerializer(ListSerializer):
+    """
+    Creates and updates Items with bulk queries instead of a save per row.
+
+    No signals are sent, so counters and the search index are kept here.
+    """
+
+    def create(self, validated_data):
+        items = bulk_create(Item, [Item(**attrs) for attrs in validated_data])
+        get_search_index().add([get_document(item) for item in items])
+
+        counts = CountDeltas()
+        for item in items:
+            counts.add(item.checklist_id, item.is_complete)
+        counts.apply()
+
+        return items
+
+    def update(self, instance, validated_data):
+        items = list(instance)
+        fields = set()
+        counts = CountDeltas()
+        for item, attrs in zip(items, validated_data):
+            counts.remove(item.checklist_id, item.is_complete)
+            for attr, value in attrs.items():
+                setattr(item, attr, value)
+            fields.update(attrs)
+            counts.add(item.checklist_id, item.is_complete)
+            item._counted = (item.checklist_id, item.is_complete)
+
+        now = timezone.now()
+        model_fields = [Item._meta.get_field(field) for field in fields]
+        # Each row binds its pk plus a (pk, value) pair per updated field
+        batch_size = max(connection.ops.bulk_batch_size(
+            ['pk'] + model_fields * 2, items), 1)
+
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            updates = {'updated_at': now}
+            for model_field in model_fields:
+                updates[model_field.attname] = Case(*[When(pk=item.pk, 
+                    then=Value(getattr(item, model_field.attname))) 
+                    for item in batch], output_field=model_field)
+
+            Item.objects.filter(pk__in=[item.pk for item in batch]).update(
+                **updates)
+
+        for item in items:
+            item.updated_at = now
+        counts.apply()
+
+        if fields & {'checklist', 'description'}:
+            get_search_index().add([get_document(item) for item in items])
+
+        return items
+
 class ItemSerializer(HyperlinkedModelSerializer):
+    serializer_related_field = CachedHyperlinkedRelatedField
+
     class Meta:
         model = Item
+        list_serializer_class = ItemListSerializer
+
+# Relations ?expand may nest into a Checklist: (accessor, serializer)
+EXPANDABLE_FIELDS = {
+    'items': ('item_set', ItemSerializer),
+    'tags': ('tags', TagSerializer),
+}
+
+_expanded_serializers = {}
+
+def get_expanded_checklist_serializer(expand):
+    """
+    Returns a ChecklistSerializer subclass nesting the relations named in
+    expand, so QueryPlanMixin prefetches them
+    """
+    expand = tuple(sorted(set(expand)))
+    if expand not in _expanded_serializers:
+        attrs = {}
+        for name in expand:
+            source, serializer_class = EXPANDABLE_FIELDS[name]
+            kwargs = {'source': source} if source != name else {}
+            attrs[name] = serializer_class(many=True, read_only=True, 
+                **kwargs)
+
+        name = 'Expanded{0}ChecklistSerializer'.format(''.join(
+            part.title() for part in expand))
+        _expanded_serializers[expand] = type(ChecklistSerializer)(name, 
+            (ChecklistSerializer,), attrs)
+
+    return _expanded_serializers[expand]
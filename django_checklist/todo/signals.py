@@ -0,0 +1,242 @@
+# Python
+from contextlib import contextmanager
+import threading
+
+# Django
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_init, 
+    post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+# Local
+from django_checklist.common.mixins import invalidate_response_cache
+from django_checklist.common.signals import (TAG_CACHE_PREFIX, 
+    TAG_STATS_CACHE_PREFIX)
+from .changes import get_change_hub
+from .counters import CountDeltas
+from .models import Checklist, Item, Tombstone
+from .search import get_document, get_key, get_search_index
+
+_deferred = threading.local()
+
+def _get_tagged_checklists(instance, action, reverse, pk_set):
+    if not reverse:
+        return Checklist.objects.filter(pk=instance.pk)
+    elif action == 'pre_clear':
+        return Checklist.objects.filter(tags=instance)
+    return Checklist.objects.filter(pk__in=pk_set)
+
+@receiver(m2m_changed, sender=Checklist.tags.through)
+def _touch_tagged_checklists(sender, instance, action, reverse, pk_set, 
+    **kwargs):
+    """
+    Bumps updated_at on Checklists whose tags change, so validators built
+    from updated_at see the change
+    """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    _get_tagged_checklists(instance, action, reverse, pk_set) \
+        .update(updated_at=timezone.now())
+
+@receiver(m2m_changed, sender=Checklist.tags.through)
+def _publish_tagged_checklists(sender, instance, action, reverse, pk_set, 
+    **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if not reverse:
+        _publish(instance.user_id, [('checklist', instance.pk, False)])
+        return
+
+    changes = {}
+    for pk, user_id in _get_tagged_checklists(instance, action, reverse, 
+        pk_set).values_list('pk', 'user_id'):
+        changes.setdefault(user_id, []).append(('checklist', pk, False))
+    for user_id, user_changes in changes.items():
+        _publish(user_id, user_changes)
+
+@receiver(m2m_changed, sender=Checklist.tags.through)
+def _invalidate_tag_cache(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_response_cache(TAG_CACHE_PREFIX)
+        invalidate_response_cache(TAG_STATS_CACHE_PREFIX)
+
+@receiver(post_delete, sender=Checklist)
+def _invalidate_tag_stats(sender, instance, **kwargs):
+    # The checklist's tags are unlinked without an m2m_changed signal
+    invalidate_response_cache(TAG_STATS_CACHE_PREFIX)
+
+@contextmanager
+def deferred_writes(user):
+    """
+    Collects the tombstones, counter changes, search index removals and
+    change feed entries of Item and Checklist writes made by user inside the
+    block and applies them at the end, with one statement each (one update
+    per checklist for the counters) rather than per row
+    """
+    _deferred.user = user
+    _deferred.tombstones = []
+    _deferred.counts = CountDeltas()
+    _deferred.unindexed = []
+    _deferred.changes = []
+    try:
+        yield
+        Tombstone.objects.bulk_create(_deferred.tombstones)
+        _deferred.counts.apply()
+        get_search_index().remove(_deferred.unindexed)
+        changes = _deferred.changes
+        if changes:
+            transaction.on_commit(
+                lambda: get_change_hub().publish(user.pk, changes))
+    finally:
+        del _deferred.user
+        del _deferred.tombstones
+        del _deferred.counts
+        del _deferred.unindexed
+        del _deferred.changes
+
+def _update_counts(update):
+    counts = getattr(_deferred, 'counts', None)
+    if counts is not None:
+        update(counts)
+    else:
+        counts = CountDeltas()
+        update(counts)
+        counts.apply()
+
+def _get_counted_state(item):
+    """
+    Returns the (checklist_id, is_complete) of item's row, locked for the
+    rest of the transaction, or None if it is gone
+    """
+    return Item.objects.select_for_update().filter(pk=item.pk) \
+        .values_list('checklist_id', 'is_complete').first()
+
+@receiver(post_init, sender=Item)
+def _remember_counted_state(sender, instance, **kwargs):
+    instance._counted = (instance.checklist_id, instance.is_complete)
+
+@receiver(pre_save, sender=Item)
+def _lock_counted_state(sender, instance, raw, **kwargs):
+    # The instance may be stale, so the change is counted from the row
+    if not instance._state.adding and not raw:
+        instance._counted = _get_counted_state(instance)
+
+@receiver(post_save, sender=Item)
+def _count_saved_item(sender, instance, created, **kwargs):
+    counted = (instance.checklist_id, instance.is_complete)
+    if created or instance._counted is None:
+        _update_counts(lambda counts: counts.add(*counted))
+    elif counted != instance._counted:
+        def update(counts):
+            counts.remove(*instance._counted)
+            counts.add(*counted)
+        _update_counts(update)
+
+    instance._counted = counted
+
+@receiver(pre_delete, sender=Item)
+def _lock_deleted_state(sender, instance, **kwargs):
+    # Items deleted in bulk under deferred_writes were just loaded
+    if getattr(_deferred, 'counts', None) is None:
+        instance._counted = _get_counted_state(instance)
+
+@receiver(post_delete, sender=Item)
+def _count_deleted_item(sender, instance, **kwargs):
+    if instance._counted is not None:
+        _update_counts(lambda counts: counts.remove(*instance._counted))
+
+def _get_user_id(instance):
+    user = getattr(_deferred, 'user', None)
+    if user is not None:
+        return user.pk
+    elif isinstance(instance, Checklist):
+        return instance.user_id
+    return instance.checklist.user_id
+
+@receiver(post_delete, sender=Checklist)
+@receiver(post_delete, sender=Item)
+def _record_tombstone(sender, instance, **kwargs):
+    user_id = _get_user_id(instance)
+
+    # Nobody is left to sync with once the owner is gone
+    if user_id in getattr(_deferred, 'deleted_users', ()):
+        return
+
+    tombstone = Tombstone(user_id=user_id, model=sender._meta.model_name, 
+        object_id=instance.pk)
+    if getattr(_deferred, 'user', None) is not None:
+        _deferred.tombstones.append(tombstone)
+    else:
+        tombstone.save()
+
+@receiver(pre_delete, sender=User)
+def _user_deleting(sender, instance, **kwargs):
+    if not hasattr(_deferred, 'deleted_users'):
+        _deferred.deleted_users = set()
+    _deferred.deleted_users.add(instance.pk)
+
+@receiver(post_delete, sender=User)
+def _user_deleted(sender, instance, **kwargs):
+    _deferred.deleted_users.discard(instance.pk)
+
+def _get_indexed_state(instance):
+    if isinstance(instance, Checklist):
+        return instance.user_id, instance.title
+    return instance.checklist_id, instance.description
+
+@receiver(post_init, sender=Checklist)
+@receiver(post_init, sender=Item)
+def _remember_indexed_state(sender, instance, **kwargs):
+    instance._indexed = _get_indexed_state(instance)
+
+@receiver(post_save, sender=Checklist)
+@receiver(post_save, sender=Item)
+def _index_saved(sender, instance, created, **kwargs):
+    """
+    Indexes new objects and objects whose text or owner changed
+    """
+    state = _get_indexed_state(instance)
+    if created or state != instance._indexed:
+        get_search_index().add([get_document(instance)])
+    instance._indexed = state
+
+@receiver(post_delete, sender=Checklist)
+@receiver(post_delete, sender=Item)
+def _unindex_deleted(sender, instance, **kwargs):
+    unindexed = getattr(_deferred, 'unindexed', None)
+    if unindexed is not None:
+        unindexed.append(get_key(instance))
+    else:
+        get_search_index().remove([get_key(instance)])
+
+def _publish(user_id, changes):
+    """
+    Publishes changes to the change feed once the transaction commits, so
+    subscribers read the committed rows
+    """
+    pending = getattr(_deferred, 'changes', None)
+    if pending is not None:
+        pending.extend(changes)
+    else:
+        transaction.on_commit(
+            lambda: get_change_hub().publish(user_id, changes))
+
+@receiver(post_save, sender=Checklist)
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Checklist)
+@receiver(post_delete, sender=Item)
+def _publish_change(sender, instance, signal, **kwargs):
+    user_id = _get_user_id(instance)
+    if user_id in getattr(_deferred, 'deleted_users', ()):
+        return
+
+    changes = [(sender._meta.model_name, instance.pk, 
+        signal is post_delete)]
+    if sender is Item:
+        # The checklist's counters changed with it
+        changes.append(('checklist', instance.checklist_id, False))
+    _publish(user_id, changes)
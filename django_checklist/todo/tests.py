@@ -1,17 +1,71 @@
 # -*- coding: utf-8 -*-
+# Python
+import asyncio
+from datetime import timedelta
+from io import StringIO
+import json
+import tempfile
+import threading
+import time
+from unittest import mock
+
 # Django
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils import timezone
 from django.db.utils import IntegrityError
-from django.test import TestCase
+from django.test import override_settings, TestCase
+from django.test.utils import CaptureQueriesContext
 
 # External
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.reverse import reverse
-from rest_framework.test import APITestCase
+from rest_framework.serializers import SerializerMethodField
+from rest_framework.test import (APIRequestFactory, APITestCase, 
+    APITransactionTestCase)
 
 # Local
-from .models import Checklist, Item
+from .changes import CacheChangeHub, MemoryChangeHub
+from .counters import recount_checklists
+from .importer import ChecklistImporter
+from .models import Checklist, Item, Tombstone
+from .search import get_search_index, MemorySearchIndex
+from .serializers import ChecklistSerializer, ItemSerializer
+from .views import ChecklistViewSet
+from django_checklist.common.asgi import ASGIHandler
 from django_checklist.common.models import Tag
+from django_checklist.common.serializers import TagSerializer
+from django_checklist.common.values import get_values_reader
 from django_checklist.django_auth.mixins import PermissionsTestCaseMixin
+from django_checklist.django_auth.models import APIToken, hash_key
+
+class ListQueryPlanMixin(object):
+    def _get_page_plan(self, table, params):
+        """
+        Returns the SQLite query plan of the list page query on table
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        sql = [query['sql'] for query in context.captured_queries 
+            if query['sql'].startswith('SELECT') and 'LIMIT' in query['sql'] 
+            and 'FROM "{0}"'.format(table) in query['sql']][-1]
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexedPlan(self, table, params):
+        plan = self._get_page_plan(table, params)
+        # Every table is searched through an index, none scanned
+        self.assertFalse([step for step in plan if step.startswith('SCAN')], 
+            plan)
+        self.assertTrue(any(step.startswith('SEARCH {0} USING'.format(table)) 
+            for step in plan), plan)
+        return plan
 
 ############
 # Checklist
@@ -84,6 +138,184 @@ class ChecklistAPIListTestCase(APITestCase, PermissionsTestCaseMixin):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+class ChecklistAPIListQueryCountTestCase(APITestCase, 
+    PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        self.url = reverse('checklist-list')
+        self.tags = [Tag.objects.create(name='tag{0}'.format(i)) 
+            for i in range(3)]
+
+    def _create_checklists(self, count):
+        for i in range(count):
+            checklist = Checklist.objects.create(user=self.basic_user1, 
+                title='Checklist {0}'.format(i))
+            checklist.tags.add(*self.tags)
+
+    def _count_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_constant_queries(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        self._create_checklists(2)
+        # Warm the permission cache on the authenticated user
+        self.client.get(self.url)
+        small = self._count_queries()
+
+        self._create_checklists(20)
+        large = self._count_queries()
+        self.assertEqual(small, large)
+
+class ChecklistAPIFilterTestCase(APITestCase, PermissionsTestCaseMixin, 
+    ListQueryPlanMixin):
+    def setUp(self):
+        self.initialize()
+        self.url = reverse('checklist-list')
+        self.tag = Tag.objects.create(name='errands')
+        self.checklists = [Checklist.objects.create(user=self.basic_user1, 
+            title='Checklist {0}'.format(i)) for i in range(3)]
+        self.checklists[1].tags.add(self.tag)
+        Checklist.objects.create(user=self.basic_user2, 
+            title='Other').tags.add(self.tag)
+        self.client.force_authenticate(user=self.basic_user1)
+
+    def _get_titles(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [result['title'] for result in response.data['results']]
+
+    def test_tags_name(self):
+        self.assertEqual(self._get_titles({'tags__name': 'errands'}), 
+            ['Checklist 1'])
+        self.assertEqual(self._get_titles({'tags__name': 'missing'}), [])
+
+    def test_updated_at_range(self):
+        checklist = self.checklists[0]
+        checklist.title = 'Renamed'
+        checklist.save()
+
+        since = checklist.updated_at.isoformat()
+        self.assertEqual(self._get_titles({'updated_at__gte': since}), 
+            ['Renamed'])
+        self.assertEqual(len(self._get_titles({'updated_at__lt': since})), 2)
+
+    def test_invalid_timestamp(self):
+        response = self.client.get(self.url, {'updated_at__gte': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('updated_at__gte', response.data)
+
+    def test_ordering(self):
+        checklist = self.checklists[0]
+        checklist.save()
+
+        titles = self._get_titles({'ordering': '-updated_at'})
+        self.assertEqual(titles[0], 'Checklist 0')
+        titles = self._get_titles({'ordering': 'updated_at'})
+        self.assertEqual(titles[-1], 'Checklist 0')
+
+    def test_ordering_whitelist(self):
+        # Unlisted fields fall back to the default ordering
+        self.assertEqual(self._get_titles({'ordering': '-title'}), 
+            ['Checklist 0', 'Checklist 1', 'Checklist 2'])
+
+    def test_ordered_pages(self):
+        response = self.client.get(self.url, 
+            {'ordering': '-updated_at', 'page_size': 2})
+        titles = [result['title'] for result in response.data['results']]
+        response = self.client.get(response.data['next'])
+        titles.extend(result['title'] for result in response.data['results'])
+
+        expected = Checklist.objects.filter(user=self.basic_user1).order_by(
+            '-updated_at', '-id').values_list('title', flat=True)
+        self.assertEqual(titles, list(expected))
+
+    def test_query_plans(self):
+        self.assertIndexedPlan('todo_checklist', {'tags__name': 'errands'})
+        self.assertIndexedPlan('todo_checklist', 
+            {'updated_at__gte': timezone.now().isoformat(), 
+            'ordering': '-updated_at'})
+        plan = self.assertIndexedPlan('todo_checklist', 
+            {'ordering': '-updated_at'})
+        # The (user, updated_at) index returns rows already in order
+        self.assertFalse([step for step in plan if 'TEMP B-TREE' in step], 
+            plan)
+
+class ChecklistAPIConditionalGetTestCase(APITestCase, 
+    PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        self.checklist = Checklist.objects.create(user=self.basic_user1, 
+            title='Shopping')
+        self.url = reverse('checklist-list')
+        self.detail_url = reverse('checklist-detail', 
+            args=(self.checklist.id,))
+        self.client.force_authenticate(user=self.basic_user1)
+
+    def test_list_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        # One aggregate query and no page query or serialization
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        Checklist.objects.create(user=self.basic_user1, title='Homework')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_after_delete(self):
+        Checklist.objects.create(user=self.basic_user1, title='Homework')
+        etag = self.client.get(self.url)['ETag']
+
+        self.checklist.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_after_tagging(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.checklist.tags.add(Tag.objects.create(name='sports'))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_etag_per_user(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.client.force_authenticate(user=self.basic_user2)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_etag(self):
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(self.detail_url, {'title': 'Groceries'})
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_last_modified(self):
+        response = self.client.get(self.detail_url)
+        last_modified = response['Last-Modified']
+
+        response = self.client.get(self.detail_url, 
+            HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(self.detail_url, 
+            HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2000 00:00:00 GMT')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
 class ChecklistAPICreateTestCase(APITestCase, PermissionsTestCaseMixin):
     def setUp(self):
         self.initialize()
@@ -123,6 +355,15 @@ class ChecklistAPIUpdateTestCase(APITestCase, PermissionsTestCaseMixin):
         response = self.client.patch(self.url, self.data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_tags(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        tag = Tag.objects.create(name='food')
+        tag_url = 'http://testserver' + reverse('tag-detail', args=(tag.id,))
+        response = self.client.patch(self.url, {'tags': [tag_url]}, 
+            format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['tags'], [tag_url])
+
     def test_nonowner_user(self):
         self.client.force_authenticate(user=self.basic_user2)
         response = self.client.put(self.url, self.data)
@@ -173,6 +414,239 @@ class ChecklistAPIDetailTestCase(APITestCase, PermissionsTestCaseMixin):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+class ChecklistAPIExpandTestCase(APITestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        self.checklist = Checklist.objects.create(user=self.basic_user1, 
+            title='Shopping')
+        self.checklist.tags.add(Tag.objects.create(name='errands'), 
+            Tag.objects.create(name='weekly'))
+        self.items = [Item.objects.create(checklist=self.checklist, 
+            description='Item {0}'.format(i)) for i in range(2)]
+        self.url = reverse('checklist-detail', args=(self.checklist.id,))
+        self.client.force_authenticate(user=self.basic_user1)
+
+    def _count_queries(self, params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries)
+
+    def test_expand(self):
+        response = self.client.get(self.url, {'expand': 'items,tags'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['title'], 'Shopping')
+        self.assertEqual([item['description'] 
+            for item in response.data['items']], ['Item 0', 'Item 1'])
+        self.assertEqual(sorted(tag['name'] for tag in response.data['tags']), 
+            ['errands', 'weekly'])
+
+    def test_expand_items_only(self):
+        response = self.client.get(self.url, {'expand': 'items'})
+        self.assertEqual(len(response.data['items']), 2)
+        self.assertTrue(all(isinstance(tag, str) 
+            for tag in response.data['tags']))
+
+    def test_not_expanded(self):
+        response = self.client.get(self.url)
+        self.assertNotIn('items', response.data)
+
+    def test_unknown_relation(self):
+        response = self.client.get(self.url, {'expand': 'items,owner'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_nonowner_user(self):
+        self.client.force_authenticate(user=self.basic_user2)
+        response = self.client.get(self.url, {'expand': 'items,tags'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_query_budget(self):
+        params = {'expand': 'items,tags'}
+        # Warm the permission cache on the authenticated user
+        self.client.get(self.url, params)
+        # The checklist, its items and its tags
+        self.assertEqual(self._count_queries(params), 3)
+
+        for i in range(20):
+            Item.objects.create(checklist=self.checklist, 
+                description='Extra {0}'.format(i))
+        self.checklist.tags.add(*[Tag.objects.create(name='tag{0}'.format(i)) 
+            for i in range(5)])
+        self.assertEqual(self._count_queries(params), 3)
+
+    def test_etag_follows_items(self):
+        params = {'expand': 'items'}
+        etag = self.client.get(self.url, params)['ETag']
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Item.objects.filter(pk=self.items[0].pk).update(
+            description='Renamed', updated_at=timezone.now())
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['items'][0]['description'], 'Renamed')
+
+        etag = response['ETag']
+        self.items[1].delete()
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+class ChecklistAPIExportTestCase(APITestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        tag = Tag.objects.create(name='errands')
+        self.checklists = []
+        for i in range(3):
+            checklist = Checklist.objects.create(user=self.basic_user1, 
+                title='Checklist {0}'.format(i))
+            checklist.tags.add(tag)
+            for j in range(i):
+                Item.objects.create(checklist=checklist, 
+                    description='Item {0}'.format(j))
+            self.checklists.append(checklist)
+        Checklist.objects.create(user=self.basic_user2, title='Other')
+        self.url = reverse('checklist-export')
+
+    def test_unauthenticated(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        # Chunks smaller than the data exercise the keyset walk
+        with mock.patch.object(ChecklistViewSet, 'export_chunk_size', 2):
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response.streaming)
+            content = b''.join(response.streaming_content).decode('utf-8')
+
+        lines = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(lines), len(self.checklists))
+
+        for line, checklist in zip(lines, self.checklists):
+            items = line.pop('items')
+            detail = self.client.get(reverse('checklist-detail', 
+                args=(checklist.id,)))
+            self.assertEqual(line, json.loads(detail.content.decode('utf-8')))
+
+            expected = [self.client.get(reverse('item-detail', 
+                args=(item.id,))).data for item in checklist.item_set.all()]
+            self.assertEqual(items, expected)
+
+class ChecklistAPIImportTestCase(APITestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        Tag.objects.create(name='home')
+        self.url = reverse('checklist-import')
+        self.records = [
+            {'title': 'Shopping', 'tags': ['home', 'errands'], 'items': [
+                {'description': 'Milk', 'is_complete': True}, 
+                {'description': 'Eggs'}]}, 
+            {'title': 'Empty'}, 
+            {'title': 'Chores', 'tags': ['home'], 'items': [
+                {'description': 'Dishes'}]},
+        ]
+
+    def _jsonl(self, records):
+        return '\n'.join(json.dumps(record) for record in records)
+
+    def assertImported(self):
+        checklists = Checklist.objects.filter(user=self.basic_user1) \
+            .order_by('id')
+        self.assertEqual([checklist.title for checklist in checklists], 
+            ['Shopping', 'Empty', 'Chores'])
+        self.assertEqual([(checklist.item_count, checklist.completed_count) 
+            for checklist in checklists], [(2, 1), (0, 0), (1, 0)])
+        self.assertEqual(sorted(checklists[0].tags.values_list('name', 
+            flat=True)), ['errands', 'home'])
+        self.assertEqual(list(checklists[0].item_set.order_by('id')
+            .values_list('description', 'is_complete')), 
+            [('Milk', True), ('Eggs', False)])
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_unauthenticated(self):
+        response = self.client.post(self.url, self._jsonl(self.records), 
+            content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_jsonl(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        # Batches smaller than the input exercise the flushes
+        with mock.patch.object(ChecklistViewSet, 'import_batch_size', 2):
+            response = self.client.post(self.url, 
+                self._jsonl(self.records), content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['checklists'], 3)
+        self.assertEqual(response.data['items'], 3)
+        self.assertEqual(response.data['tags_created'], 1)
+        self.assertEqual(response.data['tag_links'], 3)
+        self.assertImported()
+
+        hits = get_search_index().search(self.basic_user1.pk, 'dishes', 10)
+        self.assertEqual([hit[0] for hit in hits], ['item'])
+
+    def test_csv_upload(self):
+        rows = ['title,tags,description,is_complete', 
+            'Shopping,home errands,Milk,true', 'Shopping,home errands,Eggs,', 
+            'Empty,,,', 'Chores,home,Dishes,false']
+        upload = SimpleUploadedFile('checklists.csv', 
+            '\n'.join(rows).encode('utf-8'), content_type='text/csv')
+
+        self.client.force_authenticate(user=self.basic_user1)
+        response = self.client.post(self.url, {'file': upload}, 
+            format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertImported()
+
+    def test_invalid_record(self):
+        records = self.records + [{'title': 'a' * 31}]
+
+        self.client.force_authenticate(user=self.basic_user1)
+        with mock.patch.object(ChecklistViewSet, 'import_batch_size', 2):
+            response = self.client.post(self.url, self._jsonl(records), 
+                content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Line 4', response.data[0])
+        self.assertFalse(Checklist.objects.exists())
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_invalid_csv(self):
+        upload = SimpleUploadedFile('checklists.csv', 
+            b'title,tags,description,is_complete\nShop\0ping,,Milk,', 
+            content_type='text/csv')
+
+        self.client.force_authenticate(user=self.basic_user1)
+        response = self.client.post(self.url, {'file': upload}, 
+            format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Line 2', response.data[0])
+
+    def test_tag_created_concurrently(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        # 'home' exists but is created by another import after the lookup
+        with mock.patch('django_checklist.todo.importer.Tag.objects.filter', 
+            return_value=Tag.objects.none()):
+            response = self.client.post(self.url, 
+                self._jsonl(self.records), content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['tags_created'], 1)
+        self.assertImported()
+
+    def test_tags_invalidated_on_commit(self):
+        with mock.patch('django_checklist.todo.importer.tag_index') as index:
+            with transaction.atomic():
+                ChecklistImporter(self.basic_user1).run(
+                    enumerate(self.records, start=1))
+                self.assertFalse(index.invalidate.called)
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as f:
+            f.write(self._jsonl(self.records))
+            f.flush()
+            call_command('import_checklists', 'basic_user1', f.name, 
+                batch_size=2, verbosity=0, stdout=StringIO())
+        self.assertImported()
+
 #######
 # Item
 #######
@@ -241,6 +715,187 @@ class ItemCreationTestCase(TestCase, PermissionsTestCaseMixin):
             description=self.description3)
         self.assertEqual(item.is_complete, False)
 
+class ItemAPIListPaginationTestCase(APITestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        self.checklist, created = Checklist.objects.get_or_create(
+            user=self.basic_user1, title='Shopping')
+        self.items = [Item.objects.create(checklist=self.checklist, 
+            description='Item {0}'.format(i)) for i in range(7)]
+        self.url = reverse('item-list')
+
+    def _get_ids(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [int(result['url'].split('/')[-2]) 
+            for result in response.data['results']]
+
+    def test_page_size(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        response = self.client.get(self.url, {'page_size': 3})
+        self.assertEqual(self._get_ids(response), 
+            [item.id for item in self.items[:3]])
+        self.assertIsNotNone(response.data['next'])
+        self.assertIsNone(response.data['previous'])
+
+    def test_walk_forward_and_back(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        response = self.client.get(self.url, {'page_size': 3})
+        ids = self._get_ids(response)
+
+        # Rows inserted mid-walk must not shift the remaining pages
+        Item.objects.create(checklist=self.checklist, description='Late')
+
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            ids.extend(self._get_ids(response))
+
+        expected = list(Item.objects.order_by('created_at', 'id')
+            .values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(self._get_ids(response), expected[3:6])
+
+    def test_invalid_cursor(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        response = self.client.get(self.url, {'cursor': 'bogus'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class ItemAPIFilterTestCase(APITestCase, PermissionsTestCaseMixin, 
+    ListQueryPlanMixin):
+    def setUp(self):
+        self.initialize()
+        self.url = reverse('item-list')
+        self.shopping = Checklist.objects.create(user=self.basic_user1, 
+            title='Shopping')
+        self.chores = Checklist.objects.create(user=self.basic_user1, 
+            title='Chores')
+        self.milk = Item.objects.create(checklist=self.shopping, 
+            description='Milk')
+        self.eggs = Item.objects.create(checklist=self.shopping, 
+            description='Eggs', is_complete=True)
+        self.dishes = Item.objects.create(checklist=self.chores, 
+            description='Dishes')
+        self.client.force_authenticate(user=self.basic_user1)
+
+    def _get_descriptions(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [result['description'] for result in response.data['results']]
+
+    def test_checklist(self):
+        url = reverse('checklist-detail', args=[self.shopping.pk])
+        self.assertEqual(self._get_descriptions({'checklist': url}), 
+            ['Milk', 'Eggs'])
+        self.assertEqual(self._get_descriptions(
+            {'checklist': self.chores.pk}), ['Dishes'])
+
+    def test_other_users_checklist(self):
+        other = Checklist.objects.create(user=self.basic_user2, title='Other')
+        Item.objects.create(checklist=other, description='Hidden')
+        self.assertEqual(self._get_descriptions({'checklist': other.pk}), [])
+
+    def test_invalid_checklist(self):
+        response = self.client.get(self.url, 
+            {'checklist': reverse('tag-detail', args=[1])})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_is_complete(self):
+        self.assertEqual(self._get_descriptions({'is_complete': 'true'}), 
+            ['Eggs'])
+        self.assertEqual(self._get_descriptions({'is_complete': 'false', 
+            'checklist': self.shopping.pk}), ['Milk'])
+
+        response = self.client.get(self.url, {'is_complete': 'maybe'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_updated_at_range(self):
+        self.milk.is_complete = True
+        self.milk.save()
+
+        since = self.milk.updated_at.isoformat()
+        self.assertEqual(self._get_descriptions({'updated_at__gte': since}), 
+            ['Milk'])
+        self.assertEqual(self._get_descriptions({'updated_at__lt': since}), 
+            ['Eggs', 'Dishes'])
+
+    def test_ordering(self):
+        self.milk.save()
+        self.assertEqual(self._get_descriptions({'ordering': '-updated_at'}), 
+            ['Milk', 'Dishes', 'Eggs'])
+
+    def test_query_plans(self):
+        self.assertIndexedPlan('todo_item', {'checklist': self.shopping.pk})
+        self.assertIndexedPlan('todo_item', {'is_complete': 'false'})
+        self.assertIndexedPlan('todo_item', 
+            {'updated_at__gte': timezone.now().isoformat()})
+        plan = self.assertIndexedPlan('todo_item', {'is_complete': 'false', 
+            'checklist': self.shopping.pk})
+        # (checklist, is_complete, created_at) returns rows already in order
+        self.assertFalse([step for step in plan if 'TEMP B-TREE' in step], 
+            plan)
+        plan = self.assertIndexedPlan('todo_item', 
+            {'checklist': self.shopping.pk, 'ordering': '-updated_at'})
+        self.assertFalse([step for step in plan if 'TEMP B-TREE' in step], 
+            plan)
+
+class ValuesReaderTestCase(APITestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        tags = [Tag.objects.create(name='tag{0}'.format(i)) for i in range(3)]
+        for i in range(4):
+            checklist = Checklist.objects.create(user=self.basic_user1, 
+                title='Checklist {0}'.format(i))
+            checklist.tags.add(*tags[i % 3:])
+            for j in range(3):
+                Item.objects.create(checklist=checklist, 
+                    description='Item {0}'.format(j), is_complete=j == 0)
+        recount_checklists()
+
+    def assertRendersIdentically(self, serializer_class, queryset, **context):
+        context['request'] = APIRequestFactory().get('/')
+        expected = serializer_class(queryset, many=True, context=context).data
+
+        reader = get_values_reader(serializer_class(context=context))
+        self.assertIsNotNone(reader)
+        actual = reader.read(queryset.values())
+
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(actual), renderer.render(expected))
+
+    def test_checklists(self):
+        self.assertRendersIdentically(ChecklistSerializer, 
+            Checklist.objects.prefetch_related('tags').order_by('id'))
+
+    def test_items(self):
+        self.assertRendersIdentically(ItemSerializer, 
+            Item.objects.order_by('id'))
+
+    def test_tags(self):
+        self.assertRendersIdentically(TagSerializer, Tag.objects.order_by('id'))
+
+    def test_unsupported_field(self):
+        class TitleSerializer(ChecklistSerializer):
+            upper_title = SerializerMethodField()
+
+            def get_upper_title(self, obj):
+                return obj.title.upper()
+
+        request = APIRequestFactory().get('/')
+        self.assertIsNone(get_values_reader(
+            TitleSerializer(context={'request': request})))
+
+    def test_list_queries(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        url = reverse('checklist-list')
+        # Warm the permission cache on the authenticated user
+        self.client.get(url)
+
+        # Validators, page and tag hyperlinks
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 4)
+
 class ItemAPICreateTestCase(APITestCase, PermissionsTestCaseMixin):
     def setUp(self):
         self.initialize()
@@ -331,3 +986,801 @@ class ItemAPIDeleteTestCase(APITestCase, PermissionsTestCaseMixin):
         self.client.force_authenticate(user=self.basic_user2)
         response = self.client.delete(self.url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class ItemAPIBulkTestCase(APITestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        self.checklist, created = Checklist.objects.get_or_create(
+            user=self.basic_user1, title='Shopping')
+        self.checklist_url = reverse('checklist-detail', 
+            args=(self.checklist.id,))
+        self.url = reverse('item-bulk')
+
+    def _create_items(self, count):
+        return [Item.objects.create(checklist=self.checklist, 
+            description='Item {0}'.format(i)) for i in range(count)]
+
+    def _count_queries(self, method, data):
+        # Warm the permission cache on the authenticated user
+        getattr(self.client, method)(self.url, data, format='json')
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(self.url, data, 
+                format='json')
+        return response, len(context.captured_queries)
+
+    def test_unauthenticated(self):
+        response = self.client.post(self.url, [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_create(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        data = [{'checklist': self.checklist_url, 'description': 'Milk'}, 
+            {'checklist': self.checklist_url, 'description': 'Eggs'}]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        items = Item.objects.order_by('id')
+        self.assertEqual([item.description for item in items], 
+            ['Milk', 'Eggs'])
+        self.assertEqual([result['url'] for result in response.data], 
+            ['http://testserver' + reverse('item-detail', args=(item.id,)) 
+            for item in items])
+
+    def test_create_constant_queries(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        small = [{'checklist': self.checklist_url, 'description': 'Milk'}] * 2
+        large = [{'checklist': self.checklist_url, 'description': 'Milk'}] * 40
+
+        response, small_queries = self._count_queries('post', small)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response, large_queries = self._count_queries('post', large)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(Item.objects.count(), 84)
+
+    def test_create_checklist_nonowner_user(self):
+        self.client.force_authenticate(user=self.basic_user2)
+        data = [{'checklist': self.checklist_url, 'description': 'Milk'}]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Item.objects.exists())
+
+    def test_create_invalid_checklist(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        data = [{'checklist': self.checklist_url, 'description': 'Milk'}, 
+            {'checklist': '/bogus/', 'description': 'Eggs'}]
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Item.objects.exists())
+
+    def test_update(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        items = self._create_items(3)
+        data = [{'url': reverse('item-detail', args=(item.id,)), 
+            'is_complete': True} for item in items[:2]]
+        response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        completed = Item.objects.filter(is_complete=True).order_by('id')
+        self.assertEqual(list(completed), items[:2])
+        self.assertEqual(Item.objects.get(pk=items[0].pk).description, 
+            'Item 0')
+
+    def test_update_constant_queries(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        items = self._create_items(40)
+        data = [{'url': reverse('item-detail', args=(item.id,)), 
+            'is_complete': True} for item in items]
+
+        response, small_queries = self._count_queries('patch', data[:2])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response, large_queries = self._count_queries('patch', data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(Item.objects.filter(is_complete=True).count(), 40)
+
+    def test_update_nonowner_user(self):
+        self.client.force_authenticate(user=self.basic_user2)
+        items = self._create_items(1)
+        data = [{'url': reverse('item-detail', args=(items[0].id,)), 
+            'is_complete': True}]
+        response = self.client.patch(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delete(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        items = self._create_items(3)
+        data = [reverse('item-detail', args=(item.id,)) for item in items[:2]]
+        response = self.client.delete(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(Item.objects.all()), items[2:])
+
+    def test_delete_nonowner_user(self):
+        self.client.force_authenticate(user=self.basic_user2)
+        items = self._create_items(1)
+        data = [reverse('item-detail', args=(items[0].id,))]
+        response = self.client.delete(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Item.objects.exists())
+
+class ItemAPIWriteQueryCountTestCase(APITestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        checklist, created = Checklist.objects.get_or_create(
+            user=self.basic_user1, title='Shopping')
+        self.checklist_url = reverse('checklist-detail', args=(checklist.id,))
+        self.item = Item.objects.create(checklist=checklist, 
+            description='Milk')
+        self.url = reverse('item-list')
+        self.detail_url = reverse('item-detail', args=(self.item.id,))
+        self.client.force_authenticate(user=self.basic_user1)
+        # Warm the permission cache on the authenticated user
+        self.client.post(self.url, {'checklist': self.checklist_url, 
+            'description': 'Eggs'})
+
+    def test_create(self):
+        # Checklist lookup, then insert, counter update and search index
+        # insert in a savepoint
+        with self.assertNumQueries(6):
+            response = self.client.post(self.url, {
+                'checklist': self.checklist_url, 'description': 'Bread'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_update(self):
+        # Item and checklist lookups, then re-reading the item, update and
+        # counter update in a savepoint
+        with self.assertNumQueries(7):
+            response = self.client.put(self.detail_url, {
+                'checklist': self.checklist_url, 'description': 'Milk', 
+                'is_complete': True})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_malformed_checklist(self):
+        for checklist in ('', 'bogus', '/api/v1/todo/checklists/x/', 
+            reverse('item-detail', args=(self.item.id,))):
+            response = self.client.post(self.url, {
+                'checklist': checklist, 'description': 'Bread'})
+            self.assertEqual(response.status_code, 
+                status.HTTP_400_BAD_REQUEST)
+
+    def test_missing_checklist(self):
+        response = self.client.post(self.url, {'description': 'Bread'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(self.url, {
+            'checklist': reverse('checklist-detail', args=(999,)), 
+            'description': 'Bread'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_move_to_nonowned_checklist(self):
+        checklist = Checklist.objects.create(user=self.basic_user2, 
+            title='Other')
+        response = self.client.patch(self.detail_url, {
+            'checklist': reverse('checklist-detail', args=(checklist.id,))})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+###########
+# Counters
+###########
+
+class ChecklistCountersTestCase(APITestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        self.checklist = Checklist.objects.create(user=self.basic_user1, 
+            title='Shopping')
+        self.other = Checklist.objects.create(user=self.basic_user1, 
+            title='Homework')
+        self.client.force_authenticate(user=self.basic_user1)
+
+    def assertCounts(self, checklist, item_count, completed_count):
+        checklist.refresh_from_db()
+        self.assertEqual((checklist.item_count, checklist.completed_count), 
+            (item_count, completed_count))
+
+    def test_create_and_delete(self):
+        item = Item.objects.create(checklist=self.checklist, 
+            description='Milk', is_complete=True)
+        Item.objects.create(checklist=self.checklist, description='Eggs')
+        self.assertCounts(self.checklist, 2, 1)
+
+        item.delete()
+        self.assertCounts(self.checklist, 1, 0)
+
+    def test_toggle_and_move(self):
+        item = Item.objects.create(checklist=self.checklist, 
+            description='Milk')
+        item.is_complete = True
+        item.save()
+        self.assertCounts(self.checklist, 1, 1)
+
+        item = Item.objects.get(pk=item.pk)
+        item.checklist = self.other
+        item.save()
+        self.assertCounts(self.checklist, 0, 0)
+        self.assertCounts(self.other, 1, 1)
+
+        item.description = 'Bread'
+        item.save()
+        self.assertCounts(self.other, 1, 1)
+
+    def test_checklist_save_keeps_counters(self):
+        # self.checklist was loaded before its items were added
+        Item.objects.create(checklist=self.checklist, description='Milk',
+            is_complete=True)
+        Item.objects.create(checklist=self.checklist, description='Eggs')
+        self.checklist.title = 'Groceries'
+        self.checklist.save()
+        self.assertCounts(self.checklist, 2, 1)
+
+    def test_stale_items(self):
+        item = Item.objects.create(checklist=self.checklist,
+            description='Milk')
+        first = Item.objects.get(pk=item.pk)
+        second = Item.objects.get(pk=item.pk)
+        for stale in (first, second):
+            stale.is_complete = True
+            stale.save()
+        self.assertCounts(self.checklist, 1, 1)
+
+        second.delete()
+        first.delete()
+        self.assertCounts(self.checklist, 0, 0)
+
+    def test_bulk(self):
+        checklist_url = reverse('checklist-detail', args=(self.checklist.id,))
+        data = [{'checklist': checklist_url, 'description': 'Milk'}] * 3
+        response = self.client.post(reverse('item-bulk'), data, 
+            format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertCounts(self.checklist, 3, 0)
+
+        urls = [result['url'] for result in response.data]
+        data = [{'url': url, 'is_complete': True} for url in urls[:2]]
+        self.client.patch(reverse('item-bulk'), data, format='json')
+        self.assertCounts(self.checklist, 3, 2)
+
+        self.client.delete(reverse('item-bulk'), urls[1:], format='json')
+        self.assertCounts(self.checklist, 1, 1)
+
+    def test_list_exposes_counters(self):
+        Item.objects.create(checklist=self.checklist, description='Milk', 
+            is_complete=True)
+        Item.objects.create(checklist=self.checklist, description='Eggs')
+
+        response = self.client.get(reverse('checklist-detail', 
+            args=(self.checklist.id,)))
+        self.assertEqual(response.data['item_count'], 2)
+        self.assertEqual(response.data['completed_count'], 1)
+
+    def test_read_only(self):
+        response = self.client.patch(reverse('checklist-detail', 
+            args=(self.checklist.id,)), {'item_count': 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCounts(self.checklist, 0, 0)
+
+    def test_recount(self):
+        Item.objects.create(checklist=self.checklist, description='Milk', 
+            is_complete=True)
+        Checklist.objects.update(item_count=7, completed_count=7)
+
+        self.assertEqual(recount_checklists(), 2)
+        self.assertCounts(self.checklist, 1, 1)
+        self.assertCounts(self.other, 0, 0)
+
+#######
+# Sync
+#######
+
+class SyncAPITestCase(APITestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        self.url = reverse('sync-list')
+        self.checklist = Checklist.objects.create(user=self.basic_user1, 
+            title='Shopping')
+        self.item = Item.objects.create(checklist=self.checklist, 
+            description='Milk')
+        Checklist.objects.create(user=self.basic_user2, title='Other')
+
+    def _sync(self, since=None):
+        params = {} if since is None else {'since': since}
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def _url(self, name, obj):
+        return 'http://testserver' + reverse(name, args=(obj.id,))
+
+    def test_unauthenticated(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_full_sync(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        data = self._sync()
+        self.assertEqual([c['title'] for c in data['checklists']], 
+            ['Shopping'])
+        self.assertEqual([i['description'] for i in data['items']], ['Milk'])
+        self.assertEqual(data['deleted'], {'checklists': [], 'items': []})
+
+    @override_settings(SYNC_WATERMARK_MARGIN=0)
+    def test_changes_since(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        watermark = self._sync()['watermark']
+
+        data = self._sync(watermark)
+        self.assertEqual(data['checklists'], [])
+        self.assertEqual(data['items'], [])
+
+        self.item.is_complete = True
+        self.item.save()
+        item = Item.objects.create(checklist=self.checklist, 
+            description='Eggs')
+
+        # The checklist's counters changed with its items
+        data = self._sync(watermark)
+        self.assertEqual([c['completed_count'] for c in data['checklists']], 
+            [1])
+        self.assertEqual([i['url'] for i in data['items']], 
+            [self._url('item-detail', self.item), 
+            self._url('item-detail', item)])
+
+    def test_late_commit(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        data = self._sync()
+        self.assertFalse(data['reset'])
+
+        # A write stamped before the sync but committed after it
+        Item.objects.filter(pk=self.item.pk).update(is_complete=True, 
+            updated_at=timezone.now() - timedelta(seconds=1))
+
+        data = self._sync(data['watermark'])
+        self.assertEqual([i['is_complete'] for i in data['items']], [True])
+
+    def test_since_before_retention(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        since = (timezone.now() - timedelta(days=31)).isoformat()
+        data = self._sync(since)
+        self.assertTrue(data['reset'])
+        self.assertEqual([c['title'] for c in data['checklists']], 
+            ['Shopping'])
+        self.assertEqual(data['deleted'], {'checklists': [], 'items': []})
+
+    def test_prune_tombstones(self):
+        self.item.delete()
+        Tombstone.objects.update(
+            deleted_at=timezone.now() - timedelta(days=31))
+        self.checklist.delete()
+
+        out = StringIO()
+        call_command('prune_tombstones', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Pruned 1 tombstones')
+        self.assertEqual(list(Tombstone.objects.values_list('model', 
+            flat=True)), ['checklist'])
+
+    def test_tagging_is_a_change(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        watermark = self._sync()['watermark']
+        self.checklist.tags.add(Tag.objects.create(name='food'))
+
+        data = self._sync(watermark)
+        self.assertEqual(len(data['checklists']), 1)
+
+    def test_item_deleted(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        watermark = self._sync()['watermark']
+        response = self.client.delete(reverse('item-detail', 
+            args=(self.item.id,)))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        data = self._sync(watermark)
+        self.assertEqual(data['deleted'], {'checklists': [], 
+            'items': [self._url('item-detail', self.item)]})
+
+    def test_checklist_deleted(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        watermark = self._sync()['watermark']
+        self.client.delete(reverse('checklist-detail', 
+            args=(self.checklist.id,)))
+
+        data = self._sync(watermark)
+        self.assertEqual(data['deleted'], {
+            'checklists': [self._url('checklist-detail', self.checklist)], 
+            'items': [self._url('item-detail', self.item)]})
+
+    def test_bulk_deleted(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        watermark = self._sync()['watermark']
+        self.client.delete(reverse('item-bulk'), 
+            [reverse('item-detail', args=(self.item.id,))], format='json')
+
+        data = self._sync(watermark)
+        self.assertEqual(data['deleted']['items'], 
+            [self._url('item-detail', self.item)])
+
+    def test_other_user(self):
+        self.client.force_authenticate(user=self.basic_user2)
+        watermark = self._sync()['watermark']
+        self.item.delete()
+
+        data = self._sync(watermark)
+        self.assertEqual(data['deleted'], {'checklists': [], 'items': []})
+
+    def test_user_deleted(self):
+        self.basic_user1.delete()
+        self.assertFalse(Tombstone.objects.exists())
+
+    def test_invalid_since(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        response = self.client.get(self.url, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ChangeFeedAPITestCase(APITransactionTestCase, 
+    PermissionsTestCaseMixin):
+    """
+    Changes are published on commit, so this runs outside a test transaction
+    """
+    def setUp(self):
+        self.hub = MemoryChangeHub()
+        patcher = mock.patch('django_checklist.todo.changes._hub', self.hub)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.initialize()
+        self.url = reverse('changes-list')
+        self.checklist = Checklist.objects.create(user=self.basic_user1, 
+            title='Shopping')
+        self.item = Item.objects.create(checklist=self.checklist, 
+            description='Milk')
+
+    def _poll(self, cursor=None, timeout=0):
+        params = {'timeout': timeout}
+        if cursor is not None:
+            params['cursor'] = cursor
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def _url(self, name, obj):
+        return 'http://testserver' + reverse(name, args=(obj.id,))
+
+    def test_unauthenticated(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_reset_without_cursor(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        data = self._poll()
+        self.assertTrue(data['reset'])
+        self.assertEqual(data['items'], [])
+
+        self.assertFalse(self._poll(data['cursor'])['reset'])
+        self.assertTrue(self._poll('unknown')['reset'])
+
+    def test_changes(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        cursor = self._poll()['cursor']
+        response = self.client.patch(reverse('item-detail', 
+            args=(self.item.id,)), {'is_complete': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # The checklist's counters changed with its item
+        data = self._poll(cursor)
+        self.assertFalse(data['reset'])
+        self.assertEqual([i['url'] for i in data['items']], 
+            [self._url('item-detail', self.item)])
+        self.assertEqual([c['completed_count'] for c in data['checklists']], 
+            [1])
+
+        data = self._poll(data['cursor'])
+        self.assertEqual((data['checklists'], data['items']), ([], []))
+
+    def test_deleted(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        cursor = self._poll()['cursor']
+        self.client.delete(reverse('checklist-detail', 
+            args=(self.checklist.id,)))
+
+        data = self._poll(cursor)
+        self.assertEqual(data['checklists'], [])
+        self.assertEqual(data['deleted'], {
+            'checklists': [self._url('checklist-detail', self.checklist)], 
+            'items': [self._url('item-detail', self.item)]})
+
+    def test_bulk_deleted(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        cursor = self._poll()['cursor']
+        self.client.delete(reverse('item-bulk'), 
+            [reverse('item-detail', args=(self.item.id,))], format='json')
+
+        data = self._poll(cursor)
+        self.assertEqual(data['deleted']['items'], 
+            [self._url('item-detail', self.item)])
+
+    def test_tagging(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        cursor = self._poll()['cursor']
+        Tag.objects.create(name='food').checklist.add(self.checklist)
+
+        data = self._poll(cursor)
+        self.assertEqual([c['url'] for c in data['checklists']], 
+            [self._url('checklist-detail', self.checklist)])
+
+    def test_rolled_back(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        cursor = self._poll()['cursor']
+        try:
+            with transaction.atomic():
+                Item.objects.create(checklist=self.checklist, 
+                    description='Eggs')
+                raise IntegrityError
+        except IntegrityError:
+            pass
+
+        self.assertEqual(self._poll(cursor)['items'], [])
+
+    def test_other_user(self):
+        self.client.force_authenticate(user=self.basic_user2)
+        cursor = self._poll()['cursor']
+        self.item.delete()
+
+        data = self._poll(cursor)
+        self.assertEqual(data['deleted'], {'checklists': [], 'items': []})
+
+    def test_long_poll(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        cursor = self._poll()['cursor']
+
+        def complete():
+            Item.objects.filter(pk=self.item.pk).update(is_complete=True)
+            self.hub.publish(self.basic_user1.pk, [('item', self.item.pk, 
+                False)])
+        timer = threading.Timer(0.1, complete)
+        timer.start()
+        self.addCleanup(timer.join)
+
+        start = time.perf_counter()
+        data = self._poll(cursor, timeout=5)
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual([i['is_complete'] for i in data['items']], [True])
+
+    def _get_asgi_request(self):
+        """
+        Returns a coroutine function requesting a path through an ASGI
+        handler with one thread, and the list of paths it finished
+        """
+        key = APIToken.generate_key()
+        APIToken.objects.create(user=self.basic_user1, 
+            key_hash=hash_key(key))
+        handler = ASGIHandler(max_workers=1)
+        self.addCleanup(handler.executor.shutdown)
+        finished = []
+
+        async def request(path, query_string=b''):
+            sent = []
+            messages = [{'type': 'http.request', 'body': b''}]
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await asyncio.sleep(60)
+
+            async def send(message):
+                sent.append(message)
+
+            await handler({'type': 'http', 'method': 'GET', 'path': path, 
+                'query_string': query_string, 'headers': [
+                (b'authorization', 'Token {0}'.format(key).encode()), 
+                (b'host', b'testserver')]}, receive, send)
+            finished.append(path)
+            return sent
+
+        return request, finished
+
+    def _run(self, *coroutines):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(asyncio.gather(*coroutines, 
+                loop=loop))
+        finally:
+            loop.close()
+
+    def test_asgi_long_poll(self):
+        request, finished = self._get_asgi_request()
+        cursor = self.hub.read(self.basic_user1.pk, None)[0]
+
+        # The waiting long poll must not hold the only thread
+        async def change():
+            await asyncio.sleep(0.1)
+            sent = await request(reverse('checklist-list'))
+            self.assertEqual(sent[0]['status'], status.HTTP_200_OK)
+            self.hub.publish(self.basic_user1.pk, [('item', self.item.pk, 
+                False)])
+
+        sent, changed = self._run(request(self.url, 
+            'cursor={0}&timeout=5'.format(cursor).encode()), change())
+
+        self.assertEqual(finished, [reverse('checklist-list'), self.url])
+        self.assertEqual(sent[0]['status'], status.HTTP_200_OK)
+        data = json.loads(sent[1]['body'].decode('utf-8'))
+        self.assertEqual([i['url'] for i in data['items']], 
+            [self._url('item-detail', self.item)])
+
+    def test_asgi_long_poll_timeout(self):
+        request, finished = self._get_asgi_request()
+        cursor = self.hub.read(self.basic_user1.pk, None)[0]
+
+        async def poll():
+            start = time.perf_counter()
+            sent = await request(self.url, 
+                'cursor={0}&timeout=1'.format(cursor).encode())
+            return sent, time.perf_counter() - start
+
+        # Sent after the poll timed out; its thread must be free
+        async def other():
+            await asyncio.sleep(1.1)
+            start = time.perf_counter()
+            await request(reverse('checklist-list'))
+            return time.perf_counter() - start
+
+        (sent, polled), waited = self._run(poll(), other())
+
+        self.assertLess(polled, 1.5)
+        self.assertLess(waited, 0.5)
+        data = json.loads(sent[1]['body'].decode('utf-8'))
+        self.assertEqual((data['reset'], data['items']), (False, []))
+
+class ChangeHubTestCase(TestCase):
+    def test_memory_dropped(self):
+        hub = MemoryChangeHub(max_changes=2)
+        cursor = hub.read(1, None)[0]
+        hub.publish(1, [('item', 1, False), ('item', 2, False)])
+        self.assertEqual(hub.read(1, cursor)[1:], 
+            ([('item', 1, False), ('item', 2, False)], False))
+
+        hub.publish(1, [('item', 3, True)])
+        self.assertEqual(hub.read(1, cursor)[1:], ([], True))
+        self.assertEqual(hub.read(2, cursor)[1:], ([], False))
+
+    def test_memory_subscribe(self):
+        hub = MemoryChangeHub()
+        cursor = hub.read(1, None)[0]
+        called = []
+        unsubscribe = hub.subscribe(1, cursor, lambda: called.append(1))
+        hub.publish(2, [('item', 1, False)])
+        self.assertEqual(called, [])
+        hub.publish(1, [('item', 1, False)])
+        self.assertEqual(called, [1])
+
+        # Subscribing past the cursor calls back at once
+        hub.subscribe(1, cursor, lambda: called.append(2))
+        self.assertEqual(called, [1, 2])
+        unsubscribe()
+
+    def test_cache(self):
+        hub = CacheChangeHub(poll_interval=0.01)
+        self.addCleanup(cache.clear)
+        cursor = hub.read(1, None)[0]
+        timer = threading.Timer(0.05, hub.publish, (1, [('item', 1, False)]))
+        timer.start()
+        self.addCleanup(timer.join)
+
+        cursor, changes, reset = hub.wait(1, cursor, 5)
+        self.assertEqual((changes, reset), ([('item', 1, False)], False))
+        self.assertEqual(hub.read(1, cursor)[1:], ([], False))
+
+        cache.clear()
+        self.assertEqual(hub.read(1, cursor)[1:], ([], True))
+
+#########
+# Search
+#########
+
+class SearchAPITestCase(APITestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        self.checklist = Checklist.objects.create(user=self.basic_user1, 
+            title='Groceries')
+        self.milk = Item.objects.create(checklist=self.checklist, 
+            description='Milk and more milk')
+        self.eggs = Item.objects.create(checklist=self.checklist, 
+            description='Eggs for the milk cake')
+        other = Checklist.objects.create(user=self.basic_user2, 
+            title='Milk run')
+        Item.objects.create(checklist=other, description='Milk')
+        self.url = reverse('search-list')
+
+    def _search(self, query, **params):
+        params['q'] = query
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(result['type'], result['object']['url']) 
+            for result in response.data['results']]
+
+    def _url(self, view_name, obj):
+        return 'http://testserver' + reverse(view_name, args=(obj.id,))
+
+    def test_unauthenticated(self):
+        response = self.client.get(self.url, {'q': 'milk'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_ranked_and_scoped(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        self.assertEqual(self._search('milk'), [
+            ('item', self._url('item-detail', self.milk)), 
+            ('item', self._url('item-detail', self.eggs))])
+
+    def test_checklist_title_and_prefix(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        self.assertEqual(self._search('groc'), 
+            [('checklist', self._url('checklist-detail', self.checklist))])
+        self.assertEqual(self._search('cake egg'), 
+            [('item', self._url('item-detail', self.eggs))])
+        self.assertEqual(self._search('milk', limit=1), 
+            [('item', self._url('item-detail', self.milk))])
+        self.assertEqual(self._search(''), [])
+
+    def test_save_and_delete(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        self.milk.description = 'Butter'
+        self.milk.save()
+        self.assertEqual(self._search('butter'), 
+            [('item', self._url('item-detail', self.milk))])
+        self.assertEqual(len(self._search('milk')), 1)
+
+        self.client.delete(reverse('checklist-detail', 
+            args=(self.checklist.id,)))
+        self.assertEqual(self._search('butter'), [])
+
+    def test_bulk_create(self):
+        self.client.force_authenticate(user=self.basic_user1)
+        checklist_url = self._url('checklist-detail', self.checklist)
+        self.client.post(reverse('item-bulk'), [
+            {'checklist': checklist_url, 'description': 'Sourdough bread'}], 
+            format='json')
+        self.assertEqual(len(self._search('sourdough')), 1)
+
+class MemorySearchIndexTestCase(TestCase, PermissionsTestCaseMixin):
+    def setUp(self):
+        self.initialize()
+        self.checklist = Checklist.objects.create(user=self.basic_user1, 
+            title='Café errands')
+        self.item = Item.objects.create(checklist=self.checklist, 
+            description='Milk and more milk')
+        self.other = Item.objects.create(checklist=self.checklist, 
+            description='Milk cake')
+        self.index = MemorySearchIndex()
+
+    def test_search(self):
+        user_id = self.basic_user1.pk
+        self.assertEqual([hit[:2] for hit in self.index.search(user_id, 
+            'MILK', 10)], [('item', self.item.pk), ('item', self.other.pk)])
+        self.assertEqual([hit[:2] for hit in self.index.search(user_id, 
+            'cafe', 10)], [('checklist', self.checklist.pk)])
+        self.assertEqual([hit[:2] for hit in self.index.search(user_id, 
+            'milk ca', 10)], [('item', self.other.pk)])
+        self.assertEqual(self.index.search(self.basic_user2.pk, 'milk', 10), 
+            [])
+
+    def test_add_and_remove(self):
+        user_id = self.basic_user1.pk
+        self.index.rebuild()
+        self.index.add([('item', self.item.pk, user_id, 'Butter')])
+        self.assertEqual([hit[:2] for hit in self.index.search(user_id, 
+            'milk', 10)], [('item', self.other.pk)])
+
+        self.index.remove([('item', self.item.pk)])
+        self.assertEqual(self.index.search(user_id, 'butter', 10), [])
+        self.assertEqual(self.index.search(user_id, 'butt', 10), [])
+
+    def test_max_age(self):
+        user_id = self.basic_user1.pk
+        self.index.max_age = 60
+        self.index.search(user_id, 'milk', 10)
+
+        # Written by another process, without signals reaching this index
+        Item.objects.filter(pk=self.item.pk).update(description='Butter')
+        self.assertEqual(len(self.index.search(user_id, 'butter', 10)), 0)
+
+        with mock.patch('time.monotonic', return_value=time.monotonic() + 61):
+            self.assertEqual([hit[:2] for hit in self.index.search(user_id, 
+                'butter', 10)], [('item', self.item.pk)])
@@ -2,8 +2,12 @@
 from rest_framework import routers
 
 # Local
-from .views import ChecklistViewSet, ItemViewSet
+from .views import (ChangeFeedViewSet, ChecklistViewSet, ItemViewSet, 
+    SearchViewSet, SyncViewSet)
 
 router = routers.SimpleRouter()
 router.register(r'checklists', ChecklistViewSet)
 router.register(r'items', ItemViewSet)
+router.register(r'search', SearchViewSet, base_name='search')
+router.register(r'sync', SyncViewSet, base_name='sync')
+router.register(r'changes', ChangeFeedViewSet, base_name='changes')
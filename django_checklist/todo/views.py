@@ -1,39 +1,485 @@
+# Python
+import codecs
+from collections import OrderedDict
+from datetime import timedelta
+from functools import partial
+
 # Django
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 # External
-from rest_framework import viewsets
+from rest_framework import exceptions, permissions, status, viewsets
+from rest_framework.decorators import list_route
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import _positive_int
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
 # Local
-from .models import Checklist, Item
+from django_checklist.common.filters import (hyperlink_parser,
+    parse_boolean, parse_string, parse_timestamp, QueryParameterFilter)
+from django_checklist.common.mixins import (ConditionalGetMixin, ProfileMixin,
+    QueryPlanMixin, ValuesListMixin)
+from django_checklist.common.profiling import timed
+from django_checklist.common.relations import resolve_pk
+from .changes import get_change_hub
+from .export import iter_export
+from .importer import ChecklistImporter, read_csv, read_jsonl
+from .models import Checklist, Item, Tombstone
 from .permissions import ChecklistPermissions, ItemPermissions
-from .serializers import ChecklistSerializer, ItemSerializer
+from .search import get_search_index
+from .serializers import (ChecklistSerializer, EXPANDABLE_FIELDS,
+    get_expanded_checklist_serializer, ItemSerializer)
+from .signals import deferred_writes
 
 ###########
 # ViewSets
 ###########
 
-class ChecklistViewSet(viewsets.ModelViewSet):
+class ChecklistViewSet(ProfileMixin, ConditionalGetMixin, ValuesListMixin, 
+    QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Checklist.objects.all()
     serializer_class = ChecklistSerializer
     permission_classes = (ChecklistPermissions,)
+    # Items nested by ?expand=items keep the item list's order
+    prefetch_querysets = {
+        'item_set': Item.objects.order_by('created_at', 'id')
+    }
+    filter_backends = (QueryParameterFilter, OrderingFilter)
+    # Each filter is served by an index with the user's id as its prefix
+    filter_fields = {
+        'tags__name': parse_string,
+        'updated_at__gte': parse_timestamp,
+        'updated_at__lt': parse_timestamp,
+    }
+    ordering_fields = ('created_at', 'updated_at')
+    ordering = ('created_at',)
+    export_chunk_size = 500
+    import_batch_size = 5000
 
     def get_queryset(self):
         if self.request.user.is_anonymous():
             return Checklist.objects.none()
 
-        return Checklist.objects.filter(user=self.request.user)
+        return super().get_queryset().filter(user=self.request.user)
+
+    def get_serializer_class(self):
+        expand = self.get_expand()
+        if expand:
+            return get_expanded_checklist_serializer(expand)
+
+        return super().get_serializer_class()
+
+    def get_expand(self):
+        """
+        Returns the relations ?expand=items,tags asks to nest in a retrieve
+        """
+        if self.action != 'retrieve':
+            return []
+
+        expand = [name.strip() for name in 
+            self.request.query_params.get('expand', '').split(',') 
+            if name.strip()]
+        unknown = [name for name in expand if name not in EXPANDABLE_FIELDS]
+        if unknown:
+            raise exceptions.ValidationError({'expand': 
+                'Unknown relations: {0}.'.format(', '.join(unknown))})
+
+        return expand
+
+    def get_instance_validators(self, instance):
+        last_modified, version = super().get_instance_validators(instance)
+        expand = self.get_expand()
+
+        # Nested rows change without touching the checklist; their
+        # timestamps and counts are read from the prefetched rows
+        for name in expand:
+            source, serializer_class = EXPANDABLE_FIELDS[name]
+            related = getattr(instance, source).all()
+            last_modified = max([last_modified] + 
+                [obj.updated_at for obj in related])
+            version = '{0}-{1}'.format(version, len(related))
+
+        return last_modified, version
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class ItemViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        # Tombstones for the checklist and its items go in one insert
+        with transaction.atomic(), deferred_writes(self.request.user):
+            instance.delete()
+
+    @list_route(permission_classes=(permissions.IsAuthenticated,))
+    def export(self, request):
+        """
+        Streams all of the user's Checklists with their Items nested as
+        JSON Lines, one Checklist per line
+        """
+        response = StreamingHttpResponse(iter_export(request.user, 
+            self.get_serializer_context(), self.export_chunk_size), 
+            content_type='application/x-ndjson; charset=utf-8')
+        response['Content-Disposition'] = \
+            'attachment; filename="checklists.jsonl"'
+        return response
+
+    @list_route(methods=['post'], url_path='import')
+    def bulk_import(self, request):
+        """
+        Imports Checklists with their Items and Tags in bulk from JSON Lines
+        or CSV, sent as the request body or as a multipart 'file' upload.
+        Nothing is imported if any record is invalid.
+        """
+        if not request.user.has_perms(['todo.add_item', 'common.add_tag']):
+            raise exceptions.PermissionDenied()
+
+        if request.content_type.startswith('multipart/form-data'):
+            stream = request.FILES.get('file')
+            if stream is None:
+                raise exceptions.ValidationError(
+                    {'file': 'No file was submitted.'})
+            is_csv = stream.name.lower().endswith('.csv') or \
+                stream.content_type == 'text/csv'
+        else:
+            stream = request.stream
+            is_csv = request.content_type.startswith('text/csv')
+
+        lines = codecs.getreader('utf-8')(stream) if stream else []
+        read = read_csv if is_csv else read_jsonl
+        importer = ChecklistImporter(request.user, self.import_batch_size)
+
+        try:
+            with transaction.atomic():
+                stats = importer.run(read(lines))
+        except (ValidationError, UnicodeDecodeError) as e:
+            messages = e.messages if isinstance(e, ValidationError) \
+                else [str(e)]
+            raise exceptions.ValidationError(messages)
+
+        return Response(stats, status=status.HTTP_201_CREATED)
+
+class ItemViewSet(ProfileMixin, ConditionalGetMixin, ValuesListMixin, 
+    QueryPlanMixin, viewsets.ModelViewSet):
     queryset = Item.objects.all()
     serializer_class = ItemSerializer
     permission_classes = (ItemPermissions,)
+    filter_backends = (QueryParameterFilter, OrderingFilter)
+    # Each filter is served by an index with the checklist's id as its prefix
+    filter_fields = {
+        'checklist': hyperlink_parser('checklist-detail'),
+        'is_complete': parse_boolean,
+        'updated_at__gte': parse_timestamp,
+        'updated_at__lt': parse_timestamp,
+    }
+    ordering_fields = ('created_at', 'updated_at')
+    ordering = ('created_at',)
+    # ItemPermissions checks ownership through the checklist
+    select_related_fields = ('checklist',)
+    related_objects = None
 
     def get_queryset(self):
         if self.request.user.is_anonymous():
             return Item.objects.none()
 
-        return Item.objects.filter(checklist__user=self.request.user)
+        return super().get_queryset().filter(
+            checklist__user=self.request.user)
+
+    # Items and their checklist counters are written together
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.related_objects is not None:
+            context['related_objects'] = self.related_objects
+
+        return context
+
+    @list_route(methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        """
+        Creates (POST), updates (PATCH) or deletes (DELETE) a list of Items
+        in one transaction with a constant number of queries
+        """
+        if not isinstance(request.data, list):
+            raise exceptions.ValidationError('Expected a list of items.')
+
+        with transaction.atomic():
+            if request.method == 'DELETE':
+                items = self._get_bulk_items(request.data)
+                with deferred_writes(request.user):
+                    Item.objects.filter(
+                        pk__in=[item.pk for item in items]).delete()
+                return Response(status=status.HTTP_204_NO_CONTENT)
+
+            for entry in request.data:
+                if not isinstance(entry, dict):
+                    raise exceptions.ValidationError(
+                        'Expected a list of items.')
+
+            self.related_objects = {
+                Checklist: self._get_bulk_checklists(request.data)
+            }
+
+            if request.method == 'POST':
+                serializer = self.get_serializer(data=request.data, many=True)
+                response_status = status.HTTP_201_CREATED
+            else:
+                items = self._get_bulk_items(
+                    [entry.get('url') for entry in request.data])
+                serializer = self.get_serializer(items, data=request.data, 
+                    many=True, partial=True)
+                response_status = status.HTTP_200_OK
+
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+        return Response(serializer.data, status=response_status)
+
+    def _get_bulk_checklists(self, entries):
+        """
+        Loads every referenced Checklist in one query and checks ownership
+        """
+        pks = set()
+        for entry in entries:
+            try:
+                pks.add(resolve_pk(entry['checklist'], 'checklist-detail'))
+            except (KeyError, ValueError):
+                # Left for the serializer to report
+                pass
+
+        checklists = Checklist.objects.in_bulk(pks)
+        for checklist in checklists.values():
+            if checklist.user_id != self.request.user.pk:
+                raise exceptions.PermissionDenied()
+
+        return checklists
+
+    def _get_bulk_items(self, urls):
+        """
+        Returns the Items for urls in order, raising 404 for missing Items
+        """
+        try:
+            pks = [resolve_pk(url, 'item-detail') for url in urls]
+        except ValueError:
+            raise exceptions.ValidationError('Invalid item hyperlink.')
+
+        # Locked so the counters are updated from the rows as they are
+        items = self.get_queryset().select_for_update().in_bulk(pks)
+        if len(items) != len(set(pks)):
+            raise exceptions.NotFound()
+
+        return [items[pk] for pk in pks]
+
+class SyncViewSet(ProfileMixin, viewsets.GenericViewSet):
+    """
+    Returns the user's Checklists and Items changed since a watermark.
+
+    GET ?since=<watermark> responds with the changed objects, hyperlinks to
+    objects deleted since then and a new watermark for the next call.
+    Without since every object is returned. The watermark trails the read
+    by SYNC_WATERMARK_MARGIN seconds, so changes committed late by a slow
+    transaction are not missed; objects may be sent more than once, so
+    clients should upsert. reset is true when since is older than the
+    tombstones kept, in which case every object is returned and clients
+    should drop the ones missing from the response.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def list(self, request):
+        since = request.query_params.get('since')
+        if since is not None:
+            since = parse_datetime(since)
+            if since is None:
+                raise exceptions.ValidationError(
+                    {'since': 'Expected an ISO 8601 timestamp.'})
+
+        # Taken before reading so later changes land in the next sync, and
+        # moved back past any write transaction still running
+        watermark = timezone.now() - timedelta(
+            seconds=getattr(settings, 'SYNC_WATERMARK_MARGIN', 60))
+        reset = since is not None and since < Tombstone.objects.get_cutoff()
+        if reset:
+            since = None
+
+        checklists = Checklist.objects.filter(user=request.user) \
+            .prefetch_related('tags').order_by('updated_at', 'id')
+        items = Item.objects.filter(checklist__user=request.user) \
+            .order_by('updated_at', 'id')
+        tombstones = Tombstone.objects.filter(user=request.user)
+
+        if since is not None:
+            checklists = checklists.filter(updated_at__gte=since)
+            items = items.filter(updated_at__gte=since)
+            tombstones = tombstones.filter(deleted_at__gte=since)
+        else:
+            tombstones = tombstones.none()
+
+        context = self.get_serializer_context()
+        deleted = {'checklist': [], 'item': []}
+        for model, object_id in tombstones.values_list('model', 'object_id'):
+            deleted[model].append(reverse('{0}-detail'.format(model), 
+                args=(object_id,), request=request))
+
+        with timed('serialize'):
+            checklists = ChecklistSerializer(checklists, many=True, 
+                context=context).data
+            items = ItemSerializer(items, many=True, context=context).data
+
+        return Response({
+            'watermark': watermark.isoformat(),
+            'reset': reset,
+            'checklists': checklists,
+            'items': items,
+            'deleted': {
+                'checklists': deleted['checklist'], 
+                'items': deleted['item']
+            }
+        })
+
+class ChangeFeedViewSet(ProfileMixin, viewsets.GenericViewSet):
+    """
+    Long-polls the user's Checklist and Item changes.
+
+    GET ?cursor=<cursor>[&timeout=<seconds>] waits until something changed
+    after the cursor, then responds with the changed objects, hyperlinks to
+    the deleted ones and the cursor for the next call. An empty response
+    means the timeout passed. reset is true when the cursor is missing or
+    too old; start by fetching a cursor, then sync with /sync/ and poll from
+    it. Served through asgi.py the wait does not hold a thread.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+    default_timeout = 25
+    max_timeout = 55
+
+    def list(self, request):
+        try:
+            timeout = _positive_int(request.query_params['timeout'], 
+                cutoff=self.max_timeout)
+        except (KeyError, ValueError):
+            timeout = self.default_timeout
+
+        hub = get_change_hub()
+        user_id = request.user.pk
+        since = request.query_params.get('cursor')
+        cursor, changes, reset = hub.read(user_id, since)
+
+        # Under asgi.py the wait already happened on the event loop
+        if not changes and not reset and timeout and \
+            not request.META.get('asgi.waited'):
+            if request.META.get('asgi.wait'):
+                response = Response(status=status.HTTP_204_NO_CONTENT)
+                response.asgi_wait = (partial(hub.subscribe, user_id, since), 
+                    timeout)
+                return response
+            cursor, changes, reset = hub.wait(user_id, since, timeout)
+
+        data = OrderedDict([('cursor', cursor), ('reset', reset)])
+        data.update(self._get_deltas(request, changes))
+        return Response(data)
+
+    def _get_deltas(self, request, changes):
+        """
+        Reads the latest state of the changed objects, in order of their
+        last change
+        """
+        latest = OrderedDict()
+        for model, pk, deleted in changes:
+            latest.pop((model, pk), None)
+            latest[(model, pk)] = deleted
+
+        pks = {'checklist': [], 'item': []}
+        for (model, pk), deleted in latest.items():
+            if not deleted:
+                pks[model].append(pk)
+        objects = {
+            'checklist': Checklist.objects.filter(user=request.user)
+                .prefetch_related('tags').in_bulk(pks['checklist']), 
+            'item': Item.objects.filter(checklist__user=request.user)
+                .in_bulk(pks['item'])
+        }
+        serializers = {'checklist': ChecklistSerializer, 'item': ItemSerializer}
+        context = self.get_serializer_context()
+
+        changed = {'checklist': [], 'item': []}
+        deleted = {'checklist': [], 'item': []}
+        with timed('serialize'):
+            for model, pk in latest:
+                instance = objects[model].get(pk)
+                if instance is not None:
+                    changed[model].append(serializers[model](instance, 
+                        context=context).data)
+                else:
+                    deleted[model].append(reverse('{0}-detail'.format(model), 
+                        args=(pk,), request=request))
+
+        return {
+            'checklists': changed['checklist'],
+            'items': changed['item'],
+            'deleted': {
+                'checklists': deleted['checklist'], 
+                'items': deleted['item']
+            }
+        }
+
+class SearchViewSet(ProfileMixin, viewsets.GenericViewSet):
+    """
+    Ranked full-text search over the user's Checklist titles and Item
+    descriptions.
+
+    GET ?q=<terms>[&limit=<n>] responds with hits, best first, each with its
+    type, score and object. Every term has to match and the last one also
+    matches as a prefix.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+    default_limit = 20
+    max_limit = 100
+
+    def list(self, request):
+        try:
+            limit = _positive_int(request.query_params['limit'], 
+                strict=True, cutoff=self.max_limit)
+        except (KeyError, ValueError):
+            limit = self.default_limit
+
+        hits = get_search_index().search(request.user.pk, 
+            request.query_params.get('q', ''), limit)
+
+        pks = {'checklist': [], 'item': []}
+        for model, pk, score in hits:
+            pks[model].append(pk)
+
+        # Hits are read back scoped to the user, which also drops stale ones
+        objects = {
+            'checklist': Checklist.objects.filter(user=request.user)
+                .prefetch_related('tags').in_bulk(pks['checklist']), 
+            'item': Item.objects.filter(checklist__user=request.user)
+                .in_bulk(pks['item'])
+        }
+        serializers = {'checklist': ChecklistSerializer, 'item': ItemSerializer}
+        context = self.get_serializer_context()
+
+        results = []
+        with timed('serialize'):
+            for model, pk, score in hits:
+                instance = objects[model].get(pk)
+                if instance is not None:
+                    results.append({'type': model, 'score': score, 
+                        'object': serializers[model](instance, 
+                        context=context).data})
+
+        return Response({'results': results})